@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Concurrencia adaptativa por target (AIMD)
+Cada target tiene una ventana de workers, un tamaño de chunk MySQL y una pausa
+entre pedidos. Mientras la fuente responde bien la ventana y el chunk crecen
+de a poco; ante una señal de carga (consulta lenta, Threads_running o lag de
+réplica sobre el umbral, 503 SlowDown de S3) se reducen a la mitad. Con la
+ventana en 1 la única palanca que queda es espaciar los pedidos.
+La ventana limita las unidades que despacha el fan-out y también los pedidos
+simultáneos a la fuente: una baja frena enseguida a las unidades que ya
+estaban corriendo, en su próximo chunk u objeto
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+DEFAULT_MAX_TARGET_WORKERS = 4
+DEFAULT_MAX_QUERY_MS = 2000
+DEFAULT_MAX_THREADS_RUNNING = 32
+DEFAULT_MAX_REPLICA_LAG = 30      # segundos
+DEFAULT_PROBE_SECONDS = 5
+DEFAULT_MIN_CHUNK_ROWS = 250
+DEFAULT_MAX_CHUNK_ROWS = 5000
+START_CHUNK_ROWS = 1000
+CHUNK_STEP_ROWS = 500
+
+DECREASE_FACTOR = 0.5
+PAUSE_RECOVERY = 0.95             # la pausa se acorta un 5% por respuesta sana
+MIN_PAUSE_SECONDS = 0.05
+MAX_PAUSE_SECONDS = 30.0
+MAX_DECISIONS = 1000              # por ejecución; los contadores siguen aunque se llegue al tope
+
+# Códigos de error de S3 (y compatibles) que indican "bajar el ritmo"
+THROTTLE_CODES = {'SlowDown', '503', 'RequestLimitExceeded', 'Throttling',
+                  'ThrottlingException', 'TooManyRequests'}
+
+
+def adaptive_settings(connections: Dict) -> Dict:
+    """Sección opcional `adaptive:` de connection.yml (umbrales de carga)"""
+    settings = connections.get('adaptive') or {}
+    probe_seconds = float(settings.get('probe_seconds', DEFAULT_PROBE_SECONDS))
+    return {
+        'enabled': bool(settings.get('enabled', False)),
+        'max_target_workers': int(settings.get('max_target_workers', DEFAULT_MAX_TARGET_WORKERS)),
+        'max_query_ms': float(settings.get('max_query_ms', DEFAULT_MAX_QUERY_MS)),
+        'max_threads_running': int(settings.get('max_threads_running', DEFAULT_MAX_THREADS_RUNNING)),
+        'max_replica_lag': float(settings.get('max_replica_lag', DEFAULT_MAX_REPLICA_LAG)),
+        'probe_seconds': probe_seconds,
+        'min_chunk_rows': int(settings.get('min_chunk_rows', DEFAULT_MIN_CHUNK_ROWS)),
+        'max_chunk_rows': int(settings.get('max_chunk_rows', DEFAULT_MAX_CHUNK_ROWS)),
+        # Segundos sin cambiar la ventana después de una baja
+        'cooldown_seconds': float(settings.get('cooldown_seconds', probe_seconds)),
+    }
+
+
+def mysql_health(cursor) -> Dict:
+    """
+    Señales de carga del servidor MySQL con el cursor del escaneo
+
+    Returns:
+        dict: {'threads_running', 'replica_lag'}; None si no es réplica o
+              falta el privilegio (REPLICATION CLIENT / PROCESS)
+    """
+    signals = {'threads_running': None, 'replica_lag': None}
+    try:
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Threads_running'")
+        row = cursor.fetchone()
+        if row:
+            signals['threads_running'] = int(row[1])
+    except Exception:
+        pass
+
+    # SHOW REPLICA STATUS desde MySQL 8.0.22; antes, SHOW SLAVE STATUS
+    for statement, column in (('SHOW REPLICA STATUS', 'Seconds_Behind_Source'),
+                              ('SHOW SLAVE STATUS', 'Seconds_Behind_Master')):
+        try:
+            cursor.execute(statement)
+            row = cursor.fetchone()
+        except Exception:
+            continue
+        if row and cursor.description:
+            names = [description[0] for description in cursor.description]
+            if column in names and row[names.index(column)] is not None:
+                signals['replica_lag'] = int(row[names.index(column)])
+        break
+    return signals
+
+
+def is_throttle(error: Exception) -> bool:
+    """Error de S3 (botocore ClientError) que pide bajar el ritmo: 503 SlowDown y similares"""
+    response = getattr(error, 'response', None) or {}
+    code = str((response.get('Error') or {}).get('Code', ''))
+    status = (response.get('ResponseMetadata') or {}).get('HTTPStatusCode')
+    return code in THROTTLE_CODES or status == 503
+
+
+class AdaptiveConcurrency:
+    """Ventanas AIMD por target, alimentadas por las partes que termina el escaneo"""
+
+    def __init__(self, targets: List[Dict], units: List[Dict], settings: Dict,
+                 max_workers: int, clock=time.monotonic):
+        """
+        Args:
+            targets (list): Targets de load_targets; su max_workers es la ventana inicial
+            units (list): Unidades de build_units; un target no usa más workers que unidades
+            settings (dict): adaptive_settings()
+            max_workers (int): Límite global del fan-out
+        """
+        self.settings = settings
+        self.clock = clock
+        self.started = clock()
+        # Protege las ventanas y despierta a los pedidos que esperan turno
+        self.lock = threading.Condition()
+        self.decisions = []
+
+        unit_counts = {}
+        for unit in units:
+            unit_counts[unit['target']] = unit_counts.get(unit['target'], 0) + 1
+
+        start_chunk = min(max(START_CHUNK_ROWS, settings['min_chunk_rows']), settings['max_chunk_rows'])
+        self.state = {}
+        for target in targets:
+            ceiling = max(1, min(settings['max_target_workers'], max_workers,
+                                 unit_counts.get(target['name'], 1)))
+            self.state[target['name']] = {
+                'source': target['source'],
+                'ceiling': ceiling,
+                'window': float(min(max(1, target['max_workers']), ceiling)),
+                'chunk_rows': start_chunk,
+                'pause': 0.0,
+                'active': 0,
+                'last_decrease': None,
+                'last_increase': None,
+                'last_probe': None,
+                'increases': 0,
+                'decreases': 0,
+                'min_workers': None,
+                'max_workers': 0,
+                'signals': {},
+            }
+            self._track(self.state[target['name']])
+
+    def limit(self, target: str) -> int:
+        """Workers que el fan-out puede tener activos sobre el target"""
+        state = self.state.get(target)
+        return int(state['window']) if state else 1
+
+    def chunk_rows(self, target: str) -> int:
+        state = self.state.get(target)
+        return state['chunk_rows'] if state else START_CHUNK_ROWS
+
+    @contextmanager
+    def request(self, target: str):
+        """
+        Turno para un pedido a la fuente: como mucho `ventana` pedidos
+        simultáneos por target, espaciados por la pausa vigente
+        """
+        state = self.state.get(target)
+        if not state:
+            yield
+            return
+        with self.lock:
+            while state['active'] >= int(state['window']):
+                self.lock.wait()
+            state['active'] += 1
+            pause = state['pause']
+        try:
+            if pause:
+                time.sleep(pause)
+            yield
+        finally:
+            with self.lock:
+                state['active'] -= 1
+                self.lock.notify_all()
+
+    def should_probe(self, target: str) -> bool:
+        """Verdadero cada probe_seconds por target (compartido entre sus workers)"""
+        state = self.state.get(target)
+        if not state:
+            return False
+        with self.lock:
+            now = self.clock()
+            if state['last_probe'] is not None and now - state['last_probe'] < self.settings['probe_seconds']:
+                return False
+            state['last_probe'] = now
+            return True
+
+    def observe(self, target: str, latency: Optional[float] = None, throttled: bool = False,
+                health: Optional[Dict] = None):
+        """
+        Registra el resultado de un pedido a la fuente y ajusta la ventana
+
+        Args:
+            latency (float): Segundos de la consulta (None si no aplica, ej. descargas S3)
+            throttled (bool): La fuente respondió 503 SlowDown o equivalente
+            health (dict): mysql_health(), si se consultó en este pedido
+        """
+        state = self.state.get(target)
+        if not state:
+            return
+        with self.lock:
+            if health:
+                state['signals'].update({k: v for k, v in health.items() if v is not None})
+            reasons = self._overload(latency, throttled, health)
+            now = self.clock()
+            # Tras una baja se mantiene la ventana: las respuestas de pedidos que
+            # ya estaban en vuelo no describen todavía la carga nueva
+            if state['last_decrease'] is not None and now - state['last_decrease'] < self.settings['cooldown_seconds']:
+                return
+            if reasons:
+                self._decrease(target, state, now, ', '.join(reasons))
+            else:
+                self._increase(target, state, now)
+
+    def _overload(self, latency, throttled, health) -> List[str]:
+        settings = self.settings
+        reasons = []
+        if throttled:
+            reasons.append('SlowDown')
+        if latency is not None and latency * 1000 > settings['max_query_ms']:
+            reasons.append(f"consulta {latency * 1000:.0f} ms")
+        health = health or {}
+        if (health.get('threads_running') or 0) > settings['max_threads_running']:
+            reasons.append(f"Threads_running {health['threads_running']}")
+        if (health.get('replica_lag') or 0) > settings['max_replica_lag']:
+            reasons.append(f"lag de réplica {health['replica_lag']}s")
+        return reasons
+
+    def _decrease(self, target: str, state: Dict, now: float, reason: str):
+        """Baja multiplicativa: ventana y chunk a la mitad; con ventana 1, pausa al doble"""
+        state['last_decrease'] = now
+        state['decreases'] += 1
+        if state['window'] >= 2:
+            state['window'] = max(1.0, state['window'] * DECREASE_FACTOR)
+        else:
+            state['window'] = 1.0
+            state['pause'] = min(MAX_PAUSE_SECONDS, max(MIN_PAUSE_SECONDS, state['pause'] * 2))
+        state['chunk_rows'] = max(self.settings['min_chunk_rows'],
+                                  int(state['chunk_rows'] * DECREASE_FACTOR))
+        self._track(state)
+        self._record(target, state, now, 'decrease', reason)
+
+    def _increase(self, target: str, state: Dict, now: float):
+        """
+        Suba aditiva: primero la pausa se acorta de a poco hasta desaparecer;
+        después, como mucho una vez por probe_seconds (la sonda tiene que llegar
+        a ver el efecto), un worker y un escalón de chunk más
+        """
+        if state['pause']:
+            state['pause'] *= PAUSE_RECOVERY
+            if state['pause'] < MIN_PAUSE_SECONDS / 2:
+                state['pause'] = 0.0
+                state['increases'] += 1
+                self._record(target, state, now, 'increase', 'sin pausa')
+            return
+
+        if state['last_increase'] is not None and now - state['last_increase'] < self.settings['probe_seconds']:
+            return
+        before = (int(state['window']), state['chunk_rows'])
+        state['window'] = min(float(state['ceiling']), int(state['window']) + 1.0)
+        if state['source'] == 'mysql':
+            state['chunk_rows'] = min(self.settings['max_chunk_rows'], state['chunk_rows'] + CHUNK_STEP_ROWS)
+        if (int(state['window']), state['chunk_rows']) != before:
+            state['last_increase'] = now
+            state['increases'] += 1
+            self._track(state)
+            self._record(target, state, now, 'increase', 'fuente sana')
+            self.lock.notify_all()
+
+    def _track(self, state: Dict):
+        workers = int(state['window'])
+        state['min_workers'] = workers if state['min_workers'] is None else min(state['min_workers'], workers)
+        state['max_workers'] = max(state['max_workers'], workers)
+
+    def _record(self, target: str, state: Dict, now: float, action: str, reason: str):
+        decision = {
+            'at_seconds': round(now - self.started, 2),
+            'target': target,
+            'action': action,
+            'workers': int(state['window']),
+            'chunk_rows': state['chunk_rows'],
+            'pause_seconds': round(state['pause'], 2),
+            'reason': reason,
+            'signals': dict(state['signals']),
+        }
+        if len(self.decisions) < MAX_DECISIONS:
+            self.decisions.append(decision)
+        icon = '🐢' if action == 'decrease' else '🐇'
+        chunk = f", chunk {decision['chunk_rows']} filas" if state['source'] == 'mysql' else ''
+        pause = f", pausa {decision['pause_seconds']}s" if state['pause'] else ''
+        print(f"{icon} {target}: {reason} → {decision['workers']} workers{chunk}{pause}")
+
+    def summary(self) -> Dict:
+        """Estado final por target y decisiones, para el resumen de la ejecución"""
+        with self.lock:
+            return {
+                'targets': {
+                    target: {
+                        'source': state['source'],
+                        'workers': int(state['window']),
+                        'min_workers': state['min_workers'],
+                        'max_workers': state['max_workers'],
+                        'chunk_rows': state['chunk_rows'],
+                        'pause_seconds': round(state['pause'], 2),
+                        'increases': state['increases'],
+                        'decreases': state['decreases'],
+                        'signals': dict(state['signals']),
+                    }
+                    for target, state in self.state.items()
+                },
+                'decisions': list(self.decisions),
+            }
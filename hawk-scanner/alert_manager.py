@@ -5,7 +5,61 @@ import sqlite3
 import hashlib
 import json
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
+
+# Versión del layout de la tabla alerts (PRAGMA user_version)
+#   1: alert_hash TEXT UNIQUE + id AUTOINCREMENT (original)
+#   2: alert_key BLOB de 8 bytes UNIQUE (su índice es el único por clave)
+SCHEMA_VERSION = 2
+
+def alert_key(data_source: str, pattern_name: str, location: str) -> bytes:
+    """Clave binaria de una ubicación: blake2b de 8 bytes"""
+    key_string = f"{data_source}|{pattern_name}|{location}"
+    return hashlib.blake2b(key_string.encode(), digest_size=8).digest()
+
+def _key(alert_hash: str) -> bytes:
+    """alert_hash público (16 hex) → clave almacenada"""
+    return bytes.fromhex(alert_hash)
+
+def finding_location(finding: Dict) -> str:
+    """Ubicación del hallazgo (prefijada con el target si existe)"""
+    if finding.get('data_source') == 'mysql':
+        location = f"{finding.get('database')}.{finding.get('table')}.{finding.get('column')}"
+    elif finding.get('data_source') == 's3':
+        location = f"{finding.get('bucket')}/{finding.get('file_path')}"
+    else:
+        return 'unknown'
+
+    # Misma tabla/bucket en distintos hosts o cuentas no deben colisionar
+    if finding.get('profile'):
+        location = f"{finding['profile']}:{location}"
+    return location
+
+def parse_location(data_source: str, location: str) -> Dict:
+    """
+    Inversa de finding_location: campos del hallazgo a partir de la ubicación guardada
+    (perfil:base.tabla.columna o perfil:bucket/archivo; {} si no se reconoce)
+    """
+    if data_source == 's3':
+        bucket, sep, file_path = location.partition('/')
+        if not sep:
+            return {}
+        # Los nombres de bucket no llevan ':', así que un ':' antes de '/' separa el perfil
+        profile, colon, bucket = bucket.rpartition(':')
+        fields = {'bucket': bucket, 'file_path': file_path}
+    elif data_source == 'mysql':
+        profile, colon, rest = location.partition(':')
+        if not colon:
+            profile, rest = '', location
+        parts = rest.rsplit('.', 2)
+        if len(parts) != 3:
+            return {}
+        fields = dict(zip(('database', 'table', 'column'), parts))
+    else:
+        return {}
+    if profile:
+        fields['profile'] = profile
+    return fields
 
 class AlertManager:
     def __init__(self, db_path='/app/data/alerts.db'):
@@ -16,142 +70,289 @@ class AlertManager:
         """Inicializa la base de datos SQLite con schema completo"""
         with sqlite3.connect(self.db_path) as conn:
             c = conn.cursor()
+            # La API de lectura (alerts_api.py) consulta mientras el escaneo escribe
+            c.execute('PRAGMA journal_mode=WAL')
+            version = c.execute('PRAGMA user_version').fetchone()[0]
+            legacy = c.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alerts'"
+            ).fetchone()
+
+            if legacy and version < SCHEMA_VERSION:
+                self._migrate_v1(conn)
+            else:
+                self._create_alerts_table(c, 'alerts')
+
+            self._create_indexes(c)
+            self._create_location_index(c)
+
+            # Tiempo de detección → creación de caso, por alerta y ejecución
             c.execute('''
-                CREATE TABLE IF NOT EXISTS alerts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    alert_hash TEXT UNIQUE NOT NULL,
-                    pattern_name TEXT NOT NULL,
-                    data_source TEXT NOT NULL,
-                    location TEXT NOT NULL,
-                    severity TEXT NOT NULL,
-                    status TEXT DEFAULT 'NEW',
-                    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    count INTEGER DEFAULT 1,
-                    notes TEXT,
-                    thehive_case_id TEXT,
-                    thehive_status TEXT,
-                    reopen_count INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                CREATE TABLE IF NOT EXISTS case_dispatch (
+                    alert_key BLOB NOT NULL,
+                    run_id TEXT NOT NULL,
+                    case_id TEXT NOT NULL,
+                    detected_at TIMESTAMP NOT NULL,
+                    case_created_at TIMESTAMP NOT NULL,
+                    latency_seconds REAL NOT NULL,
+                    PRIMARY KEY (alert_key, run_id)
                 )
             ''')
-
-            # Índices para búsquedas rápidas
-            c.execute('CREATE INDEX IF NOT EXISTS idx_alert_hash ON alerts(alert_hash)')
-            c.execute('CREATE INDEX IF NOT EXISTS idx_severity ON alerts(severity)')
-            c.execute('CREATE INDEX IF NOT EXISTS idx_status ON alerts(status)')
-            c.execute('CREATE INDEX IF NOT EXISTS idx_thehive_case ON alerts(thehive_case_id)')
-
+            # Metadatos de la base (ej: huella de las reglas de severidad aplicadas)
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                ) WITHOUT ROWID
+            ''')
+            # Alertas que subieron a CRITICAL/HIGH por un cambio de reglas y esperan caso
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS escalation_queue (
+                    alert_key BLOB PRIMARY KEY,
+                    severity TEXT NOT NULL,
+                    queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) WITHOUT ROWID
+            ''')
+            c.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
             conn.commit()
 
         print(f"✅ Base de datos inicializada: {self.db_path}")
 
-    def _generate_hash(self, finding: Dict) -> str:
-        """Genera un hash único para el hallazgo"""
-        key_parts = [
-            finding.get('data_source', ''),
-            finding.get('pattern_name', ''),
-            finding.get('database', '') + finding.get('table', '') + finding.get('column', ''),
-            finding.get('bucket', '') + finding.get('file_path', '')
-        ]
+    def _create_alerts_table(self, c, name: str):
+        # Tabla rowid: las altas se agregan al final y solo el índice de la clave
+        # recibe escrituras aleatorias (ver tools/bench_alerts_db.py vs WITHOUT ROWID)
+        c.execute(f'''
+            CREATE TABLE IF NOT EXISTS {name} (
+                alert_key BLOB NOT NULL UNIQUE,
+                pattern_name TEXT NOT NULL,
+                data_source TEXT NOT NULL,
+                location TEXT NOT NULL,
+                severity TEXT NOT NULL,
+                status TEXT DEFAULT 'NEW',
+                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                count INTEGER DEFAULT 1,
+                notes TEXT,
+                thehive_case_id TEXT,
+                thehive_status TEXT,
+                reopen_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    def _create_indexes(self, c):
+        """Índices que cubren las consultas reales (get_stats, get_critical_with_cases)"""
+        # Activas por severidad, críticas pendientes, listado de críticas/high y re-aperturas
+        c.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_status_severity
+            ON alerts(status, severity, thehive_status, reopen_count)
+        ''')
+        # Casos de TheHive por estado (solo alertas con caso)
+        c.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_thehive_status
+            ON alerts(thehive_status, thehive_case_id) WHERE thehive_case_id IS NOT NULL
+        ''')
 
-        key_string = '|'.join(str(p) for p in key_parts)
-        return hashlib.sha256(key_string.encode()).hexdigest()[:16]
+    def _create_location_index(self, c):
+        """
+        Índice FTS5 sobre alerts.location (tabla de contenido externo)
+        Los triggers solo tocan el índice al insertar, borrar o cambiar la
+        ubicación; las actualizaciones de count/status no le agregan escrituras
+        """
+        exists = c.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alerts_fts'"
+        ).fetchone()
+        # '_' y '-' son parte de nombres de bucket/base; '/', '.' y ':' separan niveles
+        c.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS alerts_fts USING fts5(
+                location,
+                content='alerts',
+                content_rowid='rowid',
+                tokenize="unicode61 tokenchars '_-'"
+            )
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS alerts_fts_insert AFTER INSERT ON alerts BEGIN
+                INSERT INTO alerts_fts (rowid, location) VALUES (new.rowid, new.location);
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS alerts_fts_delete AFTER DELETE ON alerts BEGIN
+                INSERT INTO alerts_fts (alerts_fts, rowid, location)
+                VALUES ('delete', old.rowid, old.location);
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS alerts_fts_update AFTER UPDATE OF location ON alerts BEGIN
+                INSERT INTO alerts_fts (alerts_fts, rowid, location)
+                VALUES ('delete', old.rowid, old.location);
+                INSERT INTO alerts_fts (rowid, location) VALUES (new.rowid, new.location);
+            END
+        ''')
+        if not exists:
+            # Base existente: indexar las alertas que ya estaban
+            c.execute("INSERT INTO alerts_fts (alerts_fts) VALUES ('rebuild')")
+
+    def _migrate_v1(self, conn):
+        """
+        Migra en el lugar la tabla original (alert_hash TEXT) al layout v2
+        Las claves se recalculan desde data_source, pattern_name y location;
+        si dos filas viejas caen en la misma clave se fusionan sus contadores.
+        """
+        print("🔧 Migrando tabla alerts al schema v2...")
+        conn.create_function('alert_key', 3, alert_key, deterministic=True)
+        c = conn.cursor()
+        # Todo en una transacción: o queda el layout viejo o el nuevo
+        c.execute('BEGIN')
+        c.execute('DROP TABLE IF EXISTS alerts_v2')
+        self._create_alerts_table(c, 'alerts_v2')
+        c.execute('''
+            INSERT INTO alerts_v2
+            (alert_key, pattern_name, data_source, location, severity, status,
+             first_seen, last_seen, count, notes, thehive_case_id, thehive_status,
+             reopen_count, created_at)
+            SELECT alert_key(data_source, pattern_name, location), pattern_name,
+                   data_source, location, severity, status, first_seen, last_seen,
+                   count, notes, thehive_case_id, thehive_status, reopen_count, created_at
+            FROM alerts
+            WHERE true
+            ORDER BY id
+            ON CONFLICT(alert_key) DO UPDATE SET
+                count = count + excluded.count,
+                first_seen = MIN(first_seen, excluded.first_seen),
+                last_seen = MAX(last_seen, excluded.last_seen)
+        ''')
+        migrated = c.rowcount
+        c.execute('DROP TABLE alerts')
+        c.execute('ALTER TABLE alerts_v2 RENAME TO alerts')
+        # AUTOINCREMENT ya no se usa
+        c.execute("DELETE FROM sqlite_sequence WHERE name = 'alerts'")
+        print(f"   ✅ {migrated} alertas migradas")
+
+    def _generate_hash(self, finding: Dict) -> str:
+        """Genera un hash único para el hallazgo (16 hex de la clave binaria)"""
+        return alert_key(
+            finding.get('data_source', 'unknown'),
+            finding.get('pattern_name', 'Unknown'),
+            self._get_location(finding)
+        ).hex()
 
     def process_finding(self, finding: Dict) -> Dict:
         """Procesa un hallazgo: lo registra o actualiza si ya existe"""
-        alert_hash = self._generate_hash(finding)
+        return self.process_findings([finding])[0]
 
+    def process_findings(self, findings: List[Dict], run_id: Optional[str] = None) -> List[Optional[Dict]]:
+        """
+        Procesa un lote de hallazgos en una sola transacción
+        Con run_id cada ubicación queda registrada en run_location (ver run_diff.py)
+        en la misma transacción: la que ya estaba registrada en la ejecución
+        (partes siguientes, --resume) no se vuelve a contar y devuelve None
+        """
+        results = []
         with sqlite3.connect(self.db_path) as conn:
             c = conn.cursor()
+            for finding in findings:
+                alert_hash = self._generate_hash(finding)
+                if run_id is not None:
+                    c.execute('''
+                        INSERT OR IGNORE INTO run_location (run_id, alert_key, target, severity)
+                        VALUES (?, ?, ?, ?)
+                    ''', (run_id, _key(alert_hash), finding.get('profile', ''), finding.get('severity')))
+                    if not c.rowcount:
+                        results.append(None)
+                        continue
+                results.append(self._process(c, finding, alert_hash))
+            conn.commit()
+        return results
 
-            # Verificar si ya existe
-            c.execute('''
-                SELECT id, count, thehive_status, reopen_count
-                FROM alerts
-                WHERE alert_hash = ?
-            ''', (alert_hash,))
-            existing = c.fetchone()
+    def _process(self, c, finding: Dict, alert_hash: str) -> Dict:
+        """Registra o actualiza un hallazgo (sin commit)"""
+        key = _key(alert_hash)
+        # Verificar si ya existe
+        c.execute('''
+            SELECT count, thehive_status, reopen_count
+            FROM alerts
+            WHERE alert_key = ?
+        ''', (key,))
+        existing = c.fetchone()
 
-            if existing:
-                alert_id, current_count, thehive_status, reopen_count = existing
+        if existing:
+            current_count, thehive_status, reopen_count = existing
 
-                # 🔥 NUEVA LÓGICA: Si fue resuelto y aparece de nuevo → RE-ABRIR
-                resolved_states = ['TruePositive', 'Resolved', 'Closed']
+            # 🔥 NUEVA LÓGICA: Si fue resuelto y aparece de nuevo → RE-ABRIR
+            resolved_states = ['TruePositive', 'Resolved', 'Closed']
 
-                if thehive_status in resolved_states:
-                    # Ya fue resuelto pero vuelve a aparecer → RE-OCURRENCIA
-                    print(f"   🔄 Re-ocurrencia detectada: {finding.get('pattern_name')}")
+            if thehive_status in resolved_states:
+                # Ya fue resuelto pero vuelve a aparecer → RE-OCURRENCIA
+                print(f"   🔄 Re-ocurrencia detectada: {finding.get('pattern_name')}")
 
-                    c.execute('''
-                        UPDATE alerts
-                        SET count = count + 1,
-                            last_seen = CURRENT_TIMESTAMP,
-                            status = 'REOPENED',
-                            thehive_status = NULL,
-                            thehive_case_id = NULL,
-                            reopen_count = reopen_count + 1
-                        WHERE alert_hash = ?
-                    ''', (alert_hash,))
-                    conn.commit()
-
-                    return {
-                        'is_new': True,  # ✅ Tratar como NUEVO para crear caso
-                        'is_reopen': True,
-                        'alert_hash': alert_hash,
-                        'count': current_count + 1,
-                        'reopen_count': reopen_count + 1,
-                        'finding': finding
-                    }
-                else:
-                    # Ya existe y sigue pendiente → Incrementar contador
-                    c.execute('''
-                        UPDATE alerts
-                        SET count = count + 1,
-                            last_seen = CURRENT_TIMESTAMP
-                        WHERE alert_hash = ?
-                    ''', (alert_hash,))
-                    conn.commit()
-
-                    return {
-                        'is_new': False,
-                        'is_reopen': False,
-                        'alert_hash': alert_hash,
-                        'count': current_count + 1,
-                        'finding': finding
-                    }
-            else:
-                # Nuevo: insertar
-                location = self._get_location(finding)
+                c.execute('''
+                    UPDATE alerts
+                    SET count = count + 1,
+                        last_seen = CURRENT_TIMESTAMP,
+                        status = 'REOPENED',
+                        thehive_status = NULL,
+                        thehive_case_id = NULL,
+                        reopen_count = reopen_count + 1
+                    WHERE alert_key = ?
+                ''', (key,))
 
+                return {
+                    'is_new': True,  # ✅ Tratar como NUEVO para crear caso
+                    'is_reopen': True,
+                    'alert_hash': alert_hash,
+                    'count': current_count + 1,
+                    'reopen_count': reopen_count + 1,
+                    'finding': finding
+                }
+            else:
+                # Ya existe y sigue pendiente → Incrementar contador
+                # (si se había cerrado como GONE vuelve a su estado activo)
                 c.execute('''
-                    INSERT INTO alerts
-                    (alert_hash, pattern_name, data_source, location, severity, status)
-                    VALUES (?, ?, ?, ?, ?, 'NEW')
-                ''', (
-                    alert_hash,
-                    finding.get('pattern_name', 'Unknown'),
-                    finding.get('data_source', 'unknown'),
-                    location,
-                    finding.get('severity', 'LOW')
-                ))
-                conn.commit()
+                    UPDATE alerts
+                    SET count = count + 1,
+                        last_seen = CURRENT_TIMESTAMP,
+                        status = CASE
+                            WHEN status != 'GONE' THEN status
+                            WHEN thehive_case_id IS NULL THEN 'NEW'
+                            ELSE 'SENT'
+                        END
+                    WHERE alert_key = ?
+                ''', (key,))
 
                 return {
-                    'is_new': True,
+                    'is_new': False,
                     'is_reopen': False,
                     'alert_hash': alert_hash,
-                    'count': 1,
+                    'count': current_count + 1,
                     'finding': finding
                 }
+        else:
+            # Nuevo: insertar
+            location = self._get_location(finding)
+
+            c.execute('''
+                INSERT INTO alerts
+                (alert_key, pattern_name, data_source, location, severity, status)
+                VALUES (?, ?, ?, ?, ?, 'NEW')
+            ''', (
+                key,
+                finding.get('pattern_name', 'Unknown'),
+                finding.get('data_source', 'unknown'),
+                location,
+                finding.get('severity', 'LOW')
+            ))
+
+            return {
+                'is_new': True,
+                'is_reopen': False,
+                'alert_hash': alert_hash,
+                'count': 1,
+                'finding': finding
+            }
 
     def _get_location(self, finding: Dict) -> str:
-        """Extrae la ubicación del hallazgo"""
-        if finding.get('data_source') == 'mysql':
-            return f"{finding.get('database')}.{finding.get('table')}.{finding.get('column')}"
-        elif finding.get('data_source') == 's3':
-            return f"{finding.get('bucket')}/{finding.get('file_path')}"
-        return 'unknown'
+        """Extrae la ubicación del hallazgo (prefijada con el target si existe)"""
+        return finding_location(finding)
 
     def update_thehive_case(self, alert_hash: str, case_id: str, status: str = 'New'):
         """Actualiza el caso de TheHive asociado a una alerta"""
@@ -163,8 +364,25 @@ class AlertManager:
                     thehive_status = ?,
                     status = 'SENT',
                     last_seen = CURRENT_TIMESTAMP
-                WHERE alert_hash = ?
-            ''', (case_id, status, alert_hash))
+                WHERE alert_key = ?
+            ''', (case_id, status, _key(alert_hash)))
+            conn.commit()
+
+    def record_case_dispatch(self, alert_hash: str, run_id: str, case_id: str,
+                             detected_at: float, case_created_at: float):
+        """Registra cuánto tardó en crearse el caso desde que se detectó el hallazgo"""
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''
+                INSERT OR REPLACE INTO case_dispatch
+                (alert_key, run_id, case_id, detected_at, case_created_at, latency_seconds)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                _key(alert_hash), run_id or '', case_id,
+                datetime.fromtimestamp(detected_at).isoformat(sep=' '),
+                datetime.fromtimestamp(case_created_at).isoformat(sep=' '),
+                round(case_created_at - detected_at, 3)
+            ))
             conn.commit()
 
     def get_critical_with_cases(self):
@@ -173,7 +391,7 @@ class AlertManager:
             c = conn.cursor()
             c.execute('''
                 SELECT
-                    alert_hash,
+                    lower(hex(alert_key)),
                     pattern_name,
                     severity,
                     thehive_case_id,
@@ -245,24 +463,287 @@ class AlertManager:
 
     def mark_as_false_positive(self, alert_hash: str, notes: str = ''):
         """Marca una alerta como falso positivo"""
+        self.mark_alerts('FALSE_POSITIVE', [alert_hash], notes=notes)
+
+    def mark_as_acknowledged(self, alert_hash: str, notes: str = ''):
+        """Marca una alerta como reconocida"""
+        self.mark_alerts('ACKNOWLEDGED', [alert_hash], notes=notes)
+
+    def mark_alerts(self, status: str, alert_hashes: Iterable[str] = (),
+                    location_globs: Iterable[str] = (), notes: str = '',
+                    dry_run: bool = False) -> int:
+        """
+        Cambia el estado de todas las alertas indicadas en una sola transacción
+
+        Args:
+            alert_hashes: alert_hash (16 hex)
+            location_globs: patrones GLOB sobre location (ej: 'db1:pocdb.users.*')
+            dry_run: cuenta sin modificar
+
+        Returns:
+            int: alertas que coinciden
+        """
+        keys = [(_key(h),) for h in dict.fromkeys(alert_hashes)]
+        globs = list(dict.fromkeys(location_globs))
+        if not keys and not globs:
+            return 0
+
+        # El context manager hace rollback si algo falla: todo o nada
         with sqlite3.connect(self.db_path) as conn:
             c = conn.cursor()
-            c.execute('''
+            c.execute('BEGIN IMMEDIATE')
+            c.execute('CREATE TEMP TABLE IF NOT EXISTS mark_keys (alert_key BLOB PRIMARY KEY) WITHOUT ROWID')
+            c.execute('DELETE FROM mark_keys')
+            c.executemany('INSERT OR IGNORE INTO mark_keys VALUES (?)', keys)
+
+            where = ' OR '.join(['alert_key IN (SELECT alert_key FROM mark_keys)'] +
+                                ['location GLOB ?'] * len(globs))
+            if dry_run:
+                count = c.execute(f'SELECT COUNT(*) FROM alerts WHERE {where}', globs).fetchone()[0]
+                conn.rollback()
+                return count
+
+            c.execute(f'UPDATE alerts SET status = ?, notes = ? WHERE {where}',
+                      [status, notes] + globs)
+            count = c.rowcount
+            conn.commit()
+            return count
+
+    def mark_as_gone(self, alert_hashes: List[str]) -> int:
+        """
+        Cierra alertas activas cuya ubicación ya no aparece en el escaneo
+        Las que tienen un caso abierto en TheHive quedan activas: GONE las saca
+        de la sincronización (get_critical_with_cases) y el caso quedaría huérfano
+
+        Returns:
+            int: cantidad de alertas cerradas
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.executemany('''
                 UPDATE alerts
-                SET status = 'FALSE_POSITIVE',
-                    notes = ?
-                WHERE alert_hash = ?
-            ''', (notes, alert_hash))
+                SET status = 'GONE',
+                    notes = 'Ubicación sin hallazgos en el último escaneo'
+                WHERE alert_key = ?
+                AND status IN ('NEW', 'SENT', 'REOPENED')
+                AND (thehive_case_id IS NULL
+                     OR thehive_status IN ('TruePositive', 'Resolved', 'Closed'))
+            ''', [(_key(h),) for h in alert_hashes])
             conn.commit()
+            return c.rowcount
 
-    def mark_as_acknowledged(self, alert_hash: str, notes: str = ''):
-        """Marca una alerta como reconocida"""
+    def backfill_profiles(self, profiles_by_source: Dict[str, List[str]]) -> int:
+        """
+        Prefija con el target las ubicaciones guardadas antes de los targets con
+        nombre (`pocdb.users.email` → `mysql1:pocdb.users.email`) y recalcula sus
+        claves, así el triage, los casos de TheHive y el historial siguen a la
+        alerta en vez de aparecer como una alerta nueva. Solo para fuentes con
+        un único perfil: con varios no se sabe a cuál pertenecía la ubicación.
+        Se hace una vez por base (tabla meta)
+
+        Args:
+            profiles_by_source (dict): {'mysql': ['mysql1'], 's3': [...]} de connection.yml
+
+        Returns:
+            int: alertas migradas
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.create_function('alert_key', 3, alert_key, deterministic=True)
+            c = conn.cursor()
+            if c.execute("SELECT 1 FROM meta WHERE key = 'location_profiles'").fetchone():
+                return 0
+
+            c.execute('BEGIN IMMEDIATE')
+            c.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS key_remap (
+                    old_key BLOB PRIMARY KEY,
+                    new_key BLOB NOT NULL,
+                    location TEXT NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            c.execute('DELETE FROM key_remap')
+            for source, profiles in profiles_by_source.items():
+                if len(profiles) != 1:
+                    ambiguous = c.execute('''
+                        SELECT COUNT(*) FROM alerts WHERE data_source = ? AND instr(location, ':') = 0
+                    ''', (source,)).fetchone()[0]
+                    if ambiguous:
+                        print(f"⚠️  {ambiguous} alertas {source} sin target y {len(profiles)} perfiles: "
+                              f"no se pueden asignar, aparecerán como nuevas")
+                    continue
+                prefix = f"{profiles[0]}:"
+                c.execute('''
+                    INSERT INTO key_remap (old_key, new_key, location)
+                    SELECT alert_key, alert_key(data_source, pattern_name, ? || location), ? || location
+                    FROM alerts
+                    WHERE data_source = ? AND substr(location, 1, ?) != ?
+                ''', (prefix, prefix, source, len(prefix), prefix))
+
+            # Ubicaciones que una ejecución posterior ya insertó con prefijo: se
+            # fusionan en la fila vieja, que es la que tiene el triage
+            c.execute('''
+                UPDATE alerts AS old
+                SET count = old.count + dup.count,
+                    last_seen = MAX(old.last_seen, dup.last_seen),
+                    thehive_status = CASE WHEN old.thehive_case_id IS NULL
+                                          THEN dup.thehive_status ELSE old.thehive_status END,
+                    thehive_case_id = COALESCE(old.thehive_case_id, dup.thehive_case_id)
+                FROM key_remap r JOIN alerts dup ON dup.alert_key = r.new_key
+                WHERE old.alert_key = r.old_key
+            ''')
+            c.execute('DELETE FROM alerts WHERE alert_key IN (SELECT new_key FROM key_remap)')
+            c.execute('''
+                UPDATE alerts SET alert_key = r.new_key, location = r.location
+                FROM key_remap r
+                WHERE alerts.alert_key = r.old_key
+            ''')
+            migrated = c.rowcount
+
+            # Tablas que referencian la clave (las crean otros módulos)
+            for table in ('run_location', 'case_dispatch', 'escalation_queue', 'match_locations'):
+                exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                   (table,)).fetchone()
+                if exists:
+                    c.execute(f'''
+                        UPDATE OR REPLACE {table} SET alert_key = r.new_key
+                        FROM key_remap r
+                        WHERE {table}.alert_key = r.old_key
+                    ''')
+
+            c.execute("INSERT INTO meta (key, value) VALUES ('location_profiles', ?)",
+                      (json.dumps(profiles_by_source, sort_keys=True),))
+            conn.commit()
+            c.execute('DROP TABLE key_remap')
+
+        if migrated:
+            print(f"🔧 {migrated} alertas anteriores a los targets con nombre asociadas a su perfil")
+        return migrated
+
+    def reclassify_history(self, rules: Dict[str, str], default: str, fingerprint: str) -> Optional[Dict]:
+        """
+        Aplica las reglas de severidad vigentes a todas las alertas guardadas,
+        solo si cambiaron desde la última vez (huella en la tabla meta)
+
+        Todo es SQL por conjuntos en una transacción: una tabla temporal
+        patrón → severidad y un único UPDATE ... FROM sobre alerts. Las alertas
+        activas sin caso que suben a CRITICAL/HIGH quedan en escalation_queue.
+
+        Returns:
+            dict: {'reclassified', 'escalated', 'previous'} o None si no cambió nada
+        """
         with sqlite3.connect(self.db_path) as conn:
             c = conn.cursor()
+            row = c.execute("SELECT value FROM meta WHERE key = 'severity_rules'").fetchone()
+            previous = row[0] if row else None
+            if previous == fingerprint:
+                return None
+
+            c.execute('BEGIN IMMEDIATE')
+            c.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS severity_rules (
+                    pattern_name TEXT PRIMARY KEY,
+                    severity TEXT NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            c.execute('DELETE FROM severity_rules')
+            c.executemany('INSERT INTO severity_rules VALUES (?, ?)', rules.items())
+            # Patrones históricos que ya no figuran en el mapa: severidad por defecto
+            c.execute('''
+                INSERT OR IGNORE INTO severity_rules
+                SELECT DISTINCT pattern_name, ? FROM alerts
+            ''', (default,))
+
+            c.execute('''
+                INSERT OR IGNORE INTO escalation_queue (alert_key, severity)
+                SELECT a.alert_key, r.severity
+                FROM alerts a JOIN severity_rules r ON r.pattern_name = a.pattern_name
+                WHERE r.severity IN ('CRITICAL', 'HIGH')
+                AND a.severity NOT IN ('CRITICAL', 'HIGH')
+                AND a.status IN ('NEW', 'SENT', 'REOPENED')
+                AND a.thehive_case_id IS NULL
+            ''')
+            escalated = c.rowcount
+
             c.execute('''
                 UPDATE alerts
-                SET status = 'ACKNOWLEDGED',
-                    notes = ?
-                WHERE alert_hash = ?
-            ''', (notes, alert_hash))
+                SET severity = r.severity
+                FROM severity_rules r
+                WHERE r.pattern_name = alerts.pattern_name
+                AND alerts.severity != r.severity
+            ''')
+            reclassified = c.rowcount
+
+            c.execute('''
+                INSERT INTO meta (key, value) VALUES ('severity_rules', ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            ''', (fingerprint,))
+            conn.commit()
+            c.execute('DROP TABLE severity_rules')
+
+            return {'reclassified': reclassified, 'escalated': escalated, 'previous': previous}
+
+    def pending_escalations(self, limit: int = 500) -> List[Dict]:
+        """
+        Alertas escaladas que esperan caso, con el formato de process_finding
+        Los matches no se guardan en alerts: la ubicación se descompone en sus
+        campos y el hallazgo queda marcado como reclasificado
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT lower(hex(a.alert_key)), a.pattern_name, a.data_source, a.location, a.severity
+                FROM escalation_queue q JOIN alerts a ON a.alert_key = q.alert_key
+                WHERE a.status IN ('NEW', 'SENT', 'REOPENED')
+                AND a.thehive_case_id IS NULL
+                ORDER BY q.queued_at
+                LIMIT ?
+            ''', (limit,))
+            return [{
+                'alert_hash': alert_hash,
+                'is_reopen': False,
+                'finding': dict(
+                    parse_location(data_source, location),
+                    pattern_name=pattern_name,
+                    data_source=data_source,
+                    location=location,
+                    severity=severity,
+                    matches=[],
+                    reclassified=True,
+                ),
+            } for alert_hash, pattern_name, data_source, location, severity in c.fetchall()]
+
+    def run_alerts_without_case(self, run_id: str, severities: Iterable[str]) -> Dict[str, bool]:
+        """Alertas registradas en la ejecución que esperan caso: alert_hash → is_reopen"""
+        severities = list(severities)
+        placeholders = ','.join('?' * len(severities))
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute(f'''
+                SELECT lower(hex(a.alert_key)), a.status = 'REOPENED'
+                FROM run_location l JOIN alerts a ON a.alert_key = l.alert_key
+                WHERE l.run_id = ?
+                AND a.severity IN ({placeholders})
+                AND a.status IN ('NEW', 'REOPENED')
+                AND a.thehive_case_id IS NULL
+            ''', (run_id, *severities))
+            return {alert_hash: bool(is_reopen) for alert_hash, is_reopen in c.fetchall()}
+
+    def clear_escalation(self, alert_hash: str):
+        """Saca una alerta de la cola de escalamiento (ya tiene caso)"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('DELETE FROM escalation_queue WHERE alert_key = ?', (_key(alert_hash),))
             conn.commit()
+
+    def get_locations(self, alert_hashes: List[str]) -> Dict[str, str]:
+        """Ubicación de cada alert_hash (para mostrar muestras del diff)"""
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            locations = {}
+            for alert_hash in alert_hashes:
+                c.execute('''
+                    SELECT pattern_name, location FROM alerts WHERE alert_key = ?
+                ''', (_key(alert_hash),))
+                row = c.fetchone()
+                if row:
+                    locations[alert_hash] = f"{row[1]} ({row[0]})"
+            return locations
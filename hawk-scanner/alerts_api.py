@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+API HTTP/JSON de solo lectura sobre alerts.db para los dashboards del SOC
+Expone las consultas de alerts_reader.py con caché ETag/If-None-Match
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from alert_manager import AlertManager
+from alerts_reader import DEFAULT_LIMIT, FILTERS, MAX_LIMIT, AlertsReader, location_query
+
+ALERT_PATH = re.compile(r'^/api/alerts/([0-9a-f]{16})$')
+
+
+def parse_list_params(query: Dict[str, List[str]]) -> Dict:
+    """Parámetros de /api/alerts validados; ?severity=CRITICAL,HIGH o repetido"""
+    filters = {}
+    for name in FILTERS:
+        values = [v.strip() for raw in query.get(name, []) for v in raw.split(',') if v.strip()]
+        if values:
+            filters[name] = sorted(set(values))
+
+    try:
+        limit = int(query.get('limit', [DEFAULT_LIMIT])[0])
+        cursor = query.get('cursor', [None])[0]
+        cursor = int(cursor) if cursor else None
+    except ValueError:
+        raise ValueError("limit y cursor deben ser enteros")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit debe estar entre 1 y {MAX_LIMIT}")
+
+    search = (query.get('q', [''])[0]).strip() or None
+    if search:
+        location_query(search)
+    return {'filters': filters, 'search': search, 'cursor': cursor, 'limit': limit}
+
+
+class AlertsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    reader: AlertsReader = None
+    quiet = True
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+    def _send(self, status: int, body: bytes = b'', headers: Optional[Dict] = None):
+        self.send_response(status)
+        if body:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _error(self, status: int, message: str):
+        self._send(status, json.dumps({'error': message}, ensure_ascii=False).encode('utf-8'))
+
+    def _send_cached(self, key: Tuple, compute: Callable[[], Optional[Dict]]):
+        """200 con ETag, o 304 si el cliente ya tiene esa versión"""
+        etag, body = self.reader.cached(key, compute)
+        if body == b'null':
+            self._error(404, 'Alerta no encontrada')
+            return
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in (t.strip() for t in self.headers.get('If-None-Match', '').split(',')):
+            self._send(304, headers=headers)
+        else:
+            self._send(200, body, headers)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == '/health':
+                self._send(200, b'{"status": "ok"}')
+            elif url.path == '/api/alerts':
+                params = parse_list_params(query)
+                key = ('alerts', json.dumps(params, sort_keys=True))
+                self._send_cached(key, lambda: self.reader.list_alerts(**params))
+            elif ALERT_PATH.match(url.path):
+                alert_hash = ALERT_PATH.match(url.path).group(1)
+                self._send_cached(('alert', alert_hash), lambda: self.reader.get_alert(alert_hash))
+            elif url.path == '/api/stats':
+                self._send_cached(('stats',), self.reader.stats)
+            else:
+                self._error(404, 'Ruta no encontrada')
+        except ValueError as e:
+            self._error(400, str(e))
+        except sqlite3.OperationalError as e:
+            self._error(503, f"Base no disponible: {e}")
+
+
+def serve(db_path: str, host='127.0.0.1', port=8088, quiet=True) -> ThreadingHTTPServer:
+    """Levanta la API en un hilo; port=0 elige un puerto libre (server.server_port)"""
+    handler = type('Handler', (AlertsHandler,), {'reader': AlertsReader(db_path), 'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='alerts-api', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API de solo lectura sobre alerts.db')
+    parser.add_argument('--db', default='/app/data/alerts.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--verbose', action='store_true', help='Loguear cada request')
+    args = parser.parse_args()
+
+    # Crea la base, el modo WAL y el índice FTS5 si todavía no existen
+    AlertManager(args.db)
+
+    server = serve(args.db, args.host, args.port, quiet=not args.verbose)
+    print(f"🔎 API de alertas en http://{args.host}:{server.server_port}/api/alerts")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Consultas read-only sobre alerts.db (API HTTP y hawkctl)
+Listado paginado por keyset (rowid), filtros por severidad, estado, fuente y
+patrón, búsqueda de ubicaciones con el índice FTS5 y caché por versión de la
+base. Las conexiones son read-only sobre una base en WAL: leen un snapshot y
+nunca toman el lock de escritura del escaneo
+"""
+
+import hashlib
+import json
+import queue
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+POOL_SIZE = 8          # conexiones de lectura reutilizadas entre requests
+CACHE_SIZE = 256       # respuestas cacheadas (se invalidan con cada commit)
+
+SEARCH_TOKEN = re.compile(r'[\w\-]+')
+
+# Parámetro de query → columna de alerts
+FILTERS = {
+    'severity': 'severity',
+    'status': 'status',
+    'source': 'data_source',
+    'pattern': 'pattern_name',
+}
+
+ALERT_COLUMNS = '''
+    rowid, lower(hex(alert_key)), pattern_name, data_source, location, severity,
+    status, first_seen, last_seen, count, notes, thehive_case_id, thehive_status,
+    reopen_count
+'''
+ALERT_FIELDS = ('alert_hash', 'pattern_name', 'data_source', 'location', 'severity',
+                'status', 'first_seen', 'last_seen', 'count', 'notes', 'thehive_case_id',
+                'thehive_status', 'reopen_count')
+
+
+def location_query(text: str) -> str:
+    """
+    Texto de búsqueda → consulta FTS5: frase con prefijo en el último término
+    ('ventas-prod/exports/2024' → "ventas-prod exports 2024"*)
+    """
+    tokens = SEARCH_TOKEN.findall(text)
+    if not tokens:
+        raise ValueError("Búsqueda de ubicación vacía")
+    return '"' + ' '.join(tokens) + '"*'
+
+
+class AlertsReader:
+    """Consultas read-only con pool de conexiones y caché por versión de la base"""
+
+    def __init__(self, db_path='/app/data/alerts.db', pool_size=POOL_SIZE):
+        self.db_path = db_path
+        self.pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self.pool.put(None)
+
+        # PRAGMA data_version cambia cuando otra conexión hace commit
+        self.watcher = self._connect()
+        self.watcher_lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{quote(self.db_path)}?mode=ro", uri=True,
+                               check_same_thread=False)
+
+    @contextmanager
+    def _connection(self):
+        conn = self.pool.get()
+        try:
+            if conn is None:
+                conn = self._connect()
+            yield conn
+        finally:
+            self.pool.put(conn)
+
+    def version(self) -> int:
+        with self.watcher_lock:
+            return self.watcher.execute('PRAGMA data_version').fetchone()[0]
+
+    def cached(self, key: Tuple, compute: Callable[[], Dict]) -> Tuple[str, bytes]:
+        """
+        Respuesta serializada y su ETag; se recalcula solo si hubo commits
+        desde que se cacheó
+
+        Returns:
+            (etag, body)
+        """
+        version = self.version()
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry and entry[0] == version:
+                self.cache.move_to_end(key)
+                return entry[1], entry[2]
+
+        body = json.dumps(compute(), ensure_ascii=False).encode('utf-8')
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        with self.cache_lock:
+            # La versión es la leída antes de consultar: un commit intermedio
+            # solo provoca un recálculo de más, nunca una respuesta vieja
+            self.cache[key] = (version, etag, body)
+            self.cache.move_to_end(key)
+            while len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return etag, body
+
+    def list_alerts(self, filters: Dict[str, List[str]], search: Optional[str] = None,
+                    cursor: Optional[int] = None, limit: int = DEFAULT_LIMIT) -> Dict:
+        """
+        Alertas de la más nueva a la más vieja, paginadas por rowid
+        (WHERE rowid < cursor: cada página cuesta lo mismo, sin OFFSET)
+        """
+        conditions, params = [], []
+        for name, values in filters.items():
+            conditions.append(f"{FILTERS[name]} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        if search:
+            conditions.append('rowid IN (SELECT rowid FROM alerts_fts WHERE alerts_fts MATCH ?)')
+            params.append(location_query(search))
+        if cursor is not None:
+            conditions.append('rowid < ?')
+            params.append(cursor)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self._connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {ALERT_COLUMNS} FROM alerts
+                {where}
+                ORDER BY rowid DESC
+                LIMIT ?
+            ''', params + [limit + 1]).fetchall()
+
+        page = rows[:limit]
+        return {
+            'items': [dict(zip(ALERT_FIELDS, row[1:])) for row in page],
+            'next_cursor': str(page[-1][0]) if len(rows) > limit else None,
+        }
+
+    def get_alert(self, alert_hash: str) -> Optional[Dict]:
+        with self._connection() as conn:
+            row = conn.execute(f'SELECT {ALERT_COLUMNS} FROM alerts WHERE alert_key = ?',
+                               (bytes.fromhex(alert_hash),)).fetchone()
+        return dict(zip(ALERT_FIELDS, row[1:])) if row else None
+
+    def stats(self) -> Dict:
+        """Conteos por estado y por severidad de las activas (mismo criterio que get_stats)"""
+        # Un solo recorrido, en orden, de idx_alerts_status_severity
+        with self._connection() as conn:
+            rows = conn.execute('''
+                SELECT status, severity, COUNT(*) FROM alerts
+                GROUP BY status, severity
+            ''').fetchall()
+
+        by_status, by_severity = Counter(), Counter()
+        for status, severity, count in rows:
+            by_status[status] += count
+            if status in ('NEW', 'REOPENED', 'SENT'):
+                by_severity[severity] += count
+        return {'total': sum(by_status.values()), 'by_severity': dict(by_severity),
+                'by_status': dict(by_status)}
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Checkpoints por unidad de trabajo en alerts.db
+Permite reanudar un escaneo interrumpido sin repetir el trabajo ya hecho
+"""
+
+import json
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Set
+
+
+class CheckpointStore:
+    def __init__(self, db_path='/app/data/alerts.db'):
+        self.db_path = db_path
+        self._init_db()
+
+    def _connect(self):
+        # Varios workers escriben checkpoints a la vez
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """Crea las tablas de ejecuciones, unidades y checkpoints parciales"""
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('PRAGMA journal_mode=WAL')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS scan_runs (
+                    run_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL DEFAULT 'RUNNING',
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    resumed_count INTEGER DEFAULT 0
+                )
+            ''')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS scan_units (
+                    run_id TEXT NOT NULL,
+                    unit_key TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'PENDING',
+                    finding_count INTEGER DEFAULT 0,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    PRIMARY KEY (run_id, unit_key)
+                )
+            ''')
+            # Historial por unidad entre ejecuciones (scheduler.py)
+            c.execute('''
+                CREATE INDEX IF NOT EXISTS idx_scan_units_unit
+                ON scan_units(unit_key, run_id)
+            ''')
+            # Una fila por parte terminada (chunk de tabla, objeto S3) con sus hallazgos
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS scan_checkpoints (
+                    run_id TEXT NOT NULL,
+                    unit_key TEXT NOT NULL,
+                    part_key TEXT NOT NULL,
+                    findings TEXT NOT NULL,
+                    finding_count INTEGER NOT NULL,
+                    saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (run_id, unit_key, part_key)
+                )
+            ''')
+            conn.commit()
+
+    def start_run(self, run_id: str, units: List[Dict]):
+        """Registra una ejecución nueva y todas sus unidades como PENDING"""
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('INSERT INTO scan_runs (run_id) VALUES (?)', (run_id,))
+            c.executemany('''
+                INSERT INTO scan_units (run_id, unit_key, target, source)
+                VALUES (?, ?, ?, ?)
+            ''', [(run_id, u['key'], u['target'], u['source']) for u in units])
+            conn.commit()
+
+    def last_interrupted_run(self) -> Optional[str]:
+        """Última ejecución cortada (RUNNING) o terminada con unidades fallidas (INCOMPLETE)"""
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT run_id FROM scan_runs
+                WHERE status IN ('RUNNING', 'INCOMPLETE')
+                ORDER BY started_at DESC, run_id DESC
+                LIMIT 1
+            ''')
+            row = c.fetchone()
+            return row[0] if row else None
+
+    def resume_run(self, run_id: str, units: List[Dict]) -> Set[str]:
+        """
+        Prepara una ejecución interrumpida para continuar
+
+        Returns:
+            set: unit_keys ya terminadas (no hay que volver a escanearlas)
+        """
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                UPDATE scan_runs
+                SET status = 'RUNNING', finished_at = NULL, resumed_count = resumed_count + 1
+                WHERE run_id = ?
+            ''', (run_id,))
+            # Unidades nuevas en la configuración desde la ejecución original
+            c.executemany('''
+                INSERT OR IGNORE INTO scan_units (run_id, unit_key, target, source)
+                VALUES (?, ?, ?, ?)
+            ''', [(run_id, u['key'], u['target'], u['source']) for u in units])
+            c.execute('''
+                SELECT unit_key FROM scan_units
+                WHERE run_id = ? AND status = 'DONE'
+            ''', (run_id,))
+            done = {row[0] for row in c.fetchall()}
+            conn.commit()
+            return done
+
+    def start_unit(self, run_id: str, unit_key: str):
+        with self._connect() as conn:
+            conn.execute('''
+                UPDATE scan_units
+                SET status = 'RUNNING', started_at = CURRENT_TIMESTAMP
+                WHERE run_id = ? AND unit_key = ?
+            ''', (run_id, unit_key))
+            conn.commit()
+
+    def finish_unit(self, run_id: str, unit_key: str, status: str = 'DONE'):
+        """Cierra una unidad (DONE, FAILED o SKIPPED) con el total de hallazgos de sus partes"""
+        with self._connect() as conn:
+            conn.execute('''
+                UPDATE scan_units
+                SET status = ?,
+                    finished_at = CURRENT_TIMESTAMP,
+                    finding_count = (
+                        SELECT COALESCE(SUM(finding_count), 0) FROM scan_checkpoints
+                        WHERE run_id = ? AND unit_key = ?
+                    )
+                WHERE run_id = ? AND unit_key = ?
+            ''', (status, run_id, unit_key, run_id, unit_key))
+            conn.commit()
+
+    def completed_parts(self, run_id: str, unit_key: str) -> Set[str]:
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT part_key FROM scan_checkpoints
+                WHERE run_id = ? AND unit_key = ?
+            ''', (run_id, unit_key))
+            return {row[0] for row in c.fetchall()}
+
+    def save_part(self, run_id: str, unit_key: str, part_key: str, findings: List[Dict]):
+        """Persiste los hallazgos de una parte apenas termina"""
+        with self._connect() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO scan_checkpoints
+                (run_id, unit_key, part_key, findings, finding_count)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (run_id, unit_key, part_key, json.dumps(findings, default=str), len(findings)))
+            conn.commit()
+
+    def iter_findings(self, run_id: str) -> Iterator[Dict]:
+        """Todos los hallazgos checkpointeados de la ejecución, parte por parte"""
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT findings FROM scan_checkpoints
+                WHERE run_id = ? AND finding_count > 0
+                ORDER BY unit_key, part_key
+            ''', (run_id,))
+            for (findings,) in c:
+                yield from json.loads(findings)
+
+    def finish_run(self, run_id: str, status: str = 'COMPLETED'):
+        with self._connect() as conn:
+            conn.execute('''
+                UPDATE scan_runs
+                SET status = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE run_id = ?
+            ''', (status, run_id))
+            conn.commit()
+
+    def unit_stats(self, run_id: str) -> Dict[str, int]:
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT status, COUNT(*) FROM scan_units
+                WHERE run_id = ?
+                GROUP BY status
+            ''', (run_id,))
+            return dict(c.fetchall())
+
+    def units_with_status(self, run_id: str, status: str) -> List[str]:
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT unit_key FROM scan_units
+                WHERE run_id = ? AND status = ?
+                ORDER BY unit_key
+            ''', (run_id, status))
+            return [row[0] for row in c.fetchall()]
+
+    def completed_targets(self, run_id: str) -> List[str]:
+        """Targets con todas sus unidades terminadas (DONE) en la ejecución"""
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT target FROM scan_units
+                WHERE run_id = ?
+                GROUP BY target
+                HAVING SUM(status != 'DONE') = 0
+            ''', (run_id,))
+            return [row[0] for row in c.fetchall()]
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Extracción de contenido de objetos S3 antes del matching
+Identifica el tipo por magic bytes (no por extensión), saltea binarios sin
+texto útil, descomprime gzip/bz2/zip/tar en streaming y recorre CSV,
+JSON lines y Parquet columna por columna (celda por celda: un patrón nunca
+une valores de filas distintas)
+"""
+
+import bz2
+import csv
+import gzip
+import io
+import json
+import tarfile
+import tempfile
+import zipfile
+from typing import Dict, Iterator, List, Tuple, Union
+
+HEAD_BYTES = 8192                  # bytes leídos para identificar el tipo
+TEXT_BLOCK_BYTES = 1024 * 1024     # texto plano: bloques cortados en fin de línea
+BLOCK_ROWS = 1000                  # CSV/JSON lines: filas por bloque de columnas
+MAX_EXPANDED_BYTES = 512 * 1024 * 1024   # tope descomprimido por objeto (zip bombs)
+MAX_DEPTH = 3                      # contenedores anidados (ej: zip dentro de tar.gz)
+SPOOL_BYTES = 64 * 1024 * 1024     # miembros que necesitan seek: memoria y luego disco
+
+# Tipos sin texto que valga la pena matchear
+BINARY_MAGIC = [
+    (0, b'\x89PNG', 'image'), (0, b'\xff\xd8\xff', 'image'), (0, b'GIF8', 'image'),
+    (0, b'II*\x00', 'image'), (0, b'MM\x00*', 'image'),
+    (4, b'ftyp', 'video'), (0, b'\x1a\x45\xdf\xa3', 'video'), (0, b'OggS', 'video'),
+    (0, b'ID3', 'audio'), (0, b'fLaC', 'audio'),
+    (0, b'\x7fELF', 'binary'), (0, b'MZ', 'binary'), (0, b'\xca\xfe\xba\xbe', 'binary'),
+    (0, b'\xcf\xfa\xed\xfe', 'binary'), (0, b'\x00asm', 'binary'),
+    (0, b'\x89HDF', 'model'), (0, b'\x93NUMPY', 'model'), (0, b'GGUF', 'model'),
+    (0, b'7z\xbc\xaf\x27\x1c', 'archive'), (0, b'\xfd7zXZ\x00', 'archive'),
+    (0, b'\x28\xb5\x2f\xfd', 'archive'),
+]
+RIFF_VIDEO = (b'AVI ', b'WEBP', b'WAVE')
+OFFICE_EXTENSIONS = ('.docx', '.xlsx', '.pptx')
+CSV_EXTENSIONS = ('.csv', '.tsv')
+JSON_EXTENSIONS = ('.jsonl', '.ndjson')
+
+
+class ExpansionLimit(Exception):
+    """El contenido descomprimido superó MAX_EXPANDED_BYTES"""
+
+
+def sniff(head: bytes, name: str = '') -> str:
+    """
+    Tipo de contenido a partir de los primeros bytes
+
+    Returns:
+        str: gzip, bz2, zip, office, tar, parquet, pdf, rar, image, video,
+             audio, binary, model, archive, csv, jsonl o text
+    """
+    lower = name.lower()
+    if head.startswith(b'\x1f\x8b'):
+        return 'gzip'
+    if head.startswith(b'BZh'):
+        return 'bz2'
+    if head.startswith(b'PK\x03\x04') or head.startswith(b'PK\x05\x06'):
+        return 'office' if lower.endswith(OFFICE_EXTENSIONS) else 'zip'
+    if head.startswith(b'PAR1'):
+        return 'parquet'
+    if head.startswith(b'%PDF'):
+        return 'pdf'
+    if head.startswith(b'Rar!'):
+        return 'rar'
+    if len(head) > 262 and head[257:262] == b'ustar':
+        return 'tar'
+    if head.startswith(b'RIFF') and head[8:12] in RIFF_VIDEO:
+        return 'video'
+    for offset, magic, kind in BINARY_MAGIC:
+        if head[offset:offset + len(magic)] == magic:
+            return kind
+
+    # Sin firma conocida: texto si no hay NUL y casi todo es imprimible
+    if b'\x00' in head:
+        return 'binary'
+    sample = head.decode('utf-8', errors='replace')
+    if sample and sample.count('�') > len(sample) * 0.1:
+        return 'binary'
+    if lower.endswith(CSV_EXTENSIONS):
+        return 'csv'
+    if lower.endswith(JSON_EXTENSIONS) and head.lstrip()[:1] == b'{':
+        return 'jsonl'
+    return 'text'
+
+
+class _Rewound(io.RawIOBase):
+    """Stream con la cabecera ya leída (sniff) vuelta a poner adelante"""
+
+    def __init__(self, head: bytes, stream, budget: List[int]):
+        self.head = head
+        self.stream = stream
+        self.budget = budget
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.head:
+            n = min(len(buffer), len(self.head))
+            buffer[:n] = self.head[:n]
+            self.head = self.head[n:]
+            return n
+        data = self.stream.read(len(buffer))
+        if self.budget is None:
+            buffer[:len(data)] = data
+            return len(data)
+        self.budget[0] -= len(data)
+        if self.budget[0] < 0:
+            raise ExpansionLimit(f"más de {MAX_EXPANDED_BYTES // 1024 // 1024} MB descomprimidos")
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class ContentExtractor:
+    """
+    Convierte un objeto en segmentos de texto (sufijo de ubicación, texto)
+    El sufijo es `!miembro` dentro de un archivo comprimido y `#columna` en
+    datos tabulares, ej: `export.zip!clientes.csv#email`
+    """
+
+    def __init__(self, ocr_images: bool = False):
+        self.ocr_images = ocr_images
+
+    def extract(self, path: str, name: str) -> Iterator[Tuple[str, str, Union[str, List[str]]]]:
+        """
+        Genera (sufijo, tipo, texto) para un archivo local
+        Las columnas (tipo 'column') llegan como lista de celdas, para matchear cada una por separado
+
+        Los tipos que necesitan los lectores de hawk_scanner (pdf, office,
+        image con OCR, rar) se devuelven con texto vacío para que los procese
+        el llamador; los binarios se saltean sin leer más que la cabecera
+        """
+        with open(path, 'rb') as f:
+            head = f.read(HEAD_BYTES)
+            kind = sniff(head, name)
+            if kind in ('pdf', 'office', 'rar') or (kind == 'image' and self.ocr_images):
+                yield '', kind, ''
+                return
+            if kind == 'parquet':
+                yield from self._parquet(path, '')
+                return
+            if kind == 'zip':
+                yield from self._zip(f, '', 1, [MAX_EXPANDED_BYTES])
+                return
+            f.seek(0)
+            yield from self._stream(f, name, '', 0, [MAX_EXPANDED_BYTES])
+
+    def _stream(self, stream, name: str, suffix: str, depth: int,
+                budget: List[int]) -> Iterator[Tuple[str, str, str]]:
+        """Identifica y extrae un stream binario (sin seek)"""
+        head = stream.read(HEAD_BYTES)
+        kind = sniff(head, name)
+        # El tope aplica a lo descomprimido, no al objeto tal como está en S3
+        data = io.BufferedReader(_Rewound(head, stream, budget if depth else None))
+
+        if kind in ('gzip', 'bz2', 'tar', 'zip', 'parquet') and depth >= MAX_DEPTH:
+            return
+        if kind == 'gzip':
+            inner = name[:-3] if name.lower().endswith('.gz') else name
+            yield from self._stream(gzip.GzipFile(fileobj=data), inner, suffix, depth + 1, budget)
+        elif kind == 'bz2':
+            inner = name[:-4] if name.lower().endswith('.bz2') else name
+            yield from self._stream(bz2.BZ2File(data), inner, suffix, depth + 1, budget)
+        elif kind == 'tar':
+            yield from self._tar(data, suffix, depth + 1, budget)
+        elif kind == 'zip':
+            # zip y parquet necesitan seek (directorio central / footer)
+            with self._spool(data) as spooled:
+                yield from self._zip(spooled, suffix, depth + 1, budget)
+        elif kind == 'parquet':
+            with self._spool(data) as spooled:
+                yield from self._parquet(spooled, suffix)
+        elif kind == 'csv':
+            yield from self._csv(data, name, suffix)
+        elif kind == 'jsonl':
+            yield from self._jsonl(data, suffix)
+        elif kind == 'text':
+            yield from self._text(data, suffix)
+        # binarios, imágenes, video, modelos y formatos anidados sin lector: se saltean
+
+    @staticmethod
+    def _spool(data):
+        spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        while True:
+            block = data.read(TEXT_BLOCK_BYTES)
+            if not block:
+                break
+            spooled.write(block)
+        spooled.seek(0)
+        return spooled
+
+    def _zip(self, fileobj, suffix: str, depth: int, budget: List[int]):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    yield from self._stream(member, info.filename, f"{suffix}!{info.filename}",
+                                            depth, budget)
+
+    def _tar(self, data, suffix: str, depth: int, budget: List[int]):
+        # 'r|' lee el tar secuencialmente, sin seek
+        with tarfile.open(fileobj=data, mode='r|') as archive:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                member = archive.extractfile(info)
+                if member:
+                    yield from self._stream(member, info.name, f"{suffix}!{info.name}", depth, budget)
+
+    def _text(self, data, suffix: str):
+        text = io.TextIOWrapper(data, encoding='utf-8', errors='replace')
+        pending = ''
+        while True:
+            block = text.read(TEXT_BLOCK_BYTES)
+            if not block:
+                break
+            block = pending + block
+            cut = block.rfind('\n')
+            if cut < 0:
+                pending = block
+                continue
+            pending = block[cut + 1:]
+            yield suffix, 'text', block[:cut + 1]
+        if pending:
+            yield suffix, 'text', pending
+
+    def _columns(self, rows: Iterator[Dict], suffix: str):
+        """Agrupa celdas por columna en bloques de BLOCK_ROWS filas (una fila puede aportar una lista)"""
+        block = {}
+        count = 0
+        for row in rows:
+            for column, value in row.items():
+                for cell in (value if isinstance(value, list) else [value]):
+                    if cell not in (None, ''):
+                        block.setdefault(column, []).append(str(cell))
+            count += 1
+            if count >= BLOCK_ROWS:
+                yield from self._flush(block, suffix)
+                block, count = {}, 0
+        yield from self._flush(block, suffix)
+
+    @staticmethod
+    def _flush(block: Dict[str, List[str]], suffix: str):
+        for column, values in block.items():
+            yield f"{suffix}#{column}", 'column', values
+
+    def _csv(self, data, name: str, suffix: str):
+        text = io.TextIOWrapper(data, encoding='utf-8', errors='replace', newline='')
+        delimiter = '\t' if name.lower().endswith('.tsv') else ','
+        reader = csv.reader(text, delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            return
+        header = [column.strip() or f"col_{n}" for n, column in enumerate(header)]
+        rows = ({column: value for column, value in zip(header, row)} for row in reader)
+        yield from self._columns(rows, suffix)
+
+    def _jsonl(self, data, suffix: str):
+        text = io.TextIOWrapper(data, encoding='utf-8', errors='replace')
+
+        def rows():
+            for line in text:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Un JSON en varias líneas o una línea rota: va como texto
+                    yield {'_raw': line}
+                    continue
+                row = {}
+                for column, value in _flatten(record):
+                    # Los elementos de una lista son celdas separadas de la misma columna
+                    row.setdefault(column, []).append(value)
+                yield row
+
+        yield from self._columns(rows(), suffix)
+
+    def _parquet(self, source, suffix: str):
+        """Columnas de texto y enteras, por row group (requiere pyarrow)"""
+        try:
+            import pyarrow.parquet as pq
+            import pyarrow.types as pt
+        except ImportError:
+            return
+
+        parquet = pq.ParquetFile(source)
+        columns = [
+            field.name for field in parquet.schema_arrow
+            if pt.is_string(field.type) or pt.is_large_string(field.type) or pt.is_integer(field.type)
+            or (pt.is_dictionary(field.type) and pt.is_string(field.type.value_type))
+        ]
+        if not columns:
+            return
+        for group in range(parquet.num_row_groups):
+            table = parquet.read_row_group(group, columns=columns)
+            for column in columns:
+                values = [str(v) for v in table.column(column).to_pylist() if v not in (None, '')]
+                if values:
+                    yield f"{suffix}#{column}", 'column', values
+
+
+def _flatten(value, prefix: str = '') -> Iterator[Tuple[str, str]]:
+    """Hojas de texto/enteras de un JSON con ruta punteada (listas sin índice)"""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _flatten(child, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        for child in value:
+            yield from _flatten(child, prefix)
+    elif isinstance(value, str) or (isinstance(value, int) and not isinstance(value, bool)):
+        yield prefix or '_value', value
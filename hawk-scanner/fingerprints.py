@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Carga y análisis estático de los patrones de fingerprint.yml"""
+
+import hashlib
+import json
+import re
+from typing import Dict, Iterable, Optional
+
+import yaml
+
+try:
+    import re._parser as sre_parse
+    import re._constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+FINGERPRINT_FILE = "fingerprint.yml"
+
+# hawk_scanner compila todos los patrones con IGNORECASE
+SCANNER_FLAGS = re.IGNORECASE
+
+_CATEGORY_TESTS = {
+    sre_constants.CATEGORY_DIGIT: str.isdigit,
+    sre_constants.CATEGORY_NOT_DIGIT: lambda ch: not ch.isdigit(),
+    sre_constants.CATEGORY_SPACE: str.isspace,
+    sre_constants.CATEGORY_NOT_SPACE: lambda ch: not ch.isspace(),
+    sre_constants.CATEGORY_WORD: lambda ch: ch.isalnum() or ch == '_',
+    sre_constants.CATEGORY_NOT_WORD: lambda ch: not (ch.isalnum() or ch == '_'),
+}
+
+_REPEAT_OPS = tuple(op for op in (
+    sre_constants.MAX_REPEAT,
+    sre_constants.MIN_REPEAT,
+    getattr(sre_constants, 'POSSESSIVE_REPEAT', None),
+) if op is not None)
+_ATOMIC_OPS = tuple(op for op in (getattr(sre_constants, 'ATOMIC_GROUP', None),) if op is not None)
+
+
+def load_fingerprints(path: str = FINGERPRINT_FILE) -> Dict[str, str]:
+    """Lee fingerprint.yml preservando el orden de los patrones"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def fingerprints_signature(patterns: Dict[str, str]) -> str:
+    """Firma estable del conjunto de patrones (para invalidar caches)"""
+    payload = json.dumps(sorted(patterns.items()), ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def analyze_pattern(regex: str) -> Dict:
+    """
+    Calcula longitud mínima/máxima de un match y el árbol del patrón
+
+    Returns:
+        dict: {'min_len', 'max_len' (None = sin límite), 'tree'}
+    """
+    tree = sre_parse.parse(regex, SCANNER_FLAGS)
+    min_len, max_len = tree.getwidth()
+    if max_len >= sre_constants.MAXREPEAT:
+        max_len = None
+    return {'min_len': min_len, 'max_len': max_len, 'tree': tree}
+
+
+def can_match_within(analysis: Dict, alphabet: Optional[Iterable[str]]) -> bool:
+    """
+    Indica si el patrón puede producir un match usando solo caracteres del alfabeto
+
+    Un alfabeto None significa "cualquier carácter" (columnas de texto).
+    """
+    if alphabet is None:
+        return True
+    tree = analysis['tree']
+    ignorecase = bool(tree.state.flags & re.IGNORECASE)
+    return _seq_ok(list(tree), frozenset(alphabet), ignorecase)
+
+
+def _seq_ok(items, alphabet, ignorecase) -> bool:
+    return all(_node_ok(op, av, alphabet, ignorecase) for op, av in items)
+
+
+def _node_ok(op, av, alphabet, ignorecase) -> bool:
+    if op == sre_constants.LITERAL:
+        return _literal_ok(chr(av), alphabet, ignorecase)
+    if op == sre_constants.NOT_LITERAL:
+        return any(ch != chr(av) for ch in alphabet)
+    if op == sre_constants.ANY:
+        return any(ch != '\n' for ch in alphabet)
+    if op == sre_constants.IN:
+        return any(_in_class(ch, av, ignorecase) for ch in alphabet)
+    if op in _REPEAT_OPS:
+        low, _high, sub = av
+        return low == 0 or _seq_ok(list(sub), alphabet, ignorecase)
+    if op == sre_constants.SUBPATTERN:
+        return _seq_ok(list(av[-1]), alphabet, ignorecase)
+    if op in _ATOMIC_OPS:
+        return _seq_ok(list(av), alphabet, ignorecase)
+    if op == sre_constants.BRANCH:
+        return any(_seq_ok(list(branch), alphabet, ignorecase) for branch in av[1])
+    # Anclas, lookarounds, backreferences: no consumen o no se analizan
+    return True
+
+
+def _literal_ok(ch, alphabet, ignorecase) -> bool:
+    if ignorecase:
+        return ch.lower() in alphabet or ch.upper() in alphabet
+    return ch in alphabet
+
+
+def _in_class(ch, items, ignorecase) -> bool:
+    """Evalúa si un carácter pertenece a una clase [...] parseada"""
+    negate = False
+    found = False
+    candidates = {ch, ch.lower(), ch.upper()} if ignorecase else {ch}
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            found = found or chr(av) in candidates
+        elif op == sre_constants.RANGE:
+            found = found or any(av[0] <= ord(c) <= av[1] for c in candidates)
+        elif op == sre_constants.CATEGORY:
+            test = _CATEGORY_TESTS.get(av)
+            found = found or (test is None or test(ch))
+    return not found if negate else found
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Adaptador en proceso de hawk_scanner
+Importa la librería una sola vez y genera los hallazgos como objetos Python,
+sin lanzar un subproceso ni pasar por un JSON temporal por fuente
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import re
+import tarfile
+import tempfile
+import time
+import zipfile
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from adaptive import is_throttle, mysql_health
+from alert_manager import finding_location
+from content_extractor import ContentExtractor, ExpansionLimit
+
+TEXT_CHUNK_ROWS = 1000
+MAX_SLOWDOWN_RETRIES = 5   # reintentos de una descarga S3 ante 503 SlowDown
+
+# Sufijo de parte MySQL: `000000+1000@[4711]` (fila inicial + filas @ última
+# PRIMARY KEY del chunk, en JSON); sin `@…` la tabla no tiene PK y se pagina
+# por OFFSET; `000003` es el formato anterior, chunk de TEXT_CHUNK_ROWS filas
+PART_SUFFIX = re.compile(r'^(\d+)(?:\+(\d+)(?:@(.+))?)?$')
+
+_library = None
+
+
+def load_library():
+    """
+    Importa los módulos de hawk_scanner (una vez por proceso)
+
+    Returns:
+        dict con los módulos, o None si la librería no está instalada
+    """
+    global _library
+    if _library is None:
+        try:
+            from hawk_scanner.internals import system
+            from hawk_scanner.commands import mysql as mysql_command
+            from hawk_scanner.commands import s3 as s3_command
+            _library = {'system': system, 'mysql': mysql_command, 's3': s3_command}
+        except Exception as e:
+            print(f"⚠️  hawk_scanner no importable en proceso: {e}")
+            _library = False
+    return _library or None
+
+
+def library_args(source: str, connection_file: str, fingerprint_file: str):
+    """Namespace equivalente al de la CLI, silencioso"""
+    return argparse.Namespace(
+        command=source,
+        connection=connection_file,
+        connection_json=None,
+        fingerprint=fingerprint_file,
+        json=None,
+        stdout=False,
+        quiet=True,
+        debug=False,
+        no_write=True,
+        shutup=True,
+        hawk_thuu=False
+    )
+
+
+def encode_key(values: List) -> str:
+    """PRIMARY KEY del último registro de un chunk → texto para la clave de parte"""
+    return json.dumps([{'hex': v.hex()} if isinstance(v, (bytes, bytearray)) else v for v in values],
+                      default=str, separators=(',', ':'))
+
+
+def decode_key(text: str) -> List:
+    return [bytes.fromhex(v['hex']) if isinstance(v, dict) else v for v in json.loads(text)]
+
+
+def resume_point(table: str, done_parts: Set[str]):
+    """
+    Hasta dónde se escaneó la tabla en una ejecución anterior
+    Los chunks se checkpointean en orden: los ya hechos son un prefijo contiguo
+
+    Returns:
+        tuple: (filas ya escaneadas, PRIMARY KEY del último registro o None)
+    """
+    ends = {}
+    prefix = f"{table}#"
+    for part in done_parts:
+        match = PART_SUFFIX.match(part[len(prefix):]) if part.startswith(prefix) else None
+        if not match:
+            continue
+        start, rows, last_key = match.groups()
+        if rows is None:
+            start, rows = int(start) * TEXT_CHUNK_ROWS, TEXT_CHUNK_ROWS
+        ends[int(start)] = (int(start) + int(rows), last_key)
+
+    offset, last_key = 0, None
+    while offset in ends and ends[offset][0] > offset:
+        offset, last_key = ends[offset]
+    return offset, decode_key(last_key) if last_key else None
+
+
+def primary_key(cursor, table: str) -> List[str]:
+    """Columnas de la PRIMARY KEY en orden ([] si la tabla no tiene)"""
+    try:
+        cursor.execute(f"SHOW KEYS FROM `{table}` WHERE Key_name = 'PRIMARY'")
+        rows = cursor.fetchall()
+        names = [description[0] for description in cursor.description or []]
+    except Exception:
+        return []
+    if not rows or 'Column_name' not in names or 'Seq_in_index' not in names:
+        return []
+    column, seq = names.index('Column_name'), names.index('Seq_in_index')
+    return [row[column] for row in sorted(rows, key=lambda row: int(row[seq]))]
+
+
+def chunk_query(table: str, pk: List[str], last_key: Optional[List], rows: int, offset: int):
+    """
+    Consulta de un chunk
+    Con PRIMARY KEY se pagina por clave (`WHERE pk > último ORDER BY pk`): cada
+    chunk lee solo sus filas y el orden es estable aunque la réplica reciba
+    escrituras. Sin PK queda LIMIT/OFFSET, que relee las filas salteadas
+
+    Returns:
+        tuple: (sql, parámetros o None)
+    """
+    if not pk:
+        return f"SELECT * FROM `{table}` LIMIT {rows} OFFSET {offset}", None
+    order = ', '.join(f"`{column}`" for column in pk)
+    if last_key is None:
+        # Primer chunk: el único OFFSET es el de limit_start
+        suffix = f" OFFSET {offset}" if offset else ""
+        return f"SELECT * FROM `{table}` ORDER BY {order} LIMIT {rows}{suffix}", None
+    marks = ', '.join(['%s'] * len(pk))
+    return (f"SELECT * FROM `{table}` WHERE ({order}) > ({marks}) ORDER BY {order} LIMIT {rows}",
+            tuple(last_key))
+
+
+class InProcessScanner:
+    """Escanea unidades de trabajo (ver targets.py) llamando a la librería directamente"""
+
+    def __init__(self, connections: Dict, matcher, connection_file: str, fingerprint_file: str,
+                 schema_index=None, suppressor=None, match_store=None, concurrency=None):
+        self.lib = load_library()
+        if self.lib is None:
+            raise RuntimeError("hawk_scanner no disponible")
+        self.connections = connections
+        self.matcher = matcher
+        self.schema_index = schema_index
+        self.suppressor = suppressor
+        self.match_store = match_store
+        # AdaptiveConcurrency: tamaño de chunk, pausas y señales de carga por target
+        self.concurrency = concurrency
+        self.connection_file = connection_file
+        self.fingerprint_file = fingerprint_file
+        self.redact = bool((connections.get('notify') or {}).get('redacted', False))
+
+    def scan_unit(self, unit: Dict, done_parts: Optional[Set[str]] = None,
+                  on_part: Optional[Callable[[str, List[Dict]], None]] = None) -> Iterator[Dict]:
+        """
+        Genera los hallazgos de una unidad con el formato de la CLI
+
+        Args:
+            unit (dict): Unidad de trabajo (ver targets.build_units)
+            done_parts (set): Partes ya checkpointeadas que se saltean
+            on_part (callable): on_part(part_key, hallazgos) al terminar cada parte
+                                (chunk de tabla `tabla#000000+1000@[1000]` u objeto S3)
+        """
+        args = library_args(unit['source'], self.connection_file, self.fingerprint_file)
+        done_parts = done_parts or set()
+        if unit['source'] == 'mysql':
+            parts = self._scan_mysql(args, unit, done_parts)
+        elif unit['source'] == 's3':
+            parts = self._scan_s3(args, unit, done_parts)
+        else:
+            raise ValueError(f"Fuente no soportada en proceso: {unit['source']}")
+
+        for part_key, findings in parts:
+            if on_part:
+                on_part(part_key, findings)
+            yield from findings
+
+    def _findings(self, content: str, base: Dict, pattern_names: Optional[List[str]] = None) -> Iterator[Dict]:
+        for match in self.matcher.match(content, pattern_names, finding_location(base)):
+            finding = self._finding(base, match)
+            if finding:
+                yield finding
+
+    def _finding(self, base: Dict, match: Dict) -> Optional[Dict]:
+        """Hallazgo de un match: supresión, y después value_id o redacción"""
+        matches = match['matches']
+        sample = match['sample_text']
+        if self.suppressor:
+            # Contra el valor real: después de redactar ya no se puede comparar
+            matches = self.suppressor.filter_matches(match['pattern_name'], matches)
+            if not matches:
+                return None
+        finding = dict(base, pattern_name=match['pattern_name'], matches=matches, sample_text=sample)
+        if self.match_store:
+            # Los valores en claro quedan solo en el HMAC: el hallazgo lleva value_id
+            return self.match_store.tokenize(finding)
+        if self.redact:
+            redact = self.lib['system'].RedactData
+            finding['matches'] = [redact(m) for m in matches]
+            finding['sample_text'] = redact(sample)
+        return finding
+
+    def _scan_mysql(self, args, unit: Dict, done_parts: Set[str]):
+        config = unit['config']
+        database = config.get('database')
+        conn = self.lib['mysql'].connect_mysql(
+            args, config.get('host'), config.get('port', 3306),
+            config.get('user'), config.get('password'), database
+        )
+        if not conn:
+            raise ConnectionError(f"No se pudo conectar a {config.get('host')}")
+
+        exclude_columns = set(config.get('exclude_columns') or [])
+        limit_start = config.get('limit_start', 0)
+        limit_end = config.get('limit_end', 500)
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SHOW TABLES")
+            tables = [row[0] for row in cursor.fetchall()]
+            whitelist = config.get('tables') or []
+            if whitelist:
+                tables = [t for t in tables if t in whitelist]
+
+            for table in tables:
+                offset, last_key = resume_point(table, done_parts)
+                if offset >= limit_end:
+                    continue
+                # Un checkpoint por OFFSET (sin última clave) se continúa igual
+                pk = primary_key(cursor, table) if last_key is not None or not offset else []
+                columns = None
+                while offset < limit_end:
+                    # Una consulta por chunk: el tamaño sigue a la carga de la réplica
+                    # y cada consulta es una muestra de latencia
+                    rows_wanted = min(self._chunk_rows(unit['target']), limit_end - offset)
+                    sql, params = chunk_query(table, pk, last_key, rows_wanted, limit_start + offset)
+                    with self._request(unit['target']):
+                        started = time.monotonic()
+                        cursor.execute(sql, params)
+                        rows = cursor.fetchall()
+                        latency = time.monotonic() - started
+                    if columns is None:
+                        columns = [column[0] for column in cursor.description]
+                        key_index = [columns.index(column) for column in pk]
+                        applicable = {
+                            column: (self.schema_index.patterns_for(unit['target'], table, column)
+                                     if self.schema_index else None)
+                            for column in columns
+                        }
+                        base = {
+                            'host': conn.get_host_info(),
+                            'database': database,
+                            'table': table,
+                            'profile': unit['target'],
+                            'data_source': 'mysql'
+                        }
+                    # Después de leer description: la sonda reutiliza el cursor
+                    self._observe_mysql(unit['target'], cursor, latency)
+                    if not rows:
+                        break
+
+                    findings = []
+                    for row in rows:
+                        for column, value in zip(columns, row):
+                            if not value or column in exclude_columns:
+                                continue
+                            pattern_names = applicable[column]
+                            # Lista vacía: ningún patrón puede matchear en esta columna
+                            if pattern_names == []:
+                                continue
+                            findings.extend(self._findings(str(value), dict(base, column=column), pattern_names))
+                    part_key = f"{table}#{offset:06d}+{len(rows)}"
+                    if pk:
+                        last_key = [rows[-1][i] for i in key_index]
+                        part_key += f"@{encode_key(last_key)}"
+                    yield part_key, findings
+                    offset += len(rows)
+                    if len(rows) < rows_wanted:
+                        break
+            cursor.close()
+        finally:
+            conn.close()
+
+    def _request(self, target: str):
+        """Turno del control adaptativo para un pedido a la fuente (sin control, inmediato)"""
+        return self.concurrency.request(target) if self.concurrency else contextlib.nullcontext()
+
+    def _chunk_rows(self, target: str) -> int:
+        return self.concurrency.chunk_rows(target) if self.concurrency else TEXT_CHUNK_ROWS
+
+    def _observe_mysql(self, target: str, cursor, latency: float):
+        """Latencia del chunk y, cada probe_seconds, Threads_running / lag de la réplica"""
+        if not self.concurrency:
+            return
+        health = mysql_health(cursor) if self.concurrency.should_probe(target) else None
+        self.concurrency.observe(target, latency=latency, health=health)
+
+    def _scan_s3(self, args, unit: Dict, done_parts: Set[str]):
+        config = unit['config']
+        system = self.lib['system']
+        bucket_name = config.get('bucket_name')
+        bucket = self.lib['s3'].connect_s3(args, config.get('access_key'), config.get('secret_key'), bucket_name)
+        if not bucket:
+            raise ConnectionError(f"No se pudo conectar al bucket {bucket_name}")
+
+        exclude_patterns = config.get('exclude_patterns') or []
+        extractor = ContentExtractor(ocr_images=bool(config.get('ocr_images', False)))
+        base = {'bucket': bucket_name, 'profile': unit['target'], 'data_source': 's3'}
+
+        with tempfile.TemporaryDirectory(prefix="hawk_s3_") as tmp_dir:
+            for obj in bucket.objects.all():
+                key = obj.key
+                if key.endswith('/') or key in done_parts:
+                    continue
+                if system.should_exclude_file(args, key, exclude_patterns):
+                    continue
+
+                local_path = os.path.join(tmp_dir, key.replace('/', '_'))
+                try:
+                    self._download(bucket, key, local_path, unit['target'])
+                except Exception as e:
+                    # Throttling persistente corta la unidad (se reintenta con --resume); un
+                    # objeto borrado o sin permiso (NoSuchKey, AccessDenied) solo se omite
+                    if is_throttle(e):
+                        raise
+                    print(f"⚠️  {key}: se omite, error al descargarlo ({type(e).__name__}: {e})")
+                    if os.path.exists(local_path):
+                        os.remove(local_path)
+                    yield key, []
+                    continue
+                try:
+                    findings = list(self._scan_file(args, extractor, local_path, dict(base, file_path=key)))
+                except Exception as e:
+                    # Un objeto que no se puede procesar no frena al resto del bucket
+                    # (y queda checkpointeado: --resume no vuelve a tropezar con él)
+                    print(f"⚠️  {key}: se omite, error al procesarlo ({type(e).__name__}: {e})")
+                    findings = []
+                finally:
+                    os.remove(local_path)
+                yield key, findings
+
+    def _download(self, bucket, key: str, local_path: str, target: str):
+        """
+        Descarga un objeto reintentando ante 503 SlowDown con backoff exponencial
+        El tamaño del objeto domina la duración, así que a S3 solo se le mide el throttling
+        """
+        for attempt in range(MAX_SLOWDOWN_RETRIES + 1):
+            try:
+                with self._request(target):
+                    bucket.download_file(key, local_path)
+            except Exception as e:
+                if not is_throttle(e) or attempt == MAX_SLOWDOWN_RETRIES:
+                    raise
+                if self.concurrency:
+                    self.concurrency.observe(target, throttled=True)
+                time.sleep(min(2 ** attempt * 0.5, 30))
+                continue
+            if self.concurrency:
+                self.concurrency.observe(target)
+            return
+
+    def _scan_file(self, args, extractor: ContentExtractor, path: str, base: Dict) -> Iterator[Dict]:
+        """
+        Extrae texto por tipo real (magic bytes) y aplica el matcher propio
+        Un hallazgo por patrón y ubicación: `objeto`, `objeto!miembro` u `objeto!miembro#columna`
+        """
+        system = self.lib['system']
+        merged = {}
+
+        try:
+            for suffix, kind, content in extractor.extract(path, base['file_path']):
+                if kind == 'rar':
+                    # RAR: la librería extrae y matchea por su cuenta
+                    for match in system.read_match_strings(args, path, 's3'):
+                        finding = self._finding(base, match)
+                        if finding:
+                            yield finding
+                    return
+                if kind == 'pdf':
+                    content = system.read_pdf(args, path)
+                elif kind == 'office':
+                    content = system.read_office_document(args, path)
+                elif kind == 'image':
+                    content = system.enhance_and_ocr(path)
+                if not content:
+                    continue
+
+                location = dict(base, file_path=f"{base['file_path']}{suffix}")
+                # Columnas: celda por celda, como los valores de MySQL
+                for cell in (content if kind == 'column' else [content]):
+                    for finding in self._findings(cell, location):
+                        key = (finding['file_path'], finding['pattern_name'])
+                        if key in merged:
+                            merged[key]['matches'] = list(dict.fromkeys(merged[key]['matches'] + finding['matches']))
+                        else:
+                            merged[key] = finding
+        except ExpansionLimit as e:
+            print(f"⚠️  {base['file_path']}: {e}, se escanea hasta ahí")
+        except (OSError, EOFError, ValueError, zlib.error, csv.Error,
+                zipfile.BadZipFile, tarfile.TarError) as e:
+            # Objeto corrupto o truncado: se conserva lo extraído hasta el error
+            print(f"⚠️  {base['file_path']}: no se pudo extraer completo ({e})")
+
+        yield from merged.values()
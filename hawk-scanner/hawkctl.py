@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+CLI de operación para el triage de alertas (sin lanzar un escaneo)
+  hawkctl.py stats
+  hawkctl.py list --severity CRITICAL,HIGH --location ventas-prod/exports
+  hawkctl.py mark-fp 3f2a9c1e8b7d6a50 --location 'db1:pocdb.test_*' --notes "datos de QA"
+  hawkctl.py ack - < hashes.txt
+  hawkctl.py sync
+Los módulos pesados (requests, TheHive) se importan solo en el comando que los
+usa: las consultas arrancan con sqlite3 y poco más
+"""
+
+import argparse
+import re
+import sqlite3
+import sys
+
+DEFAULT_DB = '/app/data/alerts.db'
+HASH = re.compile(r'^[0-9a-fA-F]{16}$')
+
+STATUS_BY_COMMAND = {'mark-fp': 'FALSE_POSITIVE', 'ack': 'ACKNOWLEDGED'}
+
+
+def _reader(args):
+    from alerts_reader import AlertsReader
+    return AlertsReader(args.db, pool_size=1)
+
+
+def cmd_stats(args):
+    stats = _reader(args).stats()
+    print(f"📊 {stats['total']} alertas")
+    print("   Activas por severidad: " +
+          ", ".join(f"{sev} {count}" for sev, count in sorted(stats['by_severity'].items())))
+    print("   Por estado: " +
+          ", ".join(f"{status} {count}" for status, count in sorted(stats['by_status'].items())))
+
+
+def cmd_list(args):
+    from alerts_reader import FILTERS
+    filters = {}
+    for name in FILTERS:
+        values = [v.strip() for raw in getattr(args, name) or [] for v in raw.split(',') if v.strip()]
+        if values:
+            filters[name] = sorted(set(values))
+
+    page = _reader(args).list_alerts(filters, args.location, args.cursor, args.limit)
+    if args.json:
+        import json
+        print(json.dumps(page, ensure_ascii=False, indent=2))
+        return
+
+    for alert in page['items']:
+        print(f"{alert['alert_hash']}  {alert['severity']:<8} {alert['status']:<14} "
+              f"{alert['pattern_name']:<28} {alert['location']}")
+    if not page['items']:
+        print("Sin alertas para esos filtros")
+    if page['next_cursor']:
+        print(f"\n… más resultados: --cursor {page['next_cursor']}")
+
+
+def _read_hashes(values):
+    """Hashes de los argumentos; '-' lee uno por línea de stdin"""
+    hashes = []
+    for value in values:
+        if value == '-':
+            hashes.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            hashes.append(value)
+    invalid = [h for h in hashes if not HASH.match(h)]
+    if invalid:
+        raise SystemExit(f"❌ alert_hash inválido (16 hex): {', '.join(invalid[:5])}")
+    return [h.lower() for h in hashes]
+
+
+def cmd_mark(args):
+    hashes = _read_hashes(args.hashes)
+    if not hashes and not args.location:
+        raise SystemExit("❌ Indicar alert_hash o --location")
+
+    from alert_manager import AlertManager
+    status = STATUS_BY_COMMAND[args.command]
+    count = AlertManager(args.db).mark_alerts(status, hashes, args.location or [], args.notes,
+                                              dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"🔍 {count} alertas pasarían a {status}")
+    else:
+        print(f"✅ {count} alertas marcadas como {status}")
+
+
+def cmd_sync(args):
+    from alert_manager import AlertManager
+    from thehive_integration import TheHiveIntegration
+
+    thehive = TheHiveIntegration()
+    if not thehive.test_connection():
+        raise SystemExit("❌ TheHive no está disponible")
+    synced = thehive.sync_cases_status(AlertManager(args.db))
+    print(f"🔄 Abiertos/En progreso: {synced['open']}, Resueltos/Cerrados: {synced['resolved']}"
+          + (f", Errores: {synced['error']}" if synced['error'] else ''))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='hawkctl', description='Triage de alertas de Hawk-eye Scanner')
+    parser.add_argument('--db', default=DEFAULT_DB)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('stats', help='Conteos por estado y severidad').set_defaults(func=cmd_stats)
+
+    listing = commands.add_parser('list', help='Alertas de la más nueva a la más vieja')
+    listing.add_argument('--severity', action='append', help='CRITICAL,HIGH (repetible)')
+    listing.add_argument('--status', action='append', help='NEW,REOPENED,SENT,...')
+    listing.add_argument('--source', action='append', help='mysql, s3')
+    listing.add_argument('--pattern', action='append', help='Nombre exacto del patrón')
+    listing.add_argument('--location', help='Búsqueda por ubicación (prefijo de bucket, base, tabla)')
+    listing.add_argument('--limit', type=int, default=50)
+    listing.add_argument('--cursor', type=int, help='Continuar desde el cursor de la página anterior')
+    listing.add_argument('--json', action='store_true')
+    listing.set_defaults(func=cmd_list)
+
+    for name, help_text in (('mark-fp', 'Marcar como falso positivo'), ('ack', 'Marcar como reconocidas')):
+        mark = commands.add_parser(name, help=help_text)
+        mark.add_argument('hashes', nargs='*', help="alert_hash; '-' los lee de stdin")
+        mark.add_argument('--location', action='append',
+                          help="GLOB sobre la ubicación, ej: 'db1:pocdb.test_*' (repetible)")
+        mark.add_argument('--notes', default='')
+        mark.add_argument('--dry-run', action='store_true', help='Solo contar')
+        mark.set_defaults(func=cmd_mark)
+
+    commands.add_parser('sync', help='Sincronizar estados desde TheHive').set_defaults(func=cmd_sync)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    except sqlite3.Error as e:
+        raise SystemExit(f"❌ No se pudo leer {args.db}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Almacén de valores detectados, direccionado por contenido
+Cada valor distinto se guarda una sola vez en alerts.db, identificado por un
+HMAC con clave secreta (sin la clave no se puede confirmar un valor adivinado)
+y con una forma enmascarada para mostrar. Los hallazgos, checkpoints, JSON y
+casos llevan solo el value_id; match_locations une valor × ubicación, así que
+"¿dónde más aparece?" es una búsqueda por índice
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from suppression import normalize
+
+VALUE_ID_SIZE = 8
+# Fuera de /app/data: quien copie alerts.db no debe llevarse también la clave
+DEFAULT_KEY_FILE = '/run/secrets/hawk_match_key'
+DEFAULT_DB = '/app/data/alerts.db'
+
+
+def match_store_settings(connections: Dict) -> Dict:
+    """Sección opcional `match_store:` de connection.yml"""
+    settings = connections.get('match_store') or {}
+    return {
+        'enabled': bool(settings.get('enabled', False)),
+        'key_file': settings.get('key_file', DEFAULT_KEY_FILE),
+    }
+
+
+def load_key(key_file: str, db_path: str = DEFAULT_DB) -> bytes:
+    """
+    Clave del HMAC: HAWK_MATCH_KEY si está definida; si no, el archivo de clave
+    No se genera sola: guardada junto a alerts.db, quien tenga el volumen de
+    datos puede confirmar cualquier valor adivinado
+    """
+    env_key = os.getenv('HAWK_MATCH_KEY')
+    if env_key:
+        return env_key.encode('utf-8')
+    if not os.path.exists(key_file):
+        raise SystemExit(f"❌ Falta la clave del almacén de valores: definir HAWK_MATCH_KEY o crearla con "
+                         f"`python match_store.py --generate-key {key_file}` (fuera del volumen de datos)")
+    data_dir = os.path.dirname(os.path.abspath(db_path))
+    if os.path.commonpath([data_dir, os.path.abspath(key_file)]) == data_dir:
+        print(f"⚠️  La clave del almacén de valores ({key_file}) está en el mismo volumen que alerts.db")
+    with open(key_file, 'rb') as f:
+        return f.read().strip()
+
+
+def generate_key(key_file: str):
+    """Crea un archivo de clave nuevo con permisos 0600 (no pisa uno existente)"""
+    os.makedirs(os.path.dirname(os.path.abspath(key_file)), exist_ok=True)
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(os.urandom(32).hex().encode())
+
+
+def canonical(value: str) -> str:
+    """
+    Forma del valor para el value_id: números sin separadores y emails en
+    minúsculas, como en la supresión; el resto tal cual, porque claves y
+    tokens distinguen mayúsculas (aBc123 y ABC123 son secretos distintos)
+    """
+    normalized = normalize(value)
+    if normalized.isdigit() or '@' in normalized:
+        return normalized
+    return str(value).strip()
+
+
+def mask(value: str) -> str:
+    """
+    Forma para mostrar: emails con la primera letra y el dominio, el resto
+    con los últimos 4 caracteres (4532015112830366 → 45**********0366)
+    """
+    value = str(value).strip()
+    if '@' in value:
+        user, _, domain = value.partition('@')
+        return f"{user[:1]}***@{domain}"
+    if len(value) <= 6:
+        return '*' * len(value)
+    keep = 2 if len(value) >= 12 else 0
+    return value[:keep] + '*' * (len(value) - keep - 4) + value[-4:]
+
+
+class MatchStore:
+    def __init__(self, db_path='/app/data/alerts.db', key: bytes = b''):
+        if not key:
+            raise ValueError("El almacén de valores requiere una clave")
+        self.db_path = db_path
+        self.key = key
+        self._init_db()
+
+    def _connect(self):
+        # Los workers de escaneo registran valores a la vez
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """Crea las tablas de valores y de valor × ubicación"""
+        with self._connect() as conn:
+            c = conn.cursor()
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS match_values (
+                    value_id BLOB PRIMARY KEY,
+                    pattern_name TEXT NOT NULL,
+                    masked TEXT NOT NULL,
+                    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) WITHOUT ROWID
+            ''')
+            # Clusterizada por valor: "¿dónde más aparece?" es un rango contiguo
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS match_locations (
+                    value_id BLOB NOT NULL,
+                    alert_key BLOB NOT NULL,
+                    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (value_id, alert_key)
+                ) WITHOUT ROWID
+            ''')
+            # Valores de una ubicación (detalle de una alerta)
+            c.execute('''
+                CREATE INDEX IF NOT EXISTS idx_match_locations_alert
+                ON match_locations(alert_key)
+            ''')
+            conn.commit()
+
+    def value_id(self, value: str) -> str:
+        """HMAC-SHA256 del valor en forma canónica, 16 hex (mismo valor → mismo id)"""
+        digest = hmac.new(self.key, canonical(value).encode('utf-8'), hashlib.sha256).digest()
+        return digest[:VALUE_ID_SIZE].hex()
+
+    def register(self, pattern_name: str, values: List[str]) -> List[str]:
+        """
+        Guarda los valores que todavía no estaban (una transacción)
+
+        Returns:
+            list: value_id de cada valor, sin repetidos y en orden
+        """
+        entries = {}
+        for value in values:
+            entries.setdefault(self.value_id(value), mask(value))
+        if entries:
+            with self._connect() as conn:
+                conn.executemany('''
+                    INSERT OR IGNORE INTO match_values (value_id, pattern_name, masked)
+                    VALUES (?, ?, ?)
+                ''', ((bytes.fromhex(v), pattern_name, m) for v, m in entries.items()))
+                conn.commit()
+        return list(entries)
+
+    def tokenize(self, finding: Dict) -> Dict:
+        """Hallazgo con los matches reemplazados por value_id y la muestra enmascarada"""
+        matches = [str(m) for m in finding.get('matches') or []]
+        ids = self.register(finding.get('pattern_name', 'Unknown'), matches)
+        return dict(finding, matches=ids, sample_text=mask(matches[0]) if matches else None)
+
+    def link(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """
+        Registra pares (alert_hash, value_id); los ya conocidos no agregan filas
+
+        Returns:
+            int: pares nuevos
+        """
+        rows = sorted({(bytes.fromhex(v), bytes.fromhex(a)) for a, v in pairs})
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO match_locations (value_id, alert_key) VALUES (?, ?)
+            ''', rows)
+            conn.commit()
+            return conn.total_changes - before
+
+    def masked(self, value_ids: Iterable[str]) -> Dict[str, str]:
+        """value_id → forma enmascarada"""
+        ids = list(dict.fromkeys(value_ids))
+        result = {}
+        with self._connect() as conn:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                rows = conn.execute(f'''
+                    SELECT lower(hex(value_id)), masked FROM match_values
+                    WHERE value_id IN ({','.join('?' * len(batch))})
+                ''', [bytes.fromhex(v) for v in batch])
+                result.update(rows)
+        return result
+
+    def display(self, value_ids: List[str]) -> List[str]:
+        """'45**********0366 [3f2a9c1e8b7d6a50]' por value_id, para consola y casos"""
+        masked = self.masked(value_ids)
+        return [f"{masked.get(v, '?')} [{v}]" for v in value_ids]
+
+    def values(self, alert_hash: str, limit: int = 100) -> List[str]:
+        """value_ids vistos en una ubicación (rango del índice por alerta)"""
+        with self._connect() as conn:
+            rows = conn.execute('''
+                SELECT lower(hex(value_id)) FROM match_locations
+                WHERE alert_key = ?
+                ORDER BY first_seen
+                LIMIT ?
+            ''', (bytes.fromhex(alert_hash), limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def where(self, value_id: str) -> List[Dict]:
+        """Ubicaciones donde apareció el valor (recorrido del rango de value_id)"""
+        with self._connect() as conn:
+            rows = conn.execute('''
+                SELECT lower(hex(a.alert_key)), a.location, a.pattern_name, a.severity,
+                       a.status, a.last_seen
+                FROM match_locations l
+                JOIN alerts a ON a.alert_key = l.alert_key
+                WHERE l.value_id = ?
+                ORDER BY a.last_seen DESC
+            ''', (bytes.fromhex(value_id),)).fetchall()
+        fields = ('alert_hash', 'location', 'pattern_name', 'severity', 'status', 'last_seen')
+        return [dict(zip(fields, row)) for row in rows]
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            values = conn.execute('SELECT COUNT(*) FROM match_values').fetchone()[0]
+            links = conn.execute('SELECT COUNT(*) FROM match_locations').fetchone()[0]
+        return {'values': values, 'links': links}
+
+
+def load_match_store(settings: Dict, db_path=DEFAULT_DB) -> Optional[MatchStore]:
+    """MatchStore con la clave configurada, o None si está deshabilitado"""
+    if not settings['enabled']:
+        return None
+    return MatchStore(db_path, load_key(settings['key_file'], db_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consulta el almacén de valores detectados')
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--key-file', default=DEFAULT_KEY_FILE)
+    lookup = parser.add_mutually_exclusive_group()
+    lookup.add_argument('--value', help='Valor en claro a buscar (se calcula su HMAC)')
+    lookup.add_argument('--id', help='value_id (16 hex) de un hallazgo o caso')
+    lookup.add_argument('--generate-key', metavar='RUTA', help='Crea un archivo de clave nuevo (0600)')
+    args = parser.parse_args()
+
+    if args.generate_key:
+        generate_key(args.generate_key)
+        print(f"🔑 Clave del almacén de valores generada: {args.generate_key}")
+        return
+
+    store = MatchStore(args.db, load_key(args.key_file, args.db))
+    if not args.value and not args.id:
+        stats = store.stats()
+        print(f"🔐 {stats['values']} valores distintos, {stats['links']} pares valor × ubicación")
+        return
+
+    value_id = store.value_id(args.value) if args.value else args.id.lower()
+    masked = store.masked([value_id]).get(value_id)
+    if not masked:
+        print(f"   no está: {value_id}")
+        return
+    locations = store.where(value_id)
+    print(f"🔐 {masked} [{value_id}] en {len(locations)} ubicaciones:")
+    for loc in locations:
+        print(f"   [{loc['severity']}] {loc['location']} ({loc['pattern_name']}, "
+              f"{loc['status']}, visto {loc['last_seen']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Exportación columnar (Parquet) de hallazgos y del historial de alertas
+Particionado por fecha de escaneo y fuente, con columnas categóricas
+(diccionario) para patrón, severidad y ubicación
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from alert_manager import alert_key, finding_location
+
+DEFAULT_EXPORT_DIR = "/app/alerts/parquet"
+PARTITION_COLS = ['scan_date', 'data_source']
+CATEGORICAL_COLS = ['pattern_name', 'severity', 'location', 'profile', 'status', 'thehive_status']
+ALERTS_CHUNK_ROWS = 100000
+FINDINGS_CHUNK_ROWS = 100000
+
+FINDING_COLUMNS = [
+    'run_id', 'scan_date', 'data_source', 'profile', 'pattern_name', 'severity',
+    'location', 'alert_hash', 'host', 'database', 'table', 'column', 'bucket',
+    'file_path', 'match_count', 'matches', 'sample_text'
+]
+
+
+def export_settings(connections: Dict) -> Dict:
+    """Sección opcional `export:` de connection.yml"""
+    settings = connections.get('export') or {}
+    return {
+        'parquet': bool(settings.get('parquet', False)),
+        'alerts_snapshot': bool(settings.get('alerts_snapshot', False)),
+        'directory': settings.get('directory', DEFAULT_EXPORT_DIR),
+    }
+
+
+def _write_dataset(df: pd.DataFrame, root: str, basename: str):
+    """Escribe un DataFrame como dataset Parquet particionado (hive: clave=valor)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    for column in CATEGORICAL_COLS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table, root,
+        partition_cols=PARTITION_COLS,
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        compression='zstd'
+    )
+
+
+def findings_frame(findings: List[Dict], run_id: str, scan_date: str) -> pd.DataFrame:
+    """Hallazgos de una ejecución como DataFrame con el esquema de exportación"""
+    rows = []
+    for finding in findings:
+        location = finding_location(finding)
+        matches = [str(m) for m in finding.get('matches') or []]
+        rows.append({
+            'run_id': run_id,
+            'scan_date': scan_date,
+            'data_source': finding.get('data_source', 'unknown'),
+            'profile': finding.get('profile'),
+            'pattern_name': finding.get('pattern_name', 'Unknown'),
+            'severity': finding.get('severity', 'LOW'),
+            'location': location,
+            'alert_hash': alert_key(finding.get('data_source', 'unknown'),
+                                    finding.get('pattern_name', 'Unknown'), location).hex(),
+            'host': finding.get('host'),
+            'database': finding.get('database'),
+            'table': finding.get('table'),
+            'column': finding.get('column'),
+            'bucket': finding.get('bucket'),
+            'file_path': finding.get('file_path'),
+            'match_count': len(matches),
+            'matches': matches,
+            'sample_text': finding.get('sample_text'),
+        })
+    return pd.DataFrame(rows, columns=FINDING_COLUMNS)
+
+
+def export_findings(findings: Iterable[Dict], run_id: str, out_dir: str = DEFAULT_EXPORT_DIR,
+                    scan_date: Optional[str] = None) -> Optional[str]:
+    """
+    Exporta los hallazgos de una ejecución a <out_dir>/findings, por bloques
+
+    Args:
+        findings (iterable): Hallazgos ya clasificados (consolidate_results)
+        run_id (str): Identificador de la ejecución (timestamp)
+        scan_date (str): YYYY-MM-DD; por defecto la fecha del run_id
+
+    Returns:
+        str: directorio del dataset, o None si no hay hallazgos
+    """
+    scan_date = scan_date or datetime.strptime(run_id[:8], "%Y%m%d").strftime("%Y-%m-%d")
+    root = os.path.join(out_dir, 'findings')
+    chunk, written = [], 0
+
+    def flush():
+        _write_dataset(findings_frame(chunk, run_id, scan_date), root, f"findings-{run_id}-{written:04d}")
+
+    for finding in findings:
+        chunk.append(finding)
+        if len(chunk) >= FINDINGS_CHUNK_ROWS:
+            flush()
+            chunk, written = [], written + 1
+    if chunk:
+        flush()
+        written += 1
+    return root if written else None
+
+
+def export_alerts(db_path: str = '/app/data/alerts.db', out_dir: str = DEFAULT_EXPORT_DIR,
+                  snapshot: Optional[str] = None) -> int:
+    """
+    Exporta una foto de la tabla alerts a <out_dir>/alerts, por bloques
+
+    Returns:
+        int: filas exportadas
+    """
+    snapshot = snapshot or datetime.now().strftime("%Y%m%d_%H%M%S")
+    scan_date = datetime.strptime(snapshot[:8], "%Y%m%d").strftime("%Y-%m-%d")
+    root = os.path.join(out_dir, 'alerts')
+    exported = 0
+
+    with sqlite3.connect(db_path) as conn:
+        chunks = pd.read_sql_query('''
+            SELECT lower(hex(alert_key)) AS alert_hash, pattern_name, data_source,
+                   location, severity, status, first_seen, last_seen, count,
+                   thehive_case_id, thehive_status, reopen_count
+            FROM alerts
+        ''', conn, chunksize=ALERTS_CHUNK_ROWS, parse_dates=['first_seen', 'last_seen'])
+
+        for n, chunk in enumerate(chunks):
+            chunk.insert(0, 'snapshot', snapshot)
+            chunk.insert(1, 'scan_date', scan_date)
+            _write_dataset(chunk, root, f"alerts-{snapshot}-{n:04d}")
+            exported += len(chunk)
+
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta hallazgos y alertas a Parquet')
+    parser.add_argument('--json', nargs='*', default=[],
+                        help='consolidated_*.json existentes a convertir')
+    parser.add_argument('--alerts', action='store_true', help='Exportar una foto de la tabla alerts')
+    parser.add_argument('--db', default='/app/data/alerts.db')
+    parser.add_argument('--out', default=DEFAULT_EXPORT_DIR)
+    args = parser.parse_args()
+
+    for path in args.json:
+        with open(path, 'r') as f:
+            findings = json.load(f)
+        # consolidated_<YYYYmmdd_HHMMSS>.json
+        run_id = os.path.splitext(os.path.basename(path))[0].split('_', 1)[-1]
+        export_findings([f for f in findings if isinstance(f, dict)], run_id, args.out)
+        print(f"✅ {path}: {len(findings)} hallazgos exportados")
+
+    if args.alerts:
+        exported = export_alerts(args.db, args.out)
+        print(f"✅ {exported} alertas exportadas a {os.path.join(args.out, 'alerts')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Motor de matching con presupuesto de tiempo por patrón
+Ordena los patrones del más barato al más caro según el perfil guardado en alerts.db
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    # El módulo `regex` permite abortar un match con timeout (protección ReDoS)
+    import regex as regex_engine
+    ENGINE = 'regex'
+except ImportError:
+    import re as regex_engine
+    ENGINE = 're'
+
+from fingerprints import SCANNER_FLAGS
+
+DEFAULT_PATTERN_BUDGET = 0.25  # segundos por patrón y por valor
+SUPERLINEAR_BUDGET = 0.05      # patrones marcados como super-lineales por pattern_profiler.py
+UNSCANNED_SAMPLE = 5           # ubicaciones no analizadas que se guardan por patrón
+
+
+def compile_pattern(regex: str):
+    """Compila un patrón con los mismos flags que hawk_scanner"""
+    return regex_engine.compile(regex, SCANNER_FLAGS)
+
+
+def run_findall(compiled, content: str, timeout: Optional[float] = None) -> List[str]:
+    """
+    Todos los matches completos (group 0) de un patrón
+
+    A diferencia de re.findall, no devuelve los grupos de captura: con patrones
+    como IBAN o AWS Access Key hawk_scanner reporta solo el grupo ('' o 'AKIA').
+    Lanza TimeoutError si el motor soporta timeout y se excede el presupuesto.
+    """
+    if ENGINE == 'regex' and timeout:
+        return [m.group(0) for m in compiled.finditer(content, timeout=timeout)]
+    return [m.group(0) for m in compiled.finditer(content)]
+
+
+def budget_settings(connections: Dict) -> Dict:
+    """Presupuestos de la sección `scan:` de connection.yml (segundos por valor)"""
+    settings = connections.get('scan') or {}
+    return {
+        'default_budget': float(settings.get('pattern_budget', DEFAULT_PATTERN_BUDGET)),
+        'superlinear_budget': float(settings.get('superlinear_budget', SUPERLINEAR_BUDGET)),
+        # Por nombre de patrón: tiene prioridad sobre los dos anteriores
+        'budgets': {name: float(seconds) for name, seconds in (settings.get('pattern_budgets') or {}).items()},
+    }
+
+
+def load_pattern_profile(db_path='/app/data/alerts.db') -> Dict[str, Dict]:
+    """Lee los resultados de pattern_profiler.py (vacío si nunca se ejecutó)"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT pattern_name, regex, ns_per_byte, growth_exponent, superlinear
+                FROM pattern_profile
+            ''')
+            return {
+                row[0]: {
+                    'regex': row[1],
+                    'ns_per_byte': row[2],
+                    'growth_exponent': row[3],
+                    'superlinear': bool(row[4])
+                }
+                for row in c.fetchall()
+            }
+    except sqlite3.Error:
+        return {}
+
+
+class PatternMatcher:
+    """Aplica los patrones de fingerprint.yml con la semántica de hawk_scanner"""
+
+    def __init__(self, patterns: Dict[str, str], profile: Optional[Dict[str, Dict]] = None,
+                 budgets: Optional[Dict[str, float]] = None,
+                 default_budget: float = DEFAULT_PATTERN_BUDGET,
+                 superlinear_budget: float = SUPERLINEAR_BUDGET):
+        self.patterns = patterns
+        self.profile = profile or {}
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.superlinear_budget = superlinear_budget
+        self.compiled = {name: compile_pattern(regex) for name, regex in patterns.items()}
+        self.order = self._cost_order()
+        # Estadísticas de ejecución por patrón (compartidas entre workers)
+        self.timeouts = {}
+        self.elapsed = {}
+        self.unscanned = {}    # patrón → ubicaciones (muestra) donde el valor no se analizó
+        self.stats_lock = threading.Lock()
+
+        if ENGINE != 'regex':
+            print("⚠️  Módulo 'regex' no instalado: los presupuestos por patrón no se aplican")
+
+    def _profiled(self, name: str) -> Optional[Dict]:
+        """Perfil del patrón, si corresponde a la versión actual del regex"""
+        entry = self.profile.get(name)
+        # Un perfil de otra versión del regex no sirve para ordenar ni presupuestar
+        if not entry or entry.get('regex') != self.patterns.get(name):
+            return None
+        return entry
+
+    def _cost_order(self) -> List[str]:
+        """Patrones perfilados del más barato al más caro, luego los no perfilados"""
+        def cost(name):
+            entry = self._profiled(name)
+            return (0, entry['ns_per_byte']) if entry else (1, 0.0)
+
+        return sorted(self.patterns, key=cost)
+
+    def budget_for(self, pattern_name: str) -> float:
+        """Presupuesto explícito, o más ajustado si el perfil lo marcó super-lineal"""
+        if pattern_name in self.budgets:
+            return self.budgets[pattern_name]
+        entry = self._profiled(pattern_name)
+        if entry and entry['superlinear']:
+            return min(self.superlinear_budget, self.default_budget)
+        return self.default_budget
+
+    def match(self, content: str, pattern_names: Optional[List[str]] = None,
+              location: Optional[str] = None) -> List[Dict]:
+        """
+        Busca todos los patrones en un valor
+
+        Args:
+            content (str): Texto a analizar
+            pattern_names (list): Subconjunto aplicable (None = todos)
+            location (str): Ubicación del valor, para reportar los timeouts
+
+        Returns:
+            list: [{'pattern_name', 'matches', 'sample_text'}] como match_strings()
+        """
+        allowed = None if pattern_names is None else set(pattern_names)
+        matched = []
+
+        for pattern_name in self.order:
+            if allowed is not None and pattern_name not in allowed:
+                continue
+
+            start = time.perf_counter()
+            timed_out = False
+            try:
+                matches = run_findall(self.compiled[pattern_name], content,
+                                      self.budget_for(pattern_name))
+            except TimeoutError:
+                timed_out = True
+                matches = []
+
+            elapsed = time.perf_counter() - start
+            with self.stats_lock:
+                self.elapsed[pattern_name] = self.elapsed.get(pattern_name, 0.0) + elapsed
+                if timed_out:
+                    first = pattern_name not in self.timeouts
+                    self.timeouts[pattern_name] = self.timeouts.get(pattern_name, 0) + 1
+                    sample = self.unscanned.setdefault(pattern_name, [])
+                    if location and location not in sample and len(sample) < UNSCANNED_SAMPLE:
+                        sample.append(location)
+            if timed_out and first:
+                print(f"⚠️  {pattern_name} excedió su presupuesto de {self.budget_for(pattern_name)}s"
+                      f"{f' en {location}' if location else ''}: ese valor no se analizó con este patrón "
+                      f"(los siguientes timeouts se cuentan en el resumen)")
+
+            if matches:
+                matched.append({
+                    'pattern_name': pattern_name,
+                    'matches': list(dict.fromkeys(m.strip() for m in matches)),
+                    'sample_text': content[:50]
+                })
+
+        return matched
+
+    def summary(self) -> Dict[str, Dict]:
+        """Tiempo y timeouts por patrón, con las ubicaciones que no se analizaron"""
+        with self.stats_lock:
+            return {
+                name: {
+                    'seconds': round(self.elapsed[name], 3),
+                    'budget': self.budget_for(name),
+                    'timeouts': self.timeouts.get(name, 0),
+                    'unscanned_sample': list(self.unscanned.get(name, [])),
+                }
+                for name in sorted(self.elapsed, key=self.elapsed.get, reverse=True)
+            }
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Profiler de costo de los patrones de fingerprint.yml
+Mide ns/byte sobre un corpus representativo, busca crecimiento super-lineal
+(ReDoS) con entradas adversarias y guarda el resultado en alerts.db
+"""
+
+import argparse
+import math
+import random
+import sqlite3
+import time
+from typing import Dict, List
+
+from fingerprints import load_fingerprints, analyze_pattern, sre_constants
+from pattern_engine import ENGINE, compile_pattern, run_findall
+
+ADVERSARIAL_SIZES = [256, 1024, 4096]
+SUPERLINEAR_EXPONENT = 1.5     # pendiente log-log a partir de la cual se marca el patrón
+MEASURE_TIMEOUT = 2.0          # segundos máximos por medición
+MIN_MEASURABLE = 0.0005        # por debajo de esto el crecimiento es ruido
+
+
+def representative_corpus(size: int = 200, seed: int = 1337) -> List[str]:
+    """Valores parecidos a los de data/generar_datos.py y texto libre"""
+    rnd = random.Random(seed)
+    names = ['Juan Pérez', 'María García', 'Carlos López', 'Ana Martínez', 'Roberto Sánchez']
+    words = ['cliente', 'pago', 'pedido', 'factura', 'confidencial', 'empleado', 'total',
+             'lorem', 'ipsum', 'dolor', 'status', 'ok', 'pending', 'null']
+    corpus = []
+
+    for i in range(size):
+        name = rnd.choice(names)
+        user = name.split()[0].lower()
+        corpus.extend([
+            name,
+            f"{user}.{i}@example.com",
+            f"555-{rnd.randint(100, 999)}-{rnd.randint(1000, 9999)}",
+            ''.join(str(rnd.randint(0, 9)) for _ in range(16)),
+            f"{rnd.randint(100, 999)}-{rnd.randint(10, 99)}-{rnd.randint(1000, 9999)}",
+            f"{rnd.randint(1, 9999)}.{rnd.randint(0, 99):02d}",
+            f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 12:00:00",
+            ' '.join(rnd.choice(words) for _ in range(rnd.randint(5, 40))),
+            f'{{"id": {i}, "name": "{name}", "note": "{rnd.choice(words)}"}}',
+        ])
+    return corpus
+
+
+def sample_string(tree) -> str:
+    """Genera un string mínimo que recorre el patrón (semilla de entradas adversarias)"""
+    out = []
+    for op, av in tree:
+        if op == sre_constants.LITERAL:
+            out.append(chr(av))
+        elif op in (sre_constants.ANY, sre_constants.NOT_LITERAL):
+            out.append('a' if not (op == sre_constants.NOT_LITERAL and av == ord('a')) else 'b')
+        elif op == sre_constants.IN:
+            out.append(_class_representative(av))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, _high, sub = av
+            out.append(sample_string(sub) * max(low, 1))
+        elif op == sre_constants.SUBPATTERN:
+            out.append(sample_string(av[-1]))
+        elif op == sre_constants.BRANCH:
+            out.append(sample_string(av[1][0]))
+    return ''.join(out)
+
+
+def _class_representative(items) -> str:
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            return 'a'
+        if op == sre_constants.LITERAL:
+            return chr(av)
+        if op == sre_constants.RANGE:
+            return chr(av[0])
+        if op == sre_constants.CATEGORY:
+            return {
+                sre_constants.CATEGORY_DIGIT: '0',
+                sre_constants.CATEGORY_SPACE: ' ',
+                sre_constants.CATEGORY_NOT_SPACE: 'a',
+                sre_constants.CATEGORY_WORD: 'a',
+            }.get(av, '-')
+    return 'a'
+
+
+def adversarial_families(regex: str) -> Dict[str, callable]:
+    """
+    Familias de entradas parametrizadas por tamaño que fuerzan backtracking:
+    - un carácter del alfabeto repetido
+    - el match de ejemplo sin su último carácter, repetido
+    - el match de ejemplo alternado con cada separador literal
+    - el match de ejemplo sin uno de sus separadores, repetido (prefijo que nunca cierra)
+    """
+    tree = analyze_pattern(regex)['tree']
+    sample = sample_string(tree) or 'a'
+    truncated = sample[:-1] or sample
+    chars = sorted(set(sample))
+    separators = [ch for ch in chars if not ch.isalnum()] or ['-']
+
+    families = {}
+    for ch in chars[:8]:
+        families[f"repeat({ch!r})"] = lambda n, ch=ch: ch * n + '!'
+    families['truncated_sample'] = lambda n: (truncated * (n // len(truncated) + 1))[:n]
+    for sep in separators[:4]:
+        unit = (sample.replace(sep, '')[:2] or 'a') + sep
+        families[f"chained({sep!r})"] = lambda n, unit=unit: (unit * (n // len(unit) + 1))[:n]
+        unclosed = sample.replace(sep, '') or 'a'
+        families[f"without({sep!r})"] = lambda n, u=unclosed: (u * (n // len(u) + 1))[:n]
+    return families
+
+
+def _measure(compiled, text: str, repeat: int = 3) -> float:
+    """Mejor tiempo de varias corridas (segundos); inf si excede MEASURE_TIMEOUT"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            run_findall(compiled, text, MEASURE_TIMEOUT)
+        except TimeoutError:
+            return math.inf
+        best = min(best, time.perf_counter() - start)
+        if best > MEASURE_TIMEOUT:
+            break
+    return best
+
+
+def profile_pattern(regex: str, corpus: List[str]) -> Dict:
+    """Perfila un patrón: ns/byte en el corpus y peor exponente de crecimiento"""
+    compiled = compile_pattern(regex)
+
+    total_bytes = sum(len(text) for text in corpus) or 1
+    elapsed = sum(_measure(compiled, text) for text in corpus)
+    ns_per_byte = elapsed * 1e9 / total_bytes
+
+    worst = {'family': None, 'exponent': 0.0, 'seconds': 0.0}
+    for family, build in adversarial_families(regex).items():
+        times = []
+        for size in ADVERSARIAL_SIZES:
+            seconds = _measure(compiled, build(size))
+            times.append(seconds)
+            if seconds == math.inf:
+                break
+
+        if times[-1] == math.inf:
+            exponent = math.inf
+        elif times[-1] < MIN_MEASURABLE or times[0] <= 0:
+            exponent = 1.0
+        else:
+            # Pendiente log-log entre el tamaño menor y el mayor
+            exponent = math.log(times[-1] / times[0]) / math.log(ADVERSARIAL_SIZES[-1] / ADVERSARIAL_SIZES[0])
+
+        if exponent > worst['exponent']:
+            worst = {'family': family, 'exponent': exponent, 'seconds': times[-1]}
+
+    return {
+        'ns_per_byte': ns_per_byte,
+        'growth_exponent': worst['exponent'],
+        'worst_family': worst['family'],
+        'worst_seconds': worst['seconds'],
+        'superlinear': worst['exponent'] >= SUPERLINEAR_EXPONENT
+    }
+
+
+def save_profile(results: Dict[str, Dict], patterns: Dict[str, str], db_path: str):
+    """Guarda los resultados en la tabla pattern_profile de alerts.db"""
+    with sqlite3.connect(db_path) as conn:
+        c = conn.cursor()
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS pattern_profile (
+                pattern_name TEXT PRIMARY KEY,
+                regex TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                ns_per_byte REAL NOT NULL,
+                growth_exponent REAL NOT NULL,
+                worst_family TEXT,
+                superlinear INTEGER NOT NULL,
+                profiled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        c.executemany('''
+            INSERT OR REPLACE INTO pattern_profile
+            (pattern_name, regex, engine, ns_per_byte, growth_exponent,
+             worst_family, superlinear, profiled_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', [
+            (name, patterns[name], ENGINE, r['ns_per_byte'],
+             # SQLite no guarda inf de forma portable
+             min(r['growth_exponent'], 99.0), r['worst_family'], int(r['superlinear']))
+            for name, r in results.items()
+        ])
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perfila el costo de los patrones de fingerprint.yml')
+    parser.add_argument('--fingerprint', default='fingerprint.yml')
+    parser.add_argument('--db', default='/app/data/alerts.db')
+    parser.add_argument('--corpus', nargs='*', default=[],
+                        help='Archivos de texto adicionales (una muestra por línea)')
+    parser.add_argument('--no-save', action='store_true', help='Solo mostrar resultados')
+    args = parser.parse_args()
+
+    patterns = load_fingerprints(args.fingerprint)
+    corpus = representative_corpus()
+    for path in args.corpus:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            corpus.extend(line.rstrip('\n') for line in f if line.strip())
+
+    print(f"⏱️  Perfilando {len(patterns)} patrones (motor: {ENGINE}, corpus: {len(corpus)} muestras)")
+    print(f"{'Patrón':<34} {'ns/byte':>9} {'crec.':>6}  peor entrada")
+    print("-" * 70)
+
+    results = {}
+    for name, regex in patterns.items():
+        results[name] = profile_pattern(regex, corpus)
+        r = results[name]
+        flag = '⚠️ ' if r['superlinear'] else '  '
+        exponent = '∞' if r['growth_exponent'] == math.inf else f"{r['growth_exponent']:.2f}"
+        print(f"{flag}{name[:32]:<32} {r['ns_per_byte']:>9.1f} {exponent:>6}  {r['worst_family']}")
+
+    flagged = [name for name, r in results.items() if r['superlinear']]
+    if flagged:
+        print(f"\n⚠️  {len(flagged)} patrones con comportamiento super-lineal: {', '.join(flagged)}")
+
+    if not args.no_save:
+        save_profile(results, patterns, args.db)
+        print(f"\n✅ Perfil guardado en {args.db} (tabla pattern_profile)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Pipeline en streaming: escaneo → clasificación → tracking → TheHive
+Los hallazgos se procesan a medida que cada parte termina y los casos
+CRITICAL/HIGH se crean en un worker en segundo plano, sin esperar al
+final del escaneo
+Con synchronous=True (--max-memory) no hay cola de hallazgos: cada lote se
+registra en el hilo que lo produce, así que en memoria hay a lo sumo un lote
+por hilo de escaneo
+"""
+
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from severity_classifier import reclassify_findings
+
+CASE_SEVERITIES = ('CRITICAL', 'HIGH')
+QUEUE_BATCHES = 1000  # lotes en vuelo antes de frenar a los escáneres
+
+_STOP = object()
+
+
+class StreamingPipeline:
+    def __init__(self, alert_mgr, thehive=None, run_id: Optional[str] = None, match_store=None,
+                 synchronous: bool = False):
+        self.alert_mgr = alert_mgr
+        self.thehive = thehive
+        self.run_id = run_id
+        self.match_store = match_store
+        self.synchronous = synchronous
+
+        self.findings_queue = queue.Queue(maxsize=QUEUE_BATCHES)
+        self.case_queue = queue.Queue()
+        self.track_lock = threading.Lock()
+
+        # Estado del tracking (solo lo toca el hilo de tracking, o quien tenga track_lock)
+        # Las ubicaciones de la ejecución quedan en run_location, no en memoria
+        self.location_count = 0
+        self.new_count = 0
+        self.reopen_count = 0
+        self.duplicate_count = 0
+        self.links = []       # (alert_hash, value_id) pendientes de guardar
+        # unit_key → {alert_hash: (detected_at, alerta)}: el caso sale cuando termina la
+        # unidad, con los matches de todas sus partes
+        self.pending_cases = {}
+        # alert_hash → is_reopen: alertas que un proceso anterior (--resume) registró
+        # sin llegar a crear el caso; salen con la reconciliación final
+        self.resumed_cases = {}
+
+        # Estado de TheHive (solo lo toca el worker de casos)
+        self.cases_created = 0
+        self.case_errors = 0
+        self.latencies = []
+
+        self.tracker = threading.Thread(target=self._track_loop, name='hawk-tracker', daemon=True)
+        self.case_worker = threading.Thread(target=self._case_loop, name='hawk-thehive', daemon=True)
+
+    def start(self):
+        if not self.synchronous:
+            self.tracker.start()
+        if self.thehive:
+            self.case_worker.start()
+
+    def submit(self, findings: List[Dict], unit_key: Optional[str] = None):
+        """
+        Encola hallazgos recién producidos (se llama desde los hilos de escaneo)
+        Con unit_key los casos esperan a unit_done(); sin unit_key (hallazgos ya
+        agrupados por ubicación) salen enseguida
+        """
+        if not findings:
+            return
+        if self.synchronous:
+            with self.track_lock:
+                self._track_batch(findings, time.time(), unit_key)
+        else:
+            self.findings_queue.put((time.time(), findings, unit_key))
+
+    def unit_done(self, unit_key: str):
+        """La unidad no va a producir más partes: sus casos pendientes van a TheHive"""
+        if self.synchronous:
+            with self.track_lock:
+                self._dispatch_unit(unit_key)
+        else:
+            self.findings_queue.put((time.time(), None, unit_key))
+
+    def enqueue_case(self, alert: Dict):
+        """Encola un caso para una alerta ya registrada (ej: escalada por cambio de reglas)"""
+        if self.thehive:
+            self.case_queue.put((time.time(), alert))
+
+    def close(self):
+        """Espera a que se procese todo lo encolado y a que se creen los casos"""
+        if not self.synchronous:
+            self.findings_queue.put(_STOP)
+            self.tracker.join()
+        if self.thehive:
+            self.case_queue.put(_STOP)
+            self.case_worker.join()
+
+    def _track_loop(self):
+        while True:
+            item = self.findings_queue.get()
+            if item is _STOP:
+                return
+            detected_at, findings, unit_key = item
+            if findings is None:
+                self._dispatch_unit(unit_key)
+            else:
+                self._track_batch(findings, detected_at, unit_key)
+
+    def _track_batch(self, findings: List[Dict], detected_at: float, unit_key: Optional[str] = None):
+        """Registra un lote en una sola transacción (un commit por lote, no por hallazgo)"""
+        findings = reclassify_findings([f for f in findings if isinstance(f, dict)])
+        try:
+            results = self.alert_mgr.process_findings(findings, self.run_id)
+        except Exception as e:
+            # El lote se revierte entero: se reintenta de a uno para aislar al problemático
+            print(f"   ⚠️  Error registrando un lote de {len(findings)} hallazgos, de a uno: {e}")
+            results = []
+            for finding in findings:
+                try:
+                    results.extend(self.alert_mgr.process_findings([finding], self.run_id))
+                except Exception as e:
+                    print(f"   ❌ Error en tracking de {finding.get('pattern_name')}: {e}")
+                    results.append(None)
+
+        for finding, processed in zip(findings, results):
+            alert_hash = self.alert_mgr._generate_hash(finding)
+            if self.match_store:
+                # Todas las partes de la ubicación aportan valores, no solo la primera
+                self.links.extend((alert_hash, value_id) for value_id in finding.get('matches') or [])
+            # process_findings devuelve None si la ubicación ya se registró en la ejecución
+            if processed:
+                self._track(processed, detected_at, unit_key)
+                continue
+            waiting = self.pending_cases.get(unit_key, {}).get(alert_hash)
+            if waiting:
+                # Parte siguiente de una ubicación cuyo caso espera: se suman sus matches
+                pending = waiting[1]['finding']
+                pending['matches'] = list(dict.fromkeys((pending.get('matches') or []) +
+                                                        (finding.get('matches') or [])))
+            elif unit_key is None and alert_hash in self.resumed_cases:
+                self._queue_case(unit_key, detected_at, {
+                    'is_new': True,
+                    'is_reopen': self.resumed_cases.pop(alert_hash),
+                    'is_retry': True,
+                    'alert_hash': alert_hash,
+                    'finding': finding,
+                })
+
+        if self.links:
+            try:
+                self.match_store.link(self.links)
+            except Exception as e:
+                print(f"   ❌ Error guardando valores por ubicación: {e}")
+            self.links = []
+
+    def _track(self, processed: Dict, detected_at: float, unit_key: Optional[str] = None):
+        finding = processed['finding']
+        self.location_count += 1
+        if not processed['is_new']:
+            self.duplicate_count += 1
+            return
+
+        self.new_count += 1
+        if processed.get('is_reopen'):
+            self.reopen_count += 1
+        if self.thehive and finding.get('severity') in CASE_SEVERITIES:
+            self._queue_case(unit_key, detected_at, processed)
+
+    def _queue_case(self, unit_key: Optional[str], detected_at: float, alert: Dict):
+        if unit_key is None:
+            self.case_queue.put((detected_at, alert))
+            return
+        alert = dict(alert, finding=dict(alert['finding']))
+        self.pending_cases.setdefault(unit_key, {})[alert['alert_hash']] = (detected_at, alert)
+
+    def _dispatch_unit(self, unit_key: str):
+        for detected_at, alert in self.pending_cases.pop(unit_key, {}).values():
+            self.case_queue.put((detected_at, alert))
+
+    def resume_cases(self):
+        """
+        Alertas de esta ejecución que un proceso anterior registró sin crear el
+        caso (se cortó antes): la reconciliación final las vuelve a enviar
+        """
+        if self.thehive and self.run_id:
+            self.resumed_cases = self.alert_mgr.run_alerts_without_case(self.run_id, CASE_SEVERITIES)
+
+    def _case_loop(self):
+        while True:
+            item = self.case_queue.get()
+            if item is _STOP:
+                return
+            detected_at, alert = item
+            finding = alert['finding']
+            try:
+                if self.match_store and finding.get('matches'):
+                    # El caso muestra la forma enmascarada junto al value_id
+                    finding = dict(finding, matches=self.match_store.display(finding['matches']))
+                case_id = None
+                if alert.get('is_retry'):
+                    # El proceso anterior pudo haber creado el caso sin registrarlo
+                    case_id = self.thehive.find_open_case(alert['alert_hash'])
+                if not case_id:
+                    case_id = self.thehive.create_case(finding, alert['alert_hash'],
+                                                       alert.get('is_reopen', False))
+            except Exception as e:
+                print(f"   ❌ Error creando caso: {e}")
+                case_id = None
+
+            if not case_id:
+                self.case_errors += 1
+                continue
+
+            created_at = time.time()
+            self.alert_mgr.update_thehive_case(alert['alert_hash'], case_id, 'New')
+            self.alert_mgr.clear_escalation(alert['alert_hash'])
+            self.alert_mgr.record_case_dispatch(alert['alert_hash'], self.run_id, case_id,
+                                                detected_at, created_at)
+            self.cases_created += 1
+            self.latencies.append(created_at - detected_at)
+
+    def latency_stats(self) -> Dict:
+        """Tiempo detección → caso (segundos) de los casos creados en esta ejecución"""
+        if not self.latencies:
+            return {}
+        ordered = sorted(self.latencies)
+        return {
+            'cases': len(ordered),
+            'p50_seconds': round(ordered[len(ordered) // 2], 2),
+            'max_seconds': round(ordered[-1], 2),
+        }
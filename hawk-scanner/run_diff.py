@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Diff entre ejecuciones: ubicaciones nuevas, persistentes y que ya no están
+Guarda el conjunto de claves de cada ejecución en alerts.db (run_location,
+que el tracking completa a medida que registra cada ubicación) y compara con un
+merge ordenado sobre dos cursores (tiempo lineal, memoria constante)
+"""
+
+import sqlite3
+from typing import Callable, Dict, List, Optional
+
+GONE_BATCH = 5000   # claves por lote entregado a on_gone
+SAMPLE_SIZE = 10    # ubicaciones de ejemplo por categoría para el resumen
+
+
+class RunDiff:
+    def __init__(self, db_path='/app/data/alerts.db'):
+        self.db_path = db_path
+        self._init_db()
+
+    def _init_db(self):
+        """Crea la tabla de ubicaciones por ejecución"""
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            # El diff lee con cursores abiertos mientras on_gone actualiza alerts
+            c.execute('PRAGMA journal_mode=WAL')
+            # Clusterizada por (run_id, alert_key): cada ejecución se lee ya ordenada
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS run_location (
+                    run_id TEXT NOT NULL,
+                    alert_key BLOB NOT NULL,
+                    target TEXT NOT NULL,
+                    severity TEXT,
+                    PRIMARY KEY (run_id, alert_key)
+                ) WITHOUT ROWID
+            ''')
+            # Bases anteriores: la severidad por ejecución alimenta run_history.py
+            columns = {row[1] for row in c.execute('PRAGMA table_info(run_location)')}
+            if 'severity' not in columns:
+                c.execute('ALTER TABLE run_location ADD COLUMN severity TEXT')
+            conn.commit()
+
+    def location_count(self, run_id: str) -> int:
+        """
+        Ubicaciones registradas en la ejecución
+        Las registra el tracking a medida que avanza (AlertManager.process_findings),
+        así que incluyen las de un proceso anterior con el mismo run_id (--resume)
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('SELECT COUNT(*) FROM run_location WHERE run_id = ?', (run_id,))
+            return c.fetchone()[0]
+
+    def previous_run(self, run_id: str) -> Optional[str]:
+        """
+        Última ejecución anterior que terminó (scan_runs de checkpoint_store.py)
+        Una ejecución limpia no deja filas en run_location y aun así es la base:
+        lo que aparezca después es nuevo
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT MAX(run_id) FROM scan_runs
+                WHERE run_id < ? AND status IN ('COMPLETED', 'INCOMPLETE')
+            ''', (run_id,))
+            row = c.fetchone()
+            return row[0] if row else None
+
+    def _ordered_keys(self, conn, run_id: str, targets: List[str]):
+        placeholders = ','.join('?' * len(targets))
+        c = conn.cursor()
+        c.execute(f'''
+            SELECT alert_key FROM run_location
+            WHERE run_id = ? AND target IN ({placeholders})
+            ORDER BY alert_key
+        ''', (run_id, *targets))
+        for (key,) in c:
+            yield key
+
+    def diff(self, run_id: str, previous_run_id: str, targets: List[str],
+             on_gone: Optional[Callable[[List[str]], None]] = None) -> Dict:
+        """
+        Compara dos ejecuciones limitado a los targets indicados (los que
+        terminaron completos en ambas; un target con unidades fallidas haría
+        aparecer como resueltas ubicaciones que simplemente no se escanearon)
+
+        Args:
+            on_gone (callable): recibe lotes de alert_hash (hex) que ya no están
+
+        Returns:
+            dict: {'new', 'persisting', 'gone'} con los conteos y
+                  'samples' con algunas claves (hex) de cada categoría
+        """
+        counts = {'new': 0, 'persisting': 0, 'gone': 0}
+        samples = {'new': [], 'gone': []}
+        if not targets:
+            return dict(counts, samples=samples)
+
+        gone_batch = []
+
+        def emit(category, key):
+            counts[category] += 1
+            if category in samples and len(samples[category]) < SAMPLE_SIZE:
+                samples[category].append(key.hex())
+            if category == 'gone' and on_gone:
+                gone_batch.append(key.hex())
+                if len(gone_batch) >= GONE_BATCH:
+                    on_gone(list(gone_batch))
+                    gone_batch.clear()
+
+        with sqlite3.connect(self.db_path) as conn:
+            current = self._ordered_keys(conn, run_id, targets)
+            previous = self._ordered_keys(conn, previous_run_id, targets)
+            cur, prev = next(current, None), next(previous, None)
+
+            # Merge de dos secuencias ordenadas por alert_key
+            while cur is not None or prev is not None:
+                if prev is None or (cur is not None and cur < prev):
+                    emit('new', cur)
+                    cur = next(current, None)
+                elif cur is None or prev < cur:
+                    emit('gone', prev)
+                    prev = next(previous, None)
+                else:
+                    emit('persisting', cur)
+                    cur, prev = next(current, None), next(previous, None)
+
+        if gone_batch and on_gone:
+            on_gone(list(gone_batch))
+
+        return dict(counts, samples=samples)
@@ -1,68 +1,270 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import argparse
 import subprocess
 import json
 import os
+import shutil
 import sys
+import tempfile
+import time
+import yaml
 from datetime import datetime
 from collections import Counter
-from severity_classifier import reclassify_findings, get_critical_findings
+from fingerprints import load_fingerprints
+from schema_index import SchemaIndex
+from pattern_engine import PatternMatcher, budget_settings, load_pattern_profile
+from hawk_adapter import InProcessScanner
+from checkpoint_store import CheckpointStore
+from run_diff import RunDiff
+from run_history import RunHistory, history_settings
+from scheduler import BudgetExhausted, RiskScheduler, parse_budget
+from pipeline import StreamingPipeline
+from spill_grouper import SpillGrouper, parse_size
+from suppression import load_suppressor, suppression_settings
+from match_store import load_match_store, match_store_settings
+from adaptive import AdaptiveConcurrency, adaptive_settings
+from parquet_export import export_settings, export_findings, export_alerts
+from targets import FanOut, build_units, load_targets, scan_settings, unit_connections
+from severity_classifier import DEFAULT_SEVERITY, reclassify_findings, rules_fingerprint, severity_rules
 from alert_manager import AlertManager
 from thehive_integration import TheHiveIntegration
 
 ALERTS_DIR = "/app/alerts"
 RESULTS_DIR = "/app/alerts"
+DATA_DIR = "/app/data"
+CONNECTION_FILE = "connection.yml"
+FINGERPRINT_FILE = "fingerprint.yml"
+# Tiempo máximo por fuente del CLI hawk_scanner (0 = sin límite)
+SCAN_TIMEOUT = int(os.environ.get('HAWK_SCAN_TIMEOUT', '0')) or None
+TRACK_BATCH = 500  # ubicaciones por lote enviado al pipeline en la reconciliación final
+MAX_ESCALATIONS = 500  # casos por ejecución para alertas escaladas por cambio de reglas
 
 os.makedirs(ALERTS_DIR, exist_ok=True)
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-def run_scan(source_type, output_file):
-    print(f"🔍 Escaneando {source_type}...")
+def prefilter_mysql_targets(targets, fingerprint_file):
+    """
+    Construye el índice de aplicabilidad columna × patrón para cada target MySQL
+    y agrega a su exclude_columns las columnas donde ningún patrón aplica
+    """
+    mysql_targets = [t for t in targets if t['source'] == 'mysql']
+    if not mysql_targets:
+        return None
+
+    import pymysql
+
+    index = SchemaIndex(load_fingerprints(fingerprint_file))
+
+    for target in mysql_targets:
+        profile, config = target['name'], target['config']
+        try:
+            conn = pymysql.connect(
+                host=config.get('host'),
+                port=config.get('port', 3306),
+                user=config.get('user'),
+                password=config.get('password'),
+                database=config.get('database'),
+                connect_timeout=10
+            )
+            try:
+                stats = index.refresh(profile, conn, config.get('database'))
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"⚠️  Prefiltro de esquema no disponible para {profile}: {e}")
+            continue
+
+        excluded = index.excluded_columns(profile, config.get('tables') or None)
+        config['exclude_columns'] = sorted(set(config.get('exclude_columns') or []) | set(excluded))
+
+        print(f"🧮 Prefiltro {profile}: {stats['tables']} tablas "
+              f"({stats['rebuilt']} reconstruidas, {stats['cached']} en cache), "
+              f"{index.skipped_pairs(profile)} pares columna×patrón descartados, "
+              f"{len(excluded)} columnas omitidas")
+
+    return index
+
+def warn_expensive_patterns(fingerprint_file):
+    """Avisa de patrones marcados como super-lineales por pattern_profiler.py"""
+    patterns = load_fingerprints(fingerprint_file)
+    profile = load_pattern_profile()
+    flagged = [name for name, entry in profile.items()
+               if entry['superlinear'] and patterns.get(name) == entry['regex']]
+    if flagged:
+        print(f"⚠️  Patrones con backtracking super-lineal (ver pattern_profiler.py): {', '.join(flagged)}")
+
+def run_scan(label, source_type, output_file, connection_file=CONNECTION_FILE):
+    print(f"🔍 Escaneando {label}...")
     cmd = [
         "hawk_scanner",
         source_type,
-        "--connection", "connection.yml",
-        "--fingerprint", "fingerprint.yml",
+        "--connection", connection_file,
+        "--fingerprint", FINGERPRINT_FILE,
         "--json", output_file
     ]
 
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=SCAN_TIMEOUT)
         if result.returncode == 0:
-            print(f"✅ {source_type} completado: {output_file}")
+            print(f"✅ {label} completado: {output_file}")
             return True
         else:
-            print(f"❌ Error en {source_type}:")
+            print(f"❌ Error en {label}:")
             print(result.stderr)
             return False
+    except subprocess.TimeoutExpired:
+        print(f"❌ {label} excedió el tiempo máximo de {SCAN_TIMEOUT}s")
+        return False
     except Exception as e:
-        print(f"❌ Excepción en {source_type}: {e}")
+        print(f"❌ Excepción en {label}: {e}")
         return False
 
-def consolidate_results(mysql_file, s3_file, output_file):
-    all_results = []
-
-    if os.path.exists(mysql_file):
-        with open(mysql_file, 'r') as f:
-            mysql_data = json.load(f)
-            if isinstance(mysql_data, dict):
-                for key, findings in mysql_data.items():
-                    if isinstance(findings, list):
-                        all_results.extend(findings)
-            elif isinstance(mysql_data, list):
-                all_results.extend(mysql_data)
-
-    if os.path.exists(s3_file):
-        with open(s3_file, 'r') as f:
-            s3_data = json.load(f)
-            if isinstance(s3_data, dict):
-                for key, findings in s3_data.items():
-                    if isinstance(findings, list):
-                        all_results.extend(findings)
-            elif isinstance(s3_data, list):
-                all_results.extend(s3_data)
-
-    all_results = reclassify_findings(all_results)
+def scan_unit_subprocess(unit, connections, work_dir, store, run_id, emit=None, suppressor=None,
+                         match_store=None):
+    """Escanea una unidad con la CLI y un connection.yml de un solo perfil (fallback)"""
+    safe_key = unit['key'].replace(':', '_').replace('/', '_')
+    connection_file = os.path.join(work_dir, f"connection_{safe_key}.yml")
+    output_file = os.path.join(work_dir, f"{safe_key}.json")
+
+    with open(connection_file, 'w') as f:
+        yaml.safe_dump(unit_connections(connections, unit), f, sort_keys=False, allow_unicode=True)
+
+    store.start_unit(run_id, unit['key'])
+    if not run_scan(unit['key'], unit['source'], output_file, connection_file):
+        store.finish_unit(run_id, unit['key'], 'FAILED')
+        return None
+
+    with open(output_file, 'r') as f:
+        data = json.load(f)
+
+    findings = []
+    if isinstance(data, dict):
+        for key, group in data.items():
+            if isinstance(group, list):
+                findings.extend(group)
+    elif isinstance(data, list):
+        findings.extend(data)
+
+    findings = [f for f in findings if isinstance(f, dict)]
+    for finding in findings:
+        finding['profile'] = unit['target']
+    if suppressor:
+        # Con notify.redacted la CLI ya redactó los matches y no van a coincidir
+        findings = suppressor.filter_findings(findings)
+    if match_store:
+        findings = [match_store.tokenize(finding) for finding in findings]
+
+    # La CLI no expone partes: la unidad entera es un único checkpoint
+    store.save_part(run_id, unit['key'], '*', findings)
+    if emit:
+        emit(findings)
+    store.finish_unit(run_id, unit['key'])
+    return len(findings)
+
+def scan_unit_inprocess(scanner, unit, store, run_id, expired=None, emit=None):
+    """
+    Escanea una unidad en este proceso guardando un checkpoint por chunk/objeto
+    Cada parte terminada se pasa a emit() (pipeline de tracking/TheHive)
+    Si expired() se vuelve verdadero, corta en el siguiente límite de parte (SKIPPED)
+    """
+    done_parts = store.completed_parts(run_id, unit['key'])
+    if done_parts:
+        print(f"🔍 Reanudando {unit['key']} ({len(done_parts)} partes ya escaneadas)...")
+    else:
+        print(f"🔍 Escaneando {unit['key']}...")
+
+    saved = []
+
+    def on_part(part_key, findings):
+        store.save_part(run_id, unit['key'], part_key, findings)
+        saved.append(len(findings))
+        if emit:
+            emit(findings)
+        if expired and expired():
+            raise BudgetExhausted(unit['key'])
+
+    store.start_unit(run_id, unit['key'])
+    count = 0
+    try:
+        for _ in scanner.scan_unit(unit, done_parts, on_part=on_part):
+            count += 1
+    except BudgetExhausted:
+        store.finish_unit(run_id, unit['key'], 'SKIPPED')
+        print(f"⏳ {unit['key']} cortado por presupuesto: {len(saved)} partes, "
+              f"{sum(saved)} hallazgos guardados")
+        return sum(saved)
+    except Exception:
+        store.finish_unit(run_id, unit['key'], 'FAILED')
+        raise
+
+    store.finish_unit(run_id, unit['key'])
+    print(f"✅ {unit['key']} completado: {count} hallazgos nuevos")
+    return count
+
+def tracked(pipeline, scan):
+    """
+    Escaneo de una unidad conectado al pipeline: cada parte se registra al
+    terminar y los casos de la unidad salen cuando ya no quedan partes
+    (completa, cortada por presupuesto o fallida)
+    """
+    def run(unit):
+        try:
+            return scan(unit, lambda findings: pipeline.submit(findings, unit['key']))
+        finally:
+            pipeline.unit_done(unit['key'])
+    return run
+
+def build_inprocess_scanner(connections, schema_index, suppressor=None, match_store=None, concurrency=None):
+    """Crea el adaptador en proceso, o None si hay que usar la CLI"""
+    try:
+        matcher = PatternMatcher(load_fingerprints(FINGERPRINT_FILE), load_pattern_profile(),
+                                 **budget_settings(connections))
+        return InProcessScanner(connections, matcher, CONNECTION_FILE, FINGERPRINT_FILE, schema_index,
+                                suppressor, match_store, concurrency)
+    except RuntimeError as e:
+        print(f"⚠️  Usando la CLI hawk_scanner como fallback: {e}")
+        return None
+
+class StoredFindings:
+    """Hallazgos consolidados que se releen de los checkpoints en cada recorrido (--max-memory)"""
+
+    def __init__(self, store, run_id, count):
+        self.store = store
+        self.run_id = run_id
+        self.count = count
+
+    def __iter__(self):
+        for finding in self.store.iter_findings(self.run_id):
+            yield from reclassify_findings([finding])
+
+    def __len__(self):
+        return self.count
+
+def write_findings_json(findings, output_file):
+    """Mismo JSON que json.dump(lista, indent=2), escrito de a un hallazgo"""
+    count = 0
+    with open(output_file, 'w') as f:
+        for finding in findings:
+            item = json.dumps(finding, indent=2).replace('\n', '\n  ')
+            f.write(f"{',' if count else '['}\n  {item}")
+            count += 1
+        f.write("\n]" if count else "[]")
+    return count
+
+def consolidate_results(store, run_id, output_file, bounded=False):
+    """
+    Une los hallazgos checkpointeados de todas las unidades de la ejecución
+    Con bounded=True no los junta en memoria: los escribe en streaming y
+    devuelve un iterable que los vuelve a leer de alerts.db
+    """
+    if bounded:
+        stored = StoredFindings(store, run_id, 0)
+        stored.count = write_findings_json(stored, output_file)
+        print(f"📊 Resultados consolidados: {stored.count} hallazgos (en streaming)")
+        return stored
+
+    all_results = reclassify_findings(list(store.iter_findings(run_id)))
 
     with open(output_file, 'w') as f:
         json.dump(all_results, f, indent=2)
@@ -70,8 +272,85 @@ def consolidate_results(mysql_file, s3_file, output_file):
     print(f"📊 Resultados consolidados: {len(all_results)} hallazgos")
     return all_results
 
-def display_findings(results):
-    """Muestra hallazgos detectados"""
+def track_by_location(pipeline, results, max_memory=None):
+    """
+    Pasa por el pipeline un hallazgo por ubicación con los matches unidos
+    Con max_memory la agrupación vuelca particiones a disco al superar el presupuesto
+    """
+    grouper = SpillGrouper(max_memory)
+    for finding in results:
+        grouper.add(finding)
+
+    batch = []
+    for group in grouper:
+        batch.append(group)
+        if len(batch) >= TRACK_BATCH:
+            pipeline.submit(batch)
+            batch = []
+    pipeline.submit(batch)
+
+    if grouper.spills:
+        print(f"💾 Agrupación por ubicación volcada a disco {grouper.spills} veces, "
+              f"{grouper.splits} particiones repartidas de nuevo "
+              f"(presupuesto {max_memory / 1024 / 1024:.1f} MB, pico {grouper.peak / 1024 / 1024:.1f} MB)")
+
+def diff_against_previous(store, alert_mgr, run_diff, run_id, auto_close):
+    """
+    Compara las ubicaciones de esta ejecución (ya registradas por el tracking) con la anterior
+    Solo se comparan los targets que terminaron completos en ambas ejecuciones
+    """
+    previous_run_id = run_diff.previous_run(run_id)
+    if not previous_run_id:
+        return None
+
+    targets = sorted(set(store.completed_targets(run_id)) &
+                     set(store.completed_targets(previous_run_id)))
+    closed = []
+
+    def close_gone(alert_hashes):
+        closed.append(alert_mgr.mark_as_gone(alert_hashes))
+
+    diff = run_diff.diff(run_id, previous_run_id, targets, close_gone if auto_close else None)
+    locations = alert_mgr.get_locations(diff['samples']['new'] + diff['samples']['gone'])
+    return {
+        'previous_run': previous_run_id,
+        'targets': targets,
+        'new': diff['new'],
+        'persisting': diff['persisting'],
+        'gone': diff['gone'],
+        'auto_closed': sum(closed),
+        'new_sample': [locations.get(h, h) for h in diff['samples']['new']],
+        'gone_sample': [locations.get(h, h) for h in diff['samples']['gone']],
+    }
+
+def record_history(settings, run_id):
+    """Agregados diarios/semanales de la ejecución y retención del detalle viejo"""
+    try:
+        history = RunHistory()
+        history.record_run(run_id)
+        deleted = history.compact(settings)
+        if any(deleted.values()):
+            print(f"🗜️  Historial compactado: " +
+                  ", ".join(f"{table} {count}" for table, count in deleted.items() if count))
+    except Exception as e:
+        print(f"⚠️  Error actualizando el historial de ejecuciones: {e}")
+
+def export_parquet(settings, results, run_id):
+    """Exporta hallazgos (y opcionalmente la tabla alerts) a Parquet particionado"""
+    try:
+        if settings['parquet']:
+            root = export_findings(results, run_id, settings['directory'])
+            if root:
+                print(f"🗃️  Hallazgos exportados a Parquet: {root}")
+        if settings['alerts_snapshot']:
+            exported = export_alerts(out_dir=settings['directory'])
+            print(f"🗃️  Foto de alerts exportada a Parquet: {exported} filas")
+    except Exception as e:
+        # La exportación es para análisis: no debe hacer fallar el escaneo
+        print(f"⚠️  No se pudo exportar a Parquet: {e}")
+
+def display_findings(results, match_store=None):
+    """Muestra hallazgos detectados (con match_store, los value_id se muestran enmascarados)"""
     if not results:
         print("\n✅ No se detectaron hallazgos de seguridad")
         return
@@ -80,12 +359,15 @@ def display_findings(results):
     print(f"🔍 HALLAZGOS DETECTADOS")
     print(f"{'='*70}")
 
+    # Solo se guardan los que se muestran: todos los CRITICAL y 5 del resto
     by_severity = {}
+    severity_counts = Counter()
     for r in results:
         severity = r.get('severity', 'Unknown')
-        if severity not in by_severity:
-            by_severity[severity] = []
-        by_severity[severity].append(r)
+        severity_counts[severity] += 1
+        shown = by_severity.setdefault(severity, [])
+        if severity == 'CRITICAL' or len(shown) < 5:
+            shown.append(r)
 
     severity_order = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'Unknown']
     severity_icons = {
@@ -103,7 +385,7 @@ def display_findings(results):
         findings = by_severity[severity]
         icon = severity_icons.get(severity, '⚪')
 
-        print(f"\n{icon} {severity} - {len(findings)} hallazgos")
+        print(f"\n{icon} {severity} - {severity_counts[severity]} hallazgos")
         print("-" * 70)
 
         max_display = len(findings) if severity == 'CRITICAL' else min(5, len(findings))
@@ -123,25 +405,59 @@ def display_findings(results):
             matches = finding.get('matches', [])
             if matches:
                 match_preview = matches[:3]
+                if match_store:
+                    match_preview = match_store.display(match_preview)
                 print(f"      Matches: {', '.join(match_preview)}")
                 if len(matches) > 3:
                     print(f"      ... y {len(matches) - 3} más")
 
-        if len(findings) > max_display:
-            print(f"\n  ... y {len(findings) - max_display} hallazgos más de severidad {severity}")
-
-def generate_final_summary(results, output_file, tracking_stats, cases_created, thehive_available):
-    """Genera resumen final consolidado con TODA la información"""
-    valid_results = [r for r in results if isinstance(r, dict) and 'pattern_name' in r]
+        if severity_counts[severity] > max_display:
+            print(f"\n  ... y {severity_counts[severity] - max_display} hallazgos más de severidad {severity}")
+
+def generate_final_summary(results, output_file, tracking_stats, cases_created, thehive_available,
+                           target_timings=None, diff=None, skipped_units=None, suppressed=None,
+                           findings_file=None, adaptive=None, patterns=None):
+    """
+    Genera resumen final consolidado con TODA la información
+    Con findings_file (--max-memory) el resumen referencia el consolidado en vez de copiar los hallazgos
+    """
+    target_timings = target_timings or {}
+    valid_results = []
+    total = 0
+    by_severity, by_pattern, by_source, findings_by_target = Counter(), Counter(), Counter(), Counter()
+    # Una sola pasada: results puede ser un iterable que se relee de alerts.db
+    for r in results:
+        if not (isinstance(r, dict) and 'pattern_name' in r):
+            continue
+        total += 1
+        by_severity[r.get('severity', 'unknown')] += 1
+        by_pattern[r.get('pattern_name', 'unknown')] += 1
+        by_source[r.get('data_source', 'unknown')] += 1
+        findings_by_target[r.get('profile', 'unknown')] += 1
+        if findings_file is None:
+            valid_results.append(r)
 
     summary = {
         "scan_date": datetime.now().isoformat(),
-        "total_findings": len(valid_results),
-        "by_severity": dict(Counter([r.get('severity', 'unknown') for r in valid_results])),
-        "by_pattern": dict(Counter([r.get('pattern_name', 'unknown') for r in valid_results])),
-        "by_source": dict(Counter([r.get('data_source', 'unknown') for r in valid_results])),
-        "findings": valid_results
+        "total_findings": total,
+        "by_severity": dict(by_severity),
+        "by_pattern": dict(by_pattern),
+        "by_source": dict(by_source),
+        "by_target": {
+            target: dict(timing, findings=findings_by_target.get(target, 0))
+            for target, timing in target_timings.items()
+        },
+        "diff": diff,
+        "skipped_units": skipped_units or [],
+        "case_latency": tracking_stats.get('case_latency') or {},
+        "suppressed": suppressed or {},
+        "adaptive": adaptive or {},
+        "patterns": patterns or {},
     }
+    if findings_file is None:
+        summary["findings"] = valid_results
+    else:
+        summary["findings_file"] = findings_file
 
     with open(output_file, 'w') as f:
         json.dump(summary, f, indent=2, default=str)
@@ -165,12 +481,54 @@ def generate_final_summary(results, output_file, tracking_stats, cases_created,
     for source, count in summary['by_source'].items():
         print(f"      {source}: {count}")
 
+    if summary['by_target']:
+        print(f"\n   ⏱️  Por target:")
+        for target, info in sorted(summary['by_target'].items(),
+                                   key=lambda x: x[1]['wall_seconds'], reverse=True):
+            failed = f", {info['failed_units']} con error" if info['failed_units'] else ""
+            print(f"      {target} ({info['source']}): {info['findings']} hallazgos, "
+                  f"{info['units']} unidades{failed}, {info['wall_seconds']}s")
+
+    if summary['adaptive']:
+        print(f"\n   🎚️  Concurrencia adaptativa:")
+        for target, info in summary['adaptive']['targets'].items():
+            chunk = f", chunk {info['chunk_rows']} filas" if info['source'] == 'mysql' else ""
+            print(f"      {target}: {info['min_workers']}-{info['max_workers']} workers "
+                  f"(final {info['workers']}), {info['decreases']} bajas, {info['increases']} subas{chunk}")
+
     print(f"\n   🔍 Top 5 patrones:")
     top_patterns = sorted(summary['by_pattern'].items(),
                          key=lambda x: x[1], reverse=True)[:5]
     for pattern, count in top_patterns:
         print(f"      {pattern}: {count}")
 
+    if suppressed and suppressed['total']:
+        print(f"\n   🔕 Valores de prueba suprimidos: {suppressed['total']}")
+        for pattern, count in sorted(suppressed['by_pattern'].items(), key=lambda x: x[1], reverse=True):
+            print(f"      {pattern}: {count}")
+
+    timed_out = {name: info for name, info in summary['patterns'].items() if info['timeouts']}
+    if timed_out:
+        print(f"\n   ⌛ Patrones con timeout (valores NO analizados por ese patrón):")
+        for name, info in timed_out.items():
+            print(f"      {name}: {info['timeouts']} valores (presupuesto {info['budget']}s, "
+                  f"{info['seconds']}s en total)")
+            for location in info['unscanned_sample']:
+                print(f"      − {location}")
+
+    if summary['skipped_units']:
+        print(f"\n   ⏳ Unidades salteadas por presupuesto: {len(summary['skipped_units'])} "
+              f"(van primero en la próxima ejecución)")
+
+    if diff:
+        print(f"\n   🔀 Cambios desde {diff['previous_run']} ({len(diff['targets'])} targets comparables):")
+        print(f"      Nuevas: {diff['new']}  Persistentes: {diff['persisting']}  "
+              f"Ya no presentes: {diff['gone']}")
+        for location in diff['gone_sample'][:5]:
+            print(f"      − {location}")
+        if diff['auto_closed']:
+            print(f"      Cerradas automáticamente (GONE): {diff['auto_closed']}")
+
     # 2. TRACKING
     print(f"\n📋 Sistema de Tracking:")
     critical_count = tracking_stats.get('by_severity', {}).get('CRITICAL', 0)
@@ -196,150 +554,240 @@ def generate_final_summary(results, output_file, tracking_stats, cases_created,
                 if status:
                     print(f"      • {status}: {count}")
         
+        if tracking_stats.get('case_latency'):
+            latency = tracking_stats['case_latency']
+            print(f"   • Detección → caso: p50 {latency['p50_seconds']}s, "
+                  f"máx. {latency['max_seconds']}s")
+
         print(f"\n   🌐 Dashboard: http://localhost:9000")
     else:
         print(f"\n⚠️  TheHive: No disponible")
 
     # 4. ALERTAS CRÍTICAS
-    critical = get_critical_findings(valid_results)
+    critical = summary['by_severity'].get('CRITICAL', 0)
     if critical:
-        print(f"\n⚠️  ATENCIÓN: {len(critical)} hallazgos CRÍTICOS requieren acción inmediata")
+        print(f"\n⚠️  ATENCIÓN: {critical} hallazgos CRÍTICOS requieren acción inmediata")
 
     return summary
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Escaneo automatizado con hawk_scanner')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continuar la última ejecución interrumpida (solo unidades pendientes)')
+    parser.add_argument('--time-budget', type=parse_budget, default=None,
+                        help='Tiempo máximo del escaneo (ej: 3600, 90m, 2h); lo pendiente queda SKIPPED')
+    parser.add_argument('--max-memory', type=parse_size, default=None,
+                        help='Presupuesto para consolidar y agrupar hallazgos (ej: 512M, 2G); '
+                             'lo que no entra se vuelca a disco')
+    args = parser.parse_args()
+    deadline = time.time() + args.time_budget if args.time_budget else None
+
     print("=" * 70)
     print("🦅 HAWK-EYE SCANNER - Automated Security Scan")
     print("=" * 70)
 
-    mysql_output = f"{RESULTS_DIR}/mysql_{timestamp}.json"
-    s3_output = f"{RESULTS_DIR}/s3_{timestamp}.json"
     consolidated_output = f"{RESULTS_DIR}/consolidated_{timestamp}.json"
     summary_output = f"{RESULTS_DIR}/summary_{timestamp}.json"
     latest_output = f"{RESULTS_DIR}/latest.json"
 
-    # 1. ESCANEO
-    mysql_success = run_scan("mysql", mysql_output)
-    s3_success = run_scan("s3", s3_output)
+    # 1. ESCANEO (FAN-OUT POR TARGET)
+    warn_expensive_patterns(FINGERPRINT_FILE)
+
+    with open(CONNECTION_FILE, 'r') as f:
+        connections = yaml.safe_load(f) or {}
+
+    targets = load_targets(connections)
+    schema_index = prefilter_mysql_targets(targets, FINGERPRINT_FILE)
+    units = build_units(targets, schema_index)
+    settings = scan_settings(connections)
+    suppressor = load_suppressor(suppression_settings(connections))
+    match_store = load_match_store(match_store_settings(connections))
+
+    print(f"🎯 {len(targets)} targets, {len(units)} unidades "
+          f"(máx. {settings['max_workers']} en paralelo)")
+
+    # Checkpoints en alerts.db: una ejecución cortada se retoma con --resume
+    store = CheckpointStore()
+
+    # Alertas de antes de los targets con nombre: su ubicación pasa a llevar el
+    # perfil antes de que el scheduler y el tracking las busquen
+    alert_mgr = AlertManager()
+    profiles_by_source = {}
+    for target in targets:
+        profiles_by_source.setdefault(target['source'], []).append(target['name'])
+    alert_mgr.backfill_profiles(profiles_by_source)
+
+    # Orden por riesgo (historial de alerts.db): lo más valioso sale primero
+    units = RiskScheduler().order(units)
+    for unit in units[:5]:
+        risk = unit['risk']
+        first = " (salteada antes)" if risk['skipped_before'] else ""
+        print(f"   📌 {unit['key']}: riesgo {risk['score']}{first}")
+
+    run_id = store.last_interrupted_run() if args.resume else None
+    if run_id:
+        done_units = store.resume_run(run_id, units)
+        units = [u for u in units if u['key'] not in done_units]
+        print(f"♻️  Reanudando ejecución {run_id}: {len(done_units)} unidades ya completas, "
+              f"{len(units)} pendientes")
+    else:
+        if args.resume:
+            print("ℹ️  No hay ejecuciones interrumpidas, iniciando una nueva")
+        run_id = timestamp
+        store.start_run(run_id, units)
+
+    # 2. TRACKING Y THEHIVE EN STREAMING (a medida que termina cada parte)
+    # Cambió SEVERITY_MAP: reclasificar el historial completo antes de contar pendientes
+    reclassified = alert_mgr.reclassify_history(severity_rules(), DEFAULT_SEVERITY, rules_fingerprint())
+    if reclassified and reclassified['previous']:
+        print(f"🏷️  Reglas de severidad modificadas: {reclassified['reclassified']} alertas reclasificadas, "
+              f"{reclassified['escalated']} escaladas a CRITICAL/HIGH")
 
-    if mysql_success or s3_success:
-        results = consolidate_results(mysql_output, s3_output, consolidated_output)
+    thehive = TheHiveIntegration()
+    thehive_available = thehive.test_connection()
 
-        # 2. TRACKING (AGRUPADO POR HASH)
+    if thehive_available:
+        # Sincronizar antes de escanear: la detección de re-aperturas usa estos estados
         print(f"\n{'='*70}")
-        print("🔄 Procesando con sistema de tracking...")
+        print("🔄 Sincronizando estados con TheHive...")
         print(f"{'='*70}")
 
-        alert_mgr = AlertManager()
-
-        # AGRUPAR FINDINGS POR HASH PRIMERO
-        findings_by_hash = {}
-        for finding in results:
-            alert_hash = alert_mgr._generate_hash(finding)
-            if alert_hash not in findings_by_hash:
-                findings_by_hash[alert_hash] = []
-            findings_by_hash[alert_hash].append(finding)
-
-        # PROCESAR UN SOLO FINDING POR UBICACIÓN
-        new_alerts = []
-        duplicate_count = 0
-        reopen_count = 0
-
-        for alert_hash, findings_group in findings_by_hash.items():
-            # Tomar el primer finding del grupo (representativo de la ubicación)
-            representative_finding = findings_group[0]
-            
-            # Consolidar todos los matches del grupo
-            all_matches = []
-            for f in findings_group:
-                all_matches.extend(f.get('matches', []))
-            representative_finding['matches'] = all_matches
-            
-            processed = alert_mgr.process_finding(representative_finding)
-            if processed['is_new']:
-                new_alerts.append(processed)
-                if processed.get('is_reopen'):
-                    reopen_count += 1
-            else:
-                duplicate_count += 1
+        synced = thehive.sync_cases_status(alert_mgr)
+
+        if synced['open'] > 0 or synced['resolved'] > 0:
+            print(f"\n📊 Estado actual:")
+            print(f"   • Abiertos/En progreso: {synced['open']}")
+            print(f"   • Resueltos/Cerrados: {synced['resolved']}")
+            if synced['error'] > 0:
+                print(f"   • Errores: {synced['error']}")
+    else:
+        print(f"\n{'='*70}")
+        print("⚠️  TheHive no está disponible")
+        print(f"{'='*70}")
+
+    # El tracking registra cada ubicación en run_location (tabla de RunDiff)
+    run_diff = RunDiff()
+    # Con --max-memory cada lote se registra en el hilo que lo produce: sin cola de hallazgos
+    pipeline = StreamingPipeline(alert_mgr, thehive if thehive_available else None, run_id, match_store,
+                                 synchronous=args.max_memory is not None)
+    pipeline.start()
+    # --resume: alertas que el proceso cortado registró pero no llegó a enviar
+    pipeline.resume_cases()
+
+    if thehive_available:
+        # Lo que no entra queda en escalation_queue para la próxima ejecución
+        escalations = alert_mgr.pending_escalations(MAX_ESCALATIONS)
+        for alert in escalations:
+            if match_store:
+                # Con match store los valores de la ubicación sí están vinculados a la alerta
+                alert['finding']['matches'] = match_store.values(alert['alert_hash'])
+            pipeline.enqueue_case(alert)
+        if escalations:
+            print(f"📈 {len(escalations)} alertas escaladas en cola para TheHive")
+
+    # Concurrencia adaptativa: las señales de carga las mide el escaneo en proceso
+    concurrency = None
+    adaptive = adaptive_settings(connections)
+    if adaptive['enabled']:
+        concurrency = AdaptiveConcurrency(targets, units, adaptive, settings['max_workers'])
+
+    scanner = None
+    if settings['engine'] == 'inprocess':
+        scanner = build_inprocess_scanner(connections, schema_index, suppressor, match_store, concurrency)
+    if concurrency and not scanner:
+        print("⚠️  Concurrencia adaptativa deshabilitada: requiere engine inprocess")
+        concurrency = None
+
+    fanout = FanOut(settings['max_workers'], {t['name']: t['max_workers'] for t in targets}, deadline,
+                    concurrency)
+    with tempfile.TemporaryDirectory(prefix="hawk_units_") as work_dir:
+        if scanner:
+            outcomes = fanout.run(units, tracked(pipeline, lambda unit, emit: scan_unit_inprocess(
+                scanner, unit, store, run_id, fanout.expired, emit)))
+        else:
+            outcomes = fanout.run(units, tracked(pipeline, lambda unit, emit: scan_unit_subprocess(
+                unit, connections, work_dir, store, run_id, emit, suppressor, match_store)))
+    target_timings = fanout.target_timings()
+
+    # Lo que no llegó a despacharse queda registrado para ir primero la próxima vez
+    for outcome in outcomes:
+        if outcome['skipped']:
+            store.finish_unit(run_id, outcome['unit']['key'], 'SKIPPED')
+    skipped_units = store.units_with_status(run_id, 'SKIPPED')
+    if skipped_units:
+        print(f"⏳ Presupuesto de tiempo agotado: {len(skipped_units)} unidades salteadas")
+
+    unit_stats = store.unit_stats(run_id)
+    pending_units = sum(count for status, count in unit_stats.items() if status != 'DONE')
+    if pending_units:
+        print(f"⚠️  {pending_units} unidades sin completar: reintentar con --resume")
+
+    # Una ejecución cortada por presupuesto igual procesa lo que alcanzó a escanear
+    if unit_stats.get('DONE') or unit_stats.get('SKIPPED'):
+        bounded = args.max_memory is not None
+        results = consolidate_results(store, run_id, consolidated_output, bounded)
+
+        # Hallazgos checkpointeados por una ejecución anterior (--resume) que
+        # todavía no pasaron por el tracking; las ubicaciones ya vistas se ignoran
+        track_by_location(pipeline, results, args.max_memory)
+        pipeline.close()
+
+        print(f"\n{'='*70}")
+        print("🔄 Sistema de tracking")
+        print(f"{'='*70}")
 
         print(f"\n📊 Resultados del tracking:")
         print(f"   • Total de hallazgos: {len(results)}")
-        print(f"   • Ubicaciones únicas: {len(findings_by_hash)}")
-        print(f"   • Alertas NUEVAS: {len(new_alerts)}")
-        if reopen_count > 0:
-            print(f"   • Re-aperturas: {reopen_count} 🔄")
-        print(f"   • Ya vistos: {duplicate_count}")
+        print(f"   • Ubicaciones únicas: {run_diff.location_count(run_id)}")
+        print(f"   • Alertas NUEVAS: {pipeline.new_count}")
+        if pipeline.reopen_count > 0:
+            print(f"   • Re-aperturas: {pipeline.reopen_count} 🔄")
+        print(f"   • Ya vistos: {pipeline.duplicate_count}")
+
+        diff = diff_against_previous(store, alert_mgr, run_diff, run_id, settings['auto_close_gone'])
 
         stats = alert_mgr.get_stats()
         if stats['critical_pending'] > 0:
             print(f"\n   ⚠️  {stats['critical_pending']} alertas CRÍTICAS pendientes")
 
-        # 3. INTEGRACIÓN CON THEHIVE
-        thehive = TheHiveIntegration()
-        thehive_available = False
-        cases_created = 0
-
-        if thehive.test_connection():
-            thehive_available = True
-            
-            # 3a. Sincronizar estados
-            print(f"\n{'='*70}")
-            print("🔄 Sincronizando estados con TheHive...")
-            print(f"{'='*70}")
-
-            synced = thehive.sync_cases_status(alert_mgr)
-
-            if synced['open'] > 0 or synced['resolved'] > 0:
-                print(f"\n📊 Estado actual:")
-                print(f"   • Abiertos/En progreso: {synced['open']}")
-                print(f"   • Resueltos/Cerrados: {synced['resolved']}")
-                if synced['error'] > 0:
-                    print(f"   • Errores: {synced['error']}")
-
-            # 3b. Crear nuevos casos (UN SOLO CASO POR UBICACIÓN)
-            print(f"\n{'='*70}")
-            print("🎯 Enviando alertas críticas a TheHive...")
-            print(f"{'='*70}")
-
-            for alert in new_alerts:
-                finding = alert['finding']
-                if finding.get('severity') in ['CRITICAL', 'HIGH']:
-                    is_reopen = alert.get('is_reopen', False)
-                    case_id = thehive.create_case(finding, alert['alert_hash'], is_reopen)
-                    if case_id:
-                        alert_mgr.update_thehive_case(
-                            alert['alert_hash'],
-                            case_id,
-                            'New'
-                        )
-                        cases_created += 1
-
+        cases_created = pipeline.cases_created
+        if thehive_available:
+            latency = pipeline.latency_stats()
             if cases_created > 0:
-                print(f"\n📋 Casos creados: {cases_created}")
+                print(f"\n📋 Casos creados: {cases_created} (detección → caso: "
+                      f"p50 {latency['p50_seconds']}s, máx. {latency['max_seconds']}s)")
             else:
                 print(f"\n📋 No se crearon casos nuevos")
-            
-            # Recalcular stats después de sincronizar
-            stats = alert_mgr.get_stats()
-        else:
-            print(f"\n{'='*70}")
-            print("⚠️  TheHive no está disponible")
-            print(f"{'='*70}")
+            stats['case_latency'] = latency
 
-        # 4. MOSTRAR HALLAZGOS
-        display_findings(results)
+        # 3. MOSTRAR HALLAZGOS
+        display_findings(results, match_store)
+
+        # 4. RESUMEN FINAL
+        generate_final_summary(results, summary_output, stats, cases_created, thehive_available,
+                               target_timings, diff, skipped_units,
+                               suppressor.stats() if suppressor else None,
+                               consolidated_output if bounded else None,
+                               concurrency.summary() if concurrency else None,
+                               scanner.matcher.summary() if scanner else None)
+
+        if bounded:
+            shutil.copyfile(consolidated_output, latest_output)
+        else:
+            with open(latest_output, 'w') as f:
+                json.dump(results, f, indent=2)
 
-        # 5. RESUMEN FINAL
-        generate_final_summary(results, summary_output, stats, cases_created, thehive_available)
+        export_parquet(export_settings(connections), results, run_id)
 
-        with open(latest_output, 'w') as f:
-            json.dump(results, f, indent=2)
+        store.finish_run(run_id, 'INCOMPLETE' if pending_units else 'COMPLETED')
+        record_history(history_settings(connections), run_id)
 
         print(f"\n{'='*70}")
         print(f"✅ Escaneo completado exitosamente")
         print(f"📁 Resultados guardados en: {ALERTS_DIR}/")
         print(f"{'='*70}\n")
     else:
+        pipeline.close()
+        store.finish_run(run_id, 'INCOMPLETE')
         print("\n❌ Escaneo falló")
         exit(1)
\ No newline at end of file
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Historial de ejecuciones con agregados diarios y semanales
+Al final de cada ejecución las ubicaciones de run_location se resumen por
+fuente, patrón y severidad (run_totals) y se recalculan los agregados del día
+y la semana de la ejecución. Las consultas de tendencia leen solo los
+agregados; el detalle viejo se compacta según la política de retención
+"""
+
+import argparse
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+DEFAULT_DETAIL_DAYS = 30      # run_location y scan_checkpoints por ejecución
+DEFAULT_RUN_DAYS = 400        # run_totals (un resumen chico por ejecución)
+DEFAULT_DAILY_DAYS = 730      # rollup_daily; rollup_weekly no se compacta
+
+ROLLUPS = {'daily': ('rollup_daily', 'day'), 'weekly': ('rollup_weekly', 'week')}
+
+
+def history_settings(connections: Dict) -> Dict:
+    """Sección opcional `history:` de connection.yml (retención en días)"""
+    settings = connections.get('history') or {}
+    return {
+        'detail_days': int(settings.get('detail_days', DEFAULT_DETAIL_DAYS)),
+        'run_days': int(settings.get('run_days', DEFAULT_RUN_DAYS)),
+        'daily_days': int(settings.get('daily_days', DEFAULT_DAILY_DAYS)),
+    }
+
+
+def week_start(day: str) -> str:
+    """Lunes de la semana ISO del día 'YYYY-MM-DD'"""
+    current = date.fromisoformat(day)
+    return (current - timedelta(days=current.weekday())).isoformat()
+
+
+class RunHistory:
+    def __init__(self, db_path='/app/data/alerts.db'):
+        self.db_path = db_path
+        self._init_db()
+
+    def _init_db(self):
+        """Crea el resumen por ejecución y las tablas de agregados"""
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            # Clusterizadas por período: recalcular un día/semana y leer un rango
+            # de fechas son recorridos contiguos del b-tree
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS run_totals (
+                    run_day TEXT NOT NULL,
+                    run_id TEXT NOT NULL,
+                    data_source TEXT NOT NULL,
+                    pattern_name TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    locations INTEGER NOT NULL,
+                    PRIMARY KEY (run_day, run_id, data_source, pattern_name, severity)
+                ) WITHOUT ROWID
+            ''')
+            for table, period in ROLLUPS.values():
+                c.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        {period} TEXT NOT NULL,
+                        data_source TEXT NOT NULL,
+                        pattern_name TEXT NOT NULL,
+                        severity TEXT NOT NULL,
+                        runs INTEGER NOT NULL,
+                        locations INTEGER NOT NULL,
+                        peak_locations INTEGER NOT NULL,
+                        PRIMARY KEY ({period}, data_source, pattern_name, severity)
+                    ) WITHOUT ROWID
+                ''')
+            conn.commit()
+
+    def record_run(self, run_id: str) -> int:
+        """
+        Resume las ubicaciones de la ejecución y recalcula los agregados de su
+        día y su semana (idempotente: una ejecución reanudada se reemplaza)
+
+        Returns:
+            int: grupos (fuente, patrón, severidad) de la ejecución
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            row = c.execute('SELECT date(started_at) FROM scan_runs WHERE run_id = ?',
+                            (run_id,)).fetchone()
+            run_day = row[0] if row and row[0] else date.today().isoformat()
+
+            c.execute('DELETE FROM run_totals WHERE run_day = ? AND run_id = ?', (run_day, run_id))
+            # La severidad es la de la ejecución; fuente y patrón no cambian por clave
+            c.execute('''
+                INSERT INTO run_totals
+                (run_day, run_id, data_source, pattern_name, severity, locations)
+                SELECT ?, l.run_id, a.data_source, a.pattern_name,
+                       COALESCE(l.severity, a.severity), COUNT(*)
+                FROM run_location l
+                JOIN alerts a ON a.alert_key = l.alert_key
+                WHERE l.run_id = ?
+                GROUP BY a.data_source, a.pattern_name, COALESCE(l.severity, a.severity)
+            ''', (run_day, run_id))
+            groups = c.rowcount
+
+            week = week_start(run_day)
+            self._rebuild(c, 'daily', run_day, run_day, run_day)
+            self._rebuild(c, 'weekly', week, week,
+                          (date.fromisoformat(week) + timedelta(days=6)).isoformat())
+            conn.commit()
+        return groups
+
+    def _rebuild(self, c, rollup: str, period: str, first_day: str, last_day: str):
+        """Recalcula un período completo desde run_totals"""
+        table, column = ROLLUPS[rollup]
+        c.execute(f'DELETE FROM {table} WHERE {column} = ?', (period,))
+        c.execute(f'''
+            INSERT INTO {table}
+            ({column}, data_source, pattern_name, severity, runs, locations, peak_locations)
+            SELECT ?, data_source, pattern_name, severity, COUNT(*), SUM(locations), MAX(locations)
+            FROM run_totals
+            WHERE run_day BETWEEN ? AND ?
+            GROUP BY data_source, pattern_name, severity
+        ''', (period, first_day, last_day))
+
+    def compact(self, settings: Dict) -> Dict:
+        """
+        Aplica la retención: borra el detalle por ubicación y los checkpoints
+        de ejecuciones viejas, y los resúmenes/agregados diarios más allá de su
+        plazo. La última ejecución con ubicaciones conserva su detalle (es la
+        base del próximo diff) y la última interrumpida sus checkpoints (--resume)
+
+        Returns:
+            dict: filas borradas por tabla
+        """
+        deleted = {}
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            detail_cutoff = f"-{settings['detail_days']} days"
+            c.execute('''
+                DELETE FROM run_location
+                WHERE run_id IN (
+                    SELECT run_id FROM scan_runs
+                    WHERE started_at < datetime('now', ?)
+                )
+                AND run_id < (SELECT MAX(run_id) FROM run_location)
+            ''', (detail_cutoff,))
+            deleted['run_location'] = c.rowcount
+            # Los checkpoints llevan los matches: solo la ejecución que retomaría
+            # --resume (ver CheckpointStore.last_interrupted_run) los conserva
+            # más allá del plazo; las interrumpidas anteriores ya no se retoman
+            c.execute('''
+                DELETE FROM scan_checkpoints
+                WHERE run_id IN (
+                    SELECT run_id FROM scan_runs
+                    WHERE started_at < datetime('now', ?)
+                )
+                AND run_id IS NOT (
+                    SELECT run_id FROM scan_runs
+                    WHERE status IN ('RUNNING', 'INCOMPLETE')
+                    ORDER BY started_at DESC, run_id DESC
+                    LIMIT 1
+                )
+            ''', (detail_cutoff,))
+            deleted['scan_checkpoints'] = c.rowcount
+
+            c.execute("DELETE FROM run_totals WHERE run_day < date('now', ?)",
+                      (f"-{settings['run_days']} days",))
+            deleted['run_totals'] = c.rowcount
+            c.execute("DELETE FROM rollup_daily WHERE day < date('now', ?)",
+                      (f"-{settings['daily_days']} days",))
+            deleted['rollup_daily'] = c.rowcount
+            conn.commit()
+        return deleted
+
+    def trend(self, rollup: str = 'daily', days: int = 90, data_source: Optional[str] = None,
+              severity: Optional[str] = None, pattern_name: Optional[str] = None) -> List[Dict]:
+        """
+        Serie por período: ejecuciones y ubicaciones (total y promedio por ejecución)
+
+        Returns:
+            list: [{'period', 'runs', 'locations', 'avg_locations'}] en orden
+        """
+        table, column = ROLLUPS[rollup]
+        since = (date.today() - timedelta(days=days)).isoformat()
+        if rollup == 'weekly':
+            since = week_start(since)
+
+        conditions, params = [f'{column} >= ?'], [since]
+        for name, value in (('data_source', data_source), ('severity', severity),
+                            ('pattern_name', pattern_name)):
+            if value:
+                conditions.append(f'{name} = ?')
+                params.append(value)
+
+        with sqlite3.connect(self.db_path) as conn:
+            # Por período: runs es el máximo entre grupos (cada grupo cuenta las
+            # ejecuciones en las que apareció); las ubicaciones se suman
+            rows = conn.execute(f'''
+                SELECT {column}, MAX(runs), SUM(locations)
+                FROM {table}
+                WHERE {' AND '.join(conditions)}
+                GROUP BY {column}
+                ORDER BY {column}
+            ''', params).fetchall()
+
+        return [{
+            'period': period,
+            'runs': runs,
+            'locations': locations,
+            'avg_locations': round(locations / runs, 1),
+        } for period, runs, locations in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tendencia de hallazgos desde los agregados de alerts.db')
+    parser.add_argument('--db', default='/app/data/alerts.db')
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--weekly', action='store_true', help='Agregado semanal (default: diario)')
+    parser.add_argument('--source', help='mysql, s3, ...')
+    parser.add_argument('--severity', help='CRITICAL, HIGH, MEDIUM, LOW')
+    parser.add_argument('--pattern', help='Nombre del patrón')
+    args = parser.parse_args()
+
+    history = RunHistory(args.db)
+    started = datetime.now()
+    series = history.trend('weekly' if args.weekly else 'daily', args.days,
+                           args.source, args.severity, args.pattern)
+    elapsed_ms = (datetime.now() - started).total_seconds() * 1000
+
+    print(f"{'Período':<12} {'Ejecuciones':>11} {'Ubicaciones':>12} {'Promedio':>9}")
+    for point in series:
+        print(f"{point['period']:<12} {point['runs']:>11} {point['locations']:>12} "
+              f"{point['avg_locations']:>9}")
+    print(f"\n⏱️  {len(series)} períodos en {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Priorización de unidades de trabajo por riesgo
+Ordena con el historial de alerts.db para que lo más valioso se escanee primero
+y, con un presupuesto de tiempo, lo que quede afuera sea lo de menor riesgo
+"""
+
+import math
+import re
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, List
+
+# Estados que cuentan como riesgo vigente (descartadas y resueltas no suman)
+ACTIVE_STATUSES = ('NEW', 'SENT', 'REOPENED')
+
+# Pesos del score
+CRITICAL_WEIGHT = 10.0
+HIGH_WEIGHT = 4.0
+REOPEN_WEIGHT = 3.0
+STALENESS_WEIGHT = 2.0       # por día sin escanear
+MAX_STALENESS_DAYS = 7       # tope (y valor de una unidad nunca escaneada)
+VOLUME_WEIGHT = 1.0          # por log(1 + segundos del último escaneo)
+
+
+class BudgetExhausted(Exception):
+    """Se agotó el presupuesto de tiempo en medio de una unidad"""
+
+
+def parse_budget(value: str) -> float:
+    """'5400', '90m', '1.5h' → segundos"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*', str(value))
+    if not match:
+        raise ValueError(f"Presupuesto inválido: {value} (ej: 3600, 90m, 2h)")
+    number, unit = float(match.group(1)), match.group(2)
+    return number * {'': 1, 's': 1, 'm': 60, 'h': 3600}[unit]
+
+
+def unit_location_prefix(unit: Dict) -> str:
+    """Prefijo de alerts.location que corresponde a la unidad (ver finding_location)"""
+    if unit['source'] == 'mysql' and unit.get('part'):
+        return f"{unit['target']}:{unit['config'].get('database')}.{unit['part']}."
+    return f"{unit['target']}:"
+
+
+class RiskScheduler:
+    def __init__(self, db_path='/app/data/alerts.db'):
+        self.db_path = db_path
+
+    def _alert_history(self, conn, prefixes: List[str]) -> Dict[str, Dict]:
+        """
+        CRITICAL/HIGH activas y re-aperturas agregadas por prefijo de ubicación
+        Las re-aperturas se cuentan en cualquier estado: una ubicación que
+        reincide sigue siendo de riesgo aunque hoy esté resuelta
+        """
+        history = {prefix: {'critical': 0, 'high': 0, 'reopens': 0} for prefix in prefixes}
+        # Del prefijo más largo al más corto: una tabla gana sobre el target completo
+        ordered = sorted(prefixes, key=len, reverse=True)
+        try:
+            rows = conn.execute('''
+                SELECT location, severity, status, reopen_count FROM alerts
+                WHERE severity IN ('CRITICAL', 'HIGH')
+            ''')
+            for location, severity, status, reopen_count in rows:
+                for prefix in ordered:
+                    if location.startswith(prefix):
+                        entry = history[prefix]
+                        if status in ACTIVE_STATUSES:
+                            entry['critical' if severity == 'CRITICAL' else 'high'] += 1
+                        entry['reopens'] += reopen_count or 0
+                        break
+        except sqlite3.OperationalError:
+            # Base nueva: todavía no hay tabla alerts
+            pass
+        return history
+
+    def _unit_history(self, conn, unit_key: str) -> Dict:
+        """Último estado de la unidad, último escaneo completo y su duración"""
+        last = conn.execute('''
+            SELECT status FROM scan_units
+            WHERE unit_key = ?
+            ORDER BY run_id DESC LIMIT 1
+        ''', (unit_key,)).fetchone()
+        done = conn.execute('''
+            SELECT finished_at,
+                   (julianday(finished_at) - julianday(started_at)) * 86400
+            FROM scan_units
+            WHERE unit_key = ? AND status = 'DONE'
+            ORDER BY run_id DESC LIMIT 1
+        ''', (unit_key,)).fetchone()
+        return {
+            'last_status': last[0] if last else None,
+            'last_done': done[0] if done else None,
+            'last_seconds': max(done[1] or 0.0, 0.0) if done else 0.0,
+        }
+
+    def scores(self, units: List[Dict]) -> Dict[str, Dict]:
+        """
+        Score de riesgo por unidad
+
+        Returns:
+            dict: unit_key → {'score', 'skipped_before', 'critical', 'high',
+                              'reopens', 'staleness_days', 'last_seconds'}
+        """
+        now = datetime.now(timezone.utc)
+        prefixes = {unit['key']: unit_location_prefix(unit) for unit in units}
+        scores = {}
+
+        with sqlite3.connect(self.db_path) as conn:
+            history = self._alert_history(conn, list(set(prefixes.values())))
+            for unit in units:
+                alerts = history[prefixes[unit['key']]]
+                past = self._unit_history(conn, unit['key'])
+
+                if past['last_done']:
+                    # CURRENT_TIMESTAMP de SQLite: UTC sin zona
+                    last_done = datetime.strptime(past['last_done'], "%Y-%m-%d %H:%M:%S").replace(
+                        tzinfo=timezone.utc)
+                    staleness = min((now - last_done).total_seconds() / 86400, MAX_STALENESS_DAYS)
+                else:
+                    staleness = MAX_STALENESS_DAYS
+
+                score = (CRITICAL_WEIGHT * alerts['critical'] +
+                         HIGH_WEIGHT * alerts['high'] +
+                         REOPEN_WEIGHT * alerts['reopens'] +
+                         STALENESS_WEIGHT * staleness +
+                         VOLUME_WEIGHT * math.log1p(past['last_seconds']))
+
+                scores[unit['key']] = dict(
+                    alerts,
+                    score=round(score, 2),
+                    # Quedó afuera por presupuesto, falló o se cortó la última vez: va primero
+                    skipped_before=past['last_status'] not in (None, 'DONE'),
+                    staleness_days=round(staleness, 2),
+                    last_seconds=round(past['last_seconds'], 1),
+                )
+        return scores
+
+    def order(self, units: List[Dict]) -> List[Dict]:
+        """Unidades ordenadas: primero las salteadas antes, luego por score descendente"""
+        scores = self.scores(units)
+        for unit in units:
+            unit['risk'] = scores[unit['key']]
+        return sorted(units, key=lambda u: (not u['risk']['skipped_before'], -u['risk']['score']))
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Índice de aplicabilidad columna × patrón para escaneos MySQL
+Usa information_schema.COLUMNS para descartar pares que nunca pueden matchear
+"""
+
+import hashlib
+import json
+import sqlite3
+from typing import Dict, List, Optional
+
+from fingerprints import analyze_pattern, can_match_within, fingerprints_signature
+
+# Alfabeto de str(valor) según el tipo MySQL (None = texto libre).
+# El signo '-' de los numéricos solo aparece al inicio, nunca entre dígitos,
+# así que no se incluye: ningún patrón puede usarlo como separador.
+DIGITS = '0123456789'
+TYPE_ALPHABETS = {
+    'tinyint': DIGITS,
+    'smallint': DIGITS,
+    'mediumint': DIGITS,
+    'int': DIGITS,
+    'integer': DIGITS,
+    'bigint': DIGITS,
+    'bit': DIGITS,
+    'decimal': DIGITS + '.',
+    'numeric': DIGITS + '.',
+    'float': DIGITS + '.e+-inaf',
+    'double': DIGITS + '.e+-inaf',
+    'real': DIGITS + '.e+-inaf',
+    'year': DIGITS,
+    'date': DIGITS + '-',
+    'time': DIGITS + '-:. ',
+    'datetime': DIGITS + '-:. ',
+    'timestamp': DIGITS + '-:. ',
+}
+
+# Longitud máxima de str(valor) para tipos sin CHARACTER_MAXIMUM_LENGTH
+TYPE_MAX_LENGTHS = {
+    'tinyint': 4,
+    'smallint': 6,
+    'mediumint': 8,
+    'int': 11,
+    'integer': 11,
+    'bigint': 20,
+    'year': 4,
+    'date': 10,
+    'time': 17,
+    'datetime': 26,
+    'timestamp': 26,
+    'float': 24,
+    'double': 24,
+    'real': 24,
+}
+
+COLUMNS_QUERY = '''
+    SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, COLUMN_TYPE,
+           CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, CHARACTER_SET_NAME
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = %s
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+'''
+
+
+def column_profile(data_type: str, char_max_length, numeric_precision, charset) -> Dict:
+    """Alfabeto y longitud máxima que puede tener str(valor) de una columna"""
+    data_type = (data_type or '').lower()
+    max_len = None
+
+    if char_max_length is not None:
+        max_len = int(char_max_length)
+    elif data_type in ('decimal', 'numeric') and numeric_precision is not None:
+        # Signo + punto decimal
+        max_len = int(numeric_precision) + 2
+    elif data_type == 'bit' and numeric_precision is not None:
+        max_len = len(str(2 ** int(numeric_precision) - 1))
+    else:
+        max_len = TYPE_MAX_LENGTHS.get(data_type)
+
+    return {
+        'data_type': data_type,
+        'alphabet': TYPE_ALPHABETS.get(data_type),
+        'max_len': max_len,
+        'charset': charset
+    }
+
+
+def applicable_patterns(profile: Dict, analyses: Dict[str, Dict]) -> List[str]:
+    """Patrones que pueden matchear en una columna con el perfil dado"""
+    result = []
+    for pattern_name, analysis in analyses.items():
+        if profile['max_len'] is not None and analysis['min_len'] > profile['max_len']:
+            continue
+        if not can_match_within(analysis, profile['alphabet']):
+            continue
+        result.append(pattern_name)
+    return result
+
+
+class SchemaIndex:
+    """Cache persistente (alerts.db) del índice de aplicabilidad por tabla"""
+
+    def __init__(self, patterns: Dict[str, str], db_path='/app/data/alerts.db'):
+        self.db_path = db_path
+        self.patterns = patterns
+        self.patterns_signature = fingerprints_signature(patterns)
+        self.analyses = {name: analyze_pattern(regex) for name, regex in patterns.items()}
+        # {(profile, table): {column: [patrones]}}
+        self.index = {}
+        self._init_db()
+
+    def _init_db(self):
+        """Crea la tabla de cache de esquema"""
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS schema_cache (
+                    profile TEXT NOT NULL,
+                    table_schema TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    table_signature TEXT NOT NULL,
+                    patterns_signature TEXT NOT NULL,
+                    applicability TEXT NOT NULL,
+                    built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (profile, table_schema, table_name)
+                )
+            ''')
+            conn.commit()
+
+    def refresh(self, profile: str, mysql_conn, database: str) -> Dict:
+        """
+        Lee information_schema y reconstruye solo las tablas cuyo esquema cambió
+
+        Returns:
+            dict: {'tables', 'rebuilt', 'cached'}
+        """
+        cursor = mysql_conn.cursor()
+        cursor.execute(COLUMNS_QUERY, (database,))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        columns_by_table = {}
+        for table, column, data_type, column_type, char_len, precision, charset in rows:
+            columns_by_table.setdefault(table, []).append(
+                (column, data_type, column_type, char_len, precision, charset)
+            )
+
+        stats = {'tables': len(columns_by_table), 'rebuilt': 0, 'cached': 0}
+
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT table_name, table_signature, patterns_signature, applicability
+                FROM schema_cache
+                WHERE profile = ? AND table_schema = ?
+            ''', (profile, database))
+            cached = {row[0]: row[1:] for row in c.fetchall()}
+
+            for table, columns in columns_by_table.items():
+                signature = self._table_signature(columns)
+                previous = cached.get(table)
+
+                if previous and previous[0] == signature and previous[1] == self.patterns_signature:
+                    self.index[(profile, table)] = json.loads(previous[2])
+                    stats['cached'] += 1
+                    continue
+
+                applicability = {}
+                for column, data_type, _column_type, char_len, precision, charset in columns:
+                    col_profile = column_profile(data_type, char_len, precision, charset)
+                    applicability[column] = applicable_patterns(col_profile, self.analyses)
+
+                self.index[(profile, table)] = applicability
+                c.execute('''
+                    INSERT OR REPLACE INTO schema_cache
+                    (profile, table_schema, table_name, table_signature,
+                     patterns_signature, applicability, built_at)
+                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (profile, database, table, signature, self.patterns_signature,
+                      json.dumps(applicability)))
+                stats['rebuilt'] += 1
+
+            # Tablas eliminadas del esquema
+            removed = set(cached) - set(columns_by_table)
+            c.executemany('''
+                DELETE FROM schema_cache
+                WHERE profile = ? AND table_schema = ? AND table_name = ?
+            ''', [(profile, database, table) for table in removed])
+            conn.commit()
+
+        return stats
+
+    def _table_signature(self, columns) -> str:
+        """Firma de la definición de la tabla (cambia con cualquier ALTER de columnas)"""
+        payload = json.dumps(columns, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def patterns_for(self, profile: str, table: str, column: str) -> Optional[List[str]]:
+        """Patrones aplicables a una columna (None si la tabla no está indexada)"""
+        applicability = self.index.get((profile, table))
+        if applicability is None or column not in applicability:
+            return None
+        return applicability[column]
+
+    def skipped_pairs(self, profile: str) -> int:
+        """Cantidad de pares columna × patrón descartados para un perfil"""
+        total = 0
+        for (idx_profile, _table), applicability in self.index.items():
+            if idx_profile == profile:
+                for patterns in applicability.values():
+                    total += len(self.patterns) - len(patterns)
+        return total
+
+    def excluded_columns(self, profile: str, tables: Optional[List[str]] = None) -> List[str]:
+        """
+        Columnas donde ningún patrón puede matchear en ninguna tabla
+
+        hawk_scanner aplica exclude_columns por nombre a todas las tablas del perfil,
+        por lo que una columna solo se excluye si es inaplicable en todas ellas.
+        """
+        applicable_anywhere = set()
+        all_columns = set()
+        for (idx_profile, table), applicability in self.index.items():
+            if idx_profile != profile or (tables and table not in tables):
+                continue
+            for column, patterns in applicability.items():
+                all_columns.add(column)
+                if patterns:
+                    applicable_anywhere.add(column)
+        return sorted(all_columns - applicable_anywhere)
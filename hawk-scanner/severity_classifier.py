@@ -4,6 +4,9 @@ Clasificador de severidad inteligente para Hawk-Eye Scanner
 Reclasifica hallazgos basándose en el TIPO de dato, no en la cantidad
 """
 
+import hashlib
+import json
+
 # Mapa de severidad por tipo de patrón
 SEVERITY_MAP = {
     # CRITICAL - Datos que permiten fraude inmediato o acceso total
@@ -51,6 +54,8 @@ SEVERITY_MAP = {
     ]
 }
 
+DEFAULT_SEVERITY = "MEDIUM"  # Patrones que no están en el mapa
+
 def get_severity(pattern_name):
     """
     Retorna la severidad correcta basada en el tipo de patrón
@@ -64,7 +69,27 @@ def get_severity(pattern_name):
     for severity, patterns in SEVERITY_MAP.items():
         if pattern_name in patterns:
             return severity
-    return "MEDIUM"  # Default si no está clasificado
+    return DEFAULT_SEVERITY  # Default si no está clasificado
+
+def severity_rules():
+    """
+    Mapa plano patrón → severidad (la primera severidad que lo lista gana, como en get_severity)
+    """
+    rules = {}
+    for severity, patterns in SEVERITY_MAP.items():
+        for pattern in patterns:
+            rules.setdefault(pattern, severity)
+    return rules
+
+def rules_fingerprint():
+    """
+    Huella de las reglas vigentes: cambia al editar SEVERITY_MAP o DEFAULT_SEVERITY
+    
+    Returns:
+        str: 16 caracteres hex
+    """
+    canonical = json.dumps({'rules': severity_rules(), 'default': DEFAULT_SEVERITY}, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
 
 def reclassify_findings(findings):
     """
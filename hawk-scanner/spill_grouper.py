@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Agrupación de hallazgos por ubicación con presupuesto de memoria
+Mientras entra en el presupuesto agrupa en un dict; antes de superarlo vuelca
+los grupos a particiones en disco por prefijo del alert_hash y después las
+procesa de a una. Una partición que no entra en el presupuesto se vuelve a
+repartir por el dígito siguiente del hash. Las particiones son rangos de
+clave, así que los grupos salen en el mismo orden (por alert_hash) con o sin
+volcado
+"""
+
+import json
+import os
+import re
+import tempfile
+from typing import Dict, Iterator, Optional
+
+from alert_manager import alert_key, finding_location
+
+HEX_DIGITS = '0123456789abcdef'   # una partición por dígito hex del alert_hash (rango de claves)
+KEY_HEX = 16                      # largo del alert_hash: un prefijo así es una sola ubicación
+GROUP_OVERHEAD = 400       # bytes estimados por grupo (dict + claves + strings)
+
+
+def parse_size(value: str) -> int:
+    """'536870912', '512M', '2G' → bytes"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)B?\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Tamaño inválido: {value} (ej: 512M, 2G)")
+    number, unit = float(match.group(1)), match.group(2).upper()
+    return int(number * {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[unit])
+
+
+def finding_hash(finding: Dict) -> str:
+    """Mismo alert_hash que AlertManager._generate_hash"""
+    return alert_key(finding.get('data_source', 'unknown'), finding.get('pattern_name', 'Unknown'),
+                     finding_location(finding)).hex()
+
+
+def _merge(groups: Dict[str, Dict], key: str, finding: Dict, room: Optional[int] = None) -> Optional[int]:
+    """
+    Suma el hallazgo a su grupo: se conserva la primera ocurrencia y se unen
+    los matches en orden de aparición
+
+    Args:
+        room (int): bytes disponibles; si el hallazgo no entra no se agrega
+
+    Returns:
+        int: bytes estimados agregados, o None si no había lugar
+    """
+    matches = [str(m) for m in finding.get('matches') or []]
+    group = groups.get(key)
+    if group is None:
+        added = GROUP_OVERHEAD + sum(len(m) for m in matches) + len(str(finding.get('sample_text') or ''))
+        if room is not None and added > room:
+            return None
+        groups[key] = dict(finding, matches=list(dict.fromkeys(matches)))
+        return added
+    known = set(group['matches'])
+    new = [m for m in dict.fromkeys(matches) if m not in known]
+    added = sum(len(m) for m in new)
+    if room is not None and added > room:
+        return None
+    group['matches'] = group['matches'] + new
+    return added
+
+
+class SpillGrouper:
+    """
+    Agrupa hallazgos por alert_hash sin pasar de max_bytes (None = sin límite)
+    La única excepción es una sola ubicación que por sí misma supera el presupuesto
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, work_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.work_dir = work_dir
+        self.groups = {}
+        self.size = 0
+        self.peak = 0          # máximo de bytes estimados en memoria (agrupación y lectura)
+        self.spill_dir = None
+        self.spills = 0
+        self.splits = 0        # particiones repartidas de nuevo por no entrar en el presupuesto
+        self.count = 0
+
+    def _room(self, size: int, groups: Dict) -> Optional[int]:
+        # Un dict vacío siempre acepta el grupo, aunque supere el presupuesto solo
+        if self.max_bytes is None or not groups:
+            return None
+        return self.max_bytes - size
+
+    def add(self, finding: Dict):
+        key = finding_hash(finding)
+        added = _merge(self.groups, key, finding, self._room(self.size, self.groups))
+        if added is None:
+            self._spill()
+            added = _merge(self.groups, key, finding)
+        self.size += added
+        self.peak = max(self.peak, self.size)
+        self.count += 1
+
+    def _spill(self):
+        """Agrega los grupos en memoria a sus particiones (JSON lines) y libera el dict"""
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.TemporaryDirectory(prefix='hawk_groups_', dir=self.work_dir)
+        self._write((key, group) for key, group in self.groups.items())
+        self.groups = {}
+        self.size = 0
+        self.spills += 1
+
+    def _write(self, entries, depth: int = 1):
+        """Agrega cada (clave, grupo) a la partición de sus primeros `depth` dígitos"""
+        handles = {}
+        try:
+            for key, group in entries:
+                prefix = key[:depth]
+                if prefix not in handles:
+                    handles[prefix] = open(self._partition_path(prefix), 'a')
+                handles[prefix].write(json.dumps([key, group]) + '\n')
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    def _partition_path(self, prefix: str) -> str:
+        return os.path.join(self.spill_dir.name, f"part_{prefix}.jsonl")
+
+    def _read_partition(self, prefix: str) -> Iterator[Dict]:
+        """
+        Grupos de una partición en orden; si no entra en el presupuesto se
+        reparte por el dígito siguiente y se lee cada sub-partición
+        """
+        path = self._partition_path(prefix)
+        if not os.path.exists(path):
+            return
+        groups, size, complete = {}, 0, True
+        with open(path, 'r') as f:
+            # Los volcados se agregan en orden: la primera línea de una clave
+            # es su primera ocurrencia, igual que en memoria
+            for line in f:
+                key, group = json.loads(line)
+                room = self._room(size, groups) if len(prefix) < KEY_HEX else None
+                added = _merge(groups, key, group, room)
+                if added is None:
+                    complete = False
+                    break
+                size += added
+                self.peak = max(self.peak, size)
+
+        if complete:
+            os.remove(path)
+            for key in sorted(groups):
+                yield groups[key]
+            return
+
+        groups = None
+        self.splits += 1
+        with open(path, 'r') as f:
+            self._write((json.loads(line) for line in f), len(prefix) + 1)
+        os.remove(path)
+        for digit in HEX_DIGITS:
+            yield from self._read_partition(prefix + digit)
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Grupos ordenados por alert_hash; con volcado, una partición en memoria a la vez"""
+        if self.spill_dir is None:
+            for key in sorted(self.groups):
+                yield self.groups[key]
+            return
+
+        if self.groups:
+            self._spill()
+        try:
+            for digit in HEX_DIGITS:
+                yield from self._read_partition(digit)
+        finally:
+            self.spill_dir.cleanup()
+            self.spill_dir = None
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Supresión de valores de prueba conocidos (tarjetas de test, emails de ejemplo)
+Las allowlists se compilan a un índice binario: un filtro de Bloom para
+descartar rápido los valores reales y un arreglo ordenado de claves de 8 bytes
+para confirmar los positivos (sin falsos positivos). El índice se abre con
+mmap, así que cargarlo no depende de la cantidad de entradas
+"""
+
+import argparse
+import glob
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+INDEX_MAGIC = b'HAWKSUP1'
+HEADER = struct.Struct('>8sQQI')          # magic, entradas, bits del filtro, funciones hash
+KEY_SIZE = 8
+FALSE_POSITIVE_RATE = 0.001
+DEFAULT_ALLOWLIST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'allowlists')
+DEFAULT_INDEX = '/app/data/suppression.idx'
+
+_SEPARATORS = re.compile(r'[\s\-]')
+
+
+def suppression_settings(connections: Dict) -> Dict:
+    """Sección opcional `suppression:` de connection.yml"""
+    settings = connections.get('suppression') or {}
+    allowlists = settings.get('allowlists') or [DEFAULT_ALLOWLIST_DIR]
+    return {
+        'enabled': bool(settings.get('enabled', False)),
+        'allowlists': [allowlists] if isinstance(allowlists, str) else list(allowlists),
+        'index': settings.get('index', DEFAULT_INDEX),
+    }
+
+
+def normalize(value: str) -> str:
+    """
+    Forma canónica de un valor: números sin separadores (4532-0151-1283-0366 →
+    4532015112830366) y el resto en minúsculas sin espacios alrededor
+    """
+    value = str(value).strip()
+    digits = _SEPARATORS.sub('', value)
+    if digits.isdigit():
+        return digits
+    return value.lower()
+
+
+def _digest(value: str) -> bytes:
+    return hashlib.blake2b(normalize(value).encode('utf-8'), digest_size=16).digest()
+
+
+def _positions(digest: bytes, bits: int, hashes: int) -> Iterator[int]:
+    """Double hashing (Kirsch-Mitzenmacher) sobre las dos mitades del digest"""
+    h1 = int.from_bytes(digest[:8], 'big')
+    h2 = int.from_bytes(digest[8:], 'big') | 1
+    for i in range(hashes):
+        yield (h1 + i * h2) % bits
+
+
+def allowlist_files(paths: Iterable[str]) -> List[str]:
+    """Archivos .txt de las rutas indicadas (archivos o directorios)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.txt'))))
+        elif os.path.isfile(path):
+            files.append(path)
+    return files
+
+
+def read_allowlist(path: str) -> Iterator[str]:
+    """Un valor por línea; vacías y comentarios (#) se ignoran"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+def sources_fingerprint(files: List[str]) -> str:
+    """Ruta, mtime y tamaño de cada allowlist: cambia si se agrega, borra o edita una"""
+    lines = []
+    for path in files:
+        stat = os.stat(path)
+        lines.append(f"{os.path.abspath(path)}\t{stat.st_mtime_ns}\t{stat.st_size}\n")
+    return ''.join(lines)
+
+
+def compile_index(files: List[str], index_path: str,
+                  false_positive_rate: float = FALSE_POSITIVE_RATE) -> int:
+    """
+    Compila las allowlists a un índice binario
+
+    Returns:
+        int: cantidad de valores distintos indexados
+    """
+    digests = sorted({_digest(value) for path in files for value in read_allowlist(path)})
+    entries = len(digests)
+
+    bits = max(64, int(math.ceil(-entries * math.log(false_positive_rate) / math.log(2) ** 2)))
+    bits = (bits + 7) // 8 * 8
+    hashes = max(1, round(bits / max(entries, 1) * math.log(2)))
+
+    bloom = bytearray(bits // 8)
+    for digest in digests:
+        for position in _positions(digest, bits, hashes):
+            bloom[position >> 3] |= 1 << (position & 7)
+
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(INDEX_MAGIC, entries, bits, hashes))
+        f.write(bloom)
+        # Claves de confirmación ordenadas: búsqueda binaria directa sobre el mmap
+        f.write(b''.join(dict.fromkeys(digest[:KEY_SIZE] for digest in digests)))
+    os.replace(tmp_path, index_path)
+    # Junto al índice, las allowlists de las que salió (ver load_suppressor)
+    with open(f"{index_path}.sources", 'w') as f:
+        f.write(sources_fingerprint(files))
+    return entries
+
+
+class Suppressor:
+    """Filtra matches que están en el índice y cuenta los suprimidos por patrón"""
+
+    def __init__(self, index_path: str):
+        with open(index_path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.entries, self.bits, self.hashes = HEADER.unpack_from(self.data)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Índice de supresión inválido: {index_path}")
+        self.keys_offset = HEADER.size + self.bits // 8
+        self.key_count = (len(self.data) - self.keys_offset) // KEY_SIZE
+
+        self.lock = threading.Lock()
+        self.suppressed = Counter()
+        self.false_positives = 0
+
+    def _in_bloom(self, digest: bytes) -> bool:
+        data = self.data
+        for position in _positions(digest, self.bits, self.hashes):
+            if not data[HEADER.size + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def _in_keys(self, key: bytes) -> bool:
+        low, high = 0, self.key_count
+        data, offset = self.data, self.keys_offset
+        while low < high:
+            middle = (low + high) // 2
+            start = offset + middle * KEY_SIZE
+            current = data[start:start + KEY_SIZE]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                return True
+        return False
+
+    def is_known(self, value: str) -> bool:
+        digest = _digest(value)
+        if not self._in_bloom(digest):
+            return False
+        known = self._in_keys(digest[:KEY_SIZE])
+        if not known:
+            with self.lock:
+                self.false_positives += 1
+        return known
+
+    def filter_matches(self, pattern_name: str, matches: List[str]) -> List[str]:
+        """Matches que no son valores de prueba conocidos (antes de redactar)"""
+        kept = [m for m in matches if not self.is_known(m)]
+        if len(kept) != len(matches):
+            with self.lock:
+                self.suppressed[pattern_name] += len(matches) - len(kept)
+        return kept
+
+    def filter_findings(self, findings: List[Dict]) -> List[Dict]:
+        """Quita los matches conocidos; un hallazgo sin matches restantes se descarta"""
+        kept = []
+        for finding in findings:
+            matches = finding.get('matches') or []
+            remaining = self.filter_matches(finding.get('pattern_name', 'Unknown'), matches)
+            if remaining:
+                kept.append(dict(finding, matches=remaining) if len(remaining) != len(matches) else finding)
+            elif not matches:
+                kept.append(finding)
+        return kept
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'by_pattern': dict(self.suppressed),
+                'total': sum(self.suppressed.values()),
+                'bloom_false_positives': self.false_positives,
+            }
+
+
+def load_suppressor(settings: Dict) -> Optional[Suppressor]:
+    """
+    Abre el índice de supresión, recompilándolo si cambió el conjunto de
+    allowlists: una agregada, borrada o editada
+
+    Returns:
+        Suppressor, o None si está deshabilitado o no hay allowlists
+    """
+    if not settings['enabled']:
+        return None
+    files = allowlist_files(settings['allowlists'])
+    if not files:
+        print("⚠️  Supresión habilitada pero sin allowlists")
+        return None
+
+    index_path = settings['index']
+    try:
+        with open(f"{index_path}.sources") as f:
+            compiled_from = f.read()
+    except OSError:
+        compiled_from = None
+    if not os.path.exists(index_path) or compiled_from != sources_fingerprint(files):
+        entries = compile_index(files, index_path)
+        print(f"🔕 Índice de supresión compilado: {entries} valores de {len(files)} allowlists")
+
+    return Suppressor(index_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compila y consulta allowlists de valores de prueba')
+    parser.add_argument('allowlists', nargs='*', default=[DEFAULT_ALLOWLIST_DIR],
+                        help='Archivos .txt o directorios (default: allowlists/)')
+    parser.add_argument('--index', default=DEFAULT_INDEX)
+    parser.add_argument('--check', nargs='*', default=[], help='Valores a consultar en el índice')
+    args = parser.parse_args()
+
+    if not args.check:
+        files = allowlist_files(args.allowlists)
+        entries = compile_index(files, args.index)
+        size = os.path.getsize(args.index)
+        print(f"✅ {entries} valores de {len(files)} allowlists → {args.index} ({size / 1024:.1f} KB)")
+        return
+
+    suppressor = Suppressor(args.index)
+    for value in args.check:
+        print(f"{'🔕 conocido' if suppressor.is_known(value) else '   no está'}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Fan-out concurrente de escaneos sobre múltiples targets
+Cada perfil de connection.yml (sources.mysql.*, sources.s3.*) es un target con nombre
+"""
+
+import copy
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+SCANNABLE_SOURCES = ('mysql', 's3')
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TARGET_WORKERS = 1
+DEFAULT_ENGINE = 'inprocess'
+ADAPTIVE_POLL_SECONDS = 1.0
+
+
+def scan_settings(connections: Dict) -> Dict:
+    """Sección opcional `scan:` de connection.yml (hawk_scanner la ignora)"""
+    settings = connections.get('scan') or {}
+    return {
+        'max_workers': int(settings.get('max_workers', DEFAULT_MAX_WORKERS)),
+        'per_target_workers': int(settings.get('per_target_workers', DEFAULT_TARGET_WORKERS)),
+        # inprocess: librería hawk_scanner importada una vez; subprocess: CLI por unidad
+        'engine': settings.get('engine', DEFAULT_ENGINE),
+        # Cerrar (GONE) las alertas cuya ubicación ya no aparece respecto del escaneo anterior
+        'auto_close_gone': bool(settings.get('auto_close_gone', False)),
+    }
+
+
+def load_targets(connections: Dict, sources=SCANNABLE_SOURCES) -> List[Dict]:
+    """
+    Lista los targets con nombre definidos en connection.yml
+
+    Returns:
+        list: [{'name', 'source', 'config', 'max_workers'}]
+    """
+    settings = scan_settings(connections)
+    targets = []
+    for source in sources:
+        profiles = (connections.get('sources') or {}).get(source) or {}
+        for name, config in profiles.items():
+            config = copy.deepcopy(config or {})
+            targets.append({
+                'name': name,
+                'source': source,
+                'config': config,
+                # Límite por target: no saturar una misma réplica/cuenta
+                'max_workers': int(config.pop('max_workers', settings['per_target_workers']))
+            })
+    return targets
+
+
+def build_units(targets: List[Dict], schema_index=None) -> List[Dict]:
+    """
+    Divide cada target en unidades de trabajo
+
+    Los targets MySQL con esquema indexado se dividen por tabla, así el límite
+    por target tiene efecto; el resto es una única unidad por target.
+    """
+    units = []
+    for target in targets:
+        tables = None
+        if target['source'] == 'mysql' and schema_index is not None:
+            known = sorted(table for (profile, table) in schema_index.index if profile == target['name'])
+            whitelist = target['config'].get('tables') or []
+            tables = [t for t in known if not whitelist or t in whitelist] or None
+
+        if tables:
+            for table in tables:
+                config = dict(target['config'], tables=[table])
+                units.append(_unit(target, config, table))
+        else:
+            units.append(_unit(target, target['config'], None))
+    return units
+
+
+def _unit(target: Dict, config: Dict, part: Optional[str]) -> Dict:
+    key = f"{target['source']}:{target['name']}"
+    if part:
+        key += f":{part}"
+    return {
+        'key': key,
+        'target': target['name'],
+        'source': target['source'],
+        'part': part,
+        'config': config,
+    }
+
+
+def unit_connections(connections: Dict, unit: Dict) -> Dict:
+    """connection.yml reducido a un único perfil, para pasarle al CLI"""
+    own_sections = ('sources', 'scan', 'export', 'suppression', 'history', 'match_store', 'adaptive')
+    reduced = {k: v for k, v in connections.items() if k not in own_sections}
+    reduced['sources'] = {unit['source']: {unit['target']: unit['config']}}
+    return reduced
+
+
+class FanOut:
+    """Ejecuta unidades en paralelo con límite global y límite por target"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, target_limits: Optional[Dict[str, int]] = None,
+                 deadline: Optional[float] = None, concurrency=None):
+        self.max_workers = max(1, max_workers)
+        self.target_limits = target_limits or {}
+        # time.time() a partir del cual no se despachan más unidades
+        self.deadline = deadline
+        # AdaptiveConcurrency (adaptive.py): el límite por target cambia con la carga de la fuente
+        self.concurrency = concurrency
+        self.lock = threading.Lock()
+        self.timings = {}
+
+    def _limit(self, target: str) -> int:
+        if self.concurrency:
+            return self.concurrency.limit(target)
+        return max(1, self.target_limits.get(target, DEFAULT_TARGET_WORKERS))
+
+    def run(self, units: List[Dict], fn: Callable[[Dict], object]) -> List[Dict]:
+        """
+        Ejecuta fn(unit) para cada unidad respetando los límites
+        fn devuelve None (o lanza una excepción) cuando la unidad falla
+        Las unidades pendientes al vencer el deadline no se despachan (skipped)
+
+        Returns:
+            list: [{'unit', 'result', 'error', 'seconds', 'skipped'}] en orden de finalización
+        """
+        pending = deque(units)
+        running = {}
+        active_by_target = {}
+        outcomes = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if self.expired() and pending:
+                    outcomes.extend({'unit': unit, 'result': None, 'error': None,
+                                     'seconds': 0.0, 'skipped': True} for unit in pending)
+                    pending.clear()
+                    if not running:
+                        break
+
+                # Despachar lo que entre en los límites globales y por target
+                deferred = deque()
+                while pending and len(running) < self.max_workers:
+                    unit = pending.popleft()
+                    target = unit['target']
+                    if active_by_target.get(target, 0) >= self._limit(target):
+                        deferred.append(unit)
+                        continue
+                    active_by_target[target] = active_by_target.get(target, 0) + 1
+                    future = executor.submit(self._timed, fn, unit)
+                    running[future] = unit
+                pending.extendleft(reversed(deferred))
+
+                # Con límites adaptativos se re-despacha periódicamente: una ventana
+                # que creció no tiene que esperar a que termine otra unidad
+                done, _ = wait(running, timeout=ADAPTIVE_POLL_SECONDS if self.concurrency else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit = running.pop(future)
+                    active_by_target[unit['target']] -= 1
+                    outcomes.append(future.result())
+
+        return outcomes
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def _timed(self, fn, unit: Dict) -> Dict:
+        start = time.time()
+        result, error = None, None
+        try:
+            result = fn(unit)
+        except Exception as e:
+            error = str(e)
+            print(f"❌ Excepción en {unit['key']}: {e}")
+        end = time.time()
+
+        with self.lock:
+            timing = self.timings.setdefault(unit['target'], {
+                'source': unit['source'],
+                'units': 0,
+                'failed_units': 0,
+                'busy_seconds': 0.0,
+                'started': start,
+                'finished': end,
+            })
+            timing['units'] += 1
+            timing['busy_seconds'] += end - start
+            timing['started'] = min(timing['started'], start)
+            timing['finished'] = max(timing['finished'], end)
+            if error or result is None:
+                timing['failed_units'] += 1
+
+        return {'unit': unit, 'result': result, 'error': error, 'seconds': end - start, 'skipped': False}
+
+    def target_timings(self) -> Dict[str, Dict]:
+        """Tiempo de pared y ocupado por target, para el resumen"""
+        return {
+            target: {
+                'source': t['source'],
+                'units': t['units'],
+                'failed_units': t['failed_units'],
+                'wall_seconds': round(t['finished'] - t['started'], 2),
+                'busy_seconds': round(t['busy_seconds'], 2),
+            }
+            for target, t in self.timings.items()
+        }
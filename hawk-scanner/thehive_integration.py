@@ -1,19 +1,45 @@
 #!/usr/bin/env python3
 """Integración con TheHive para auto-creación de casos"""
 
+import os
 import requests
 import json
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+MAX_THROTTLE_RETRIES = 5   # reintentos ante 429 (Too Many Requests)
+MAX_RETRY_WAIT = 30.0      # tope de espera por reintento (segundos)
 
 class TheHiveIntegration:
-    def __init__(self, url="http://thehive:9000", api_key=None):
-        self.url = url.rstrip('/')
+    def __init__(self, url=None, api_key=None):
+        self.url = (url or os.environ.get('THEHIVE_URL', 'http://thehive:9000')).rstrip('/')
         self.api_key = api_key or "CyuxSJNYbepfFdA6WWWYjxwkqJVdapAw"
         self.headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
+        self.throttled = 0
+        self._lock = threading.Lock()   # create_case/sync pueden correr en varios hilos
+
+    def _request(self, method: str, path: str, **kwargs):
+        """
+        Request a la API respetando el throttling de TheHive
+        Un 429 no crea nada del lado del servidor, así que reintentar no duplica casos
+        """
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            response = requests.request(method, f'{self.url}{path}', headers=self.headers, **kwargs)
+            if response.status_code != 429 or attempt == MAX_THROTTLE_RETRIES:
+                return response
+            with self._lock:
+                self.throttled += 1
+            try:
+                wait = float(response.headers.get('Retry-After', ''))
+            except ValueError:
+                wait = 0.5 * 2 ** attempt
+            time.sleep(min(wait, MAX_RETRY_WAIT))
+        return response
 
     def create_case(self, finding: Dict, alert_hash: str, is_reopen: bool = False) -> str:
         """Crea un caso en TheHive desde un hallazgo"""
@@ -45,6 +71,8 @@ class TheHiveIntegration:
 
         if is_reopen:
             tags.append('reopened')
+        if finding.get('reclassified'):
+            tags.append('reclassified')
 
         case_data = {
             'title': title,
@@ -57,12 +85,7 @@ class TheHiveIntegration:
         }
 
         try:
-            response = requests.post(
-                f'{self.url}/api/v1/case',
-                headers=self.headers,
-                json=case_data,
-                timeout=10
-            )
+            response = self._request('POST', '/api/v1/case', json=case_data, timeout=10)
 
             if response.status_code in [200, 201]:
                 case = response.json()
@@ -81,6 +104,27 @@ class TheHiveIntegration:
             print(f"   ❌ Excepción al crear caso: {e}")
             return None
 
+    def find_open_case(self, alert_hash: str) -> Optional[str]:
+        """
+        Caso abierto ya creado para la alerta (tag hash-<alert_hash>), o None
+        Un create_case que falló por timeout/5xx puede haber creado el caso igual:
+        antes de reenviarlo se busca para no duplicarlo
+        """
+        query = {'query': [
+            {'_name': 'listCase'},
+            {'_name': 'filter', '_eq': {'_field': 'tags', '_value': f'hash-{alert_hash}'}},
+        ]}
+        try:
+            response = self._request('POST', '/api/v1/query', json=query, timeout=10)
+            if response.status_code != 200:
+                return None
+            for case in response.json():
+                if case.get('status') in ('New', 'InProgress'):
+                    return case.get('_id')
+        except Exception as e:
+            print(f"   ⚠️  Error buscando caso existente: {e}")
+        return None
+
     def _build_description(self, finding: Dict, alert_hash: str, is_reopen: bool = False) -> str:
         """Construye descripción detallada del caso"""
         desc = f"# Hallazgo de Datos Sensibles"
@@ -99,14 +143,27 @@ class TheHiveIntegration:
         desc += f"## Detalles del Hallazgo\n\n"
         desc += f"- **Patrón:** {finding['pattern_name']}\n"
         desc += f"- **Severidad:** {finding.get('severity', 'Unknown')}\n"
-        desc += f"- **Fuente:** {finding['data_source']}\n\n"
+        desc += f"- **Fuente:** {finding['data_source']}\n"
+        if finding.get('profile'):
+            desc += f"- **Target:** {finding['profile']}\n"
+        if finding.get('location'):
+            desc += f"- **Ubicación:** {finding['location']}\n"
+        desc += "\n"
+
+        if finding.get('reclassified'):
+            desc += "**📈 Escalada por reclasificación:** la severidad de esta alerta subió por un cambio "
+            desc += "en las reglas de severidad, no por una detección nueva."
+            if not finding.get('matches'):
+                desc += " Los matches no se guardan en el historial: verificar los datos directamente en la ubicación."
+            desc += "\n\n"
 
-        if finding['data_source'] == 'mysql':
+        # Sin los campos de detalle (ej: alertas reconstruidas del historial) se omite el bloque
+        if finding['data_source'] == 'mysql' and finding.get('table'):
             desc += f"### Base de Datos MySQL\n\n"
             desc += f"- **Base de datos:** {finding.get('database')}\n"
             desc += f"- **Tabla:** {finding.get('table')}\n"
             desc += f"- **Columna:** {finding.get('column')}\n\n"
-        elif finding['data_source'] == 's3':
+        elif finding['data_source'] == 's3' and finding.get('file_path'):
             desc += f"### Amazon S3\n\n"
             desc += f"- **Bucket:** {finding.get('bucket')}\n"
             desc += f"- **Archivo:** {finding.get('file_path')}\n\n"
@@ -161,12 +218,8 @@ class TheHiveIntegration:
             }
 
             try:
-                response = requests.post(
-                    f'{self.url}/api/v1/case/{case_id}/observable',
-                    headers=self.headers,
-                    json=obs,
-                    timeout=10
-                )
+                response = self._request('POST', f'/api/v1/case/{case_id}/observable',
+                                         json=obs, timeout=10)
                 if response.status_code not in [200, 201]:
                     print(f"   ⚠️  Error agregando observable: {response.status_code}")
             except Exception as e:
@@ -200,11 +253,7 @@ class TheHiveIntegration:
         for alert_hash, pattern, severity, case_id, old_status, location in critical_alerts:
             if case_id:
                 try:
-                    response = requests.get(
-                        f'{self.url}/api/v1/case/{case_id}',
-                        headers=self.headers,
-                        timeout=5
-                    )
+                    response = self._request('GET', f'/api/v1/case/{case_id}', timeout=5)
 
                     if response.status_code == 200:
                         case = response.json()
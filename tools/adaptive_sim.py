@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Simulación de la concurrencia adaptativa (hawk-scanner/adaptive.py) contra
+una réplica MySQL y un bucket S3 falsos, sin Docker. La réplica tiene una
+capacidad de consultas simultáneas y una carga de fondo por fases: por encima
+de la capacidad la latencia crece, Threads_running sube y el lag de réplica
+se acumula. El bucket responde 503 SlowDown por encima de un ritmo dado.
+El escaneo es el real (InProcessScanner + FanOut) con la librería reemplazada
+  python tools/adaptive_sim.py --phases 10:0,15:6,10:0
+  python tools/adaptive_sim.py --phases 10:0,15:6,10:0 --fixed 6   # comparación
+  python tools/adaptive_sim.py --no-pk      # tablas sin PRIMARY KEY: LIMIT/OFFSET
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hawk-scanner'))
+
+import hawk_adapter
+from adaptive import AdaptiveConcurrency, adaptive_settings
+from fingerprints import load_fingerprints
+from hawk_adapter import InProcessScanner
+from pattern_engine import PatternMatcher
+from targets import FanOut, build_units
+
+FINGERPRINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hawk-scanner',
+                                'fingerprint.yml')
+# Paginado por PRIMARY KEY (`WHERE (`id`) > (%s) ORDER BY …`) o por OFFSET
+SELECT = re.compile(r'^SELECT \* FROM `([^`]+)`( WHERE \(`id`\) > \(%s\))?( ORDER BY `id`)? '
+                    r'LIMIT (\d+)(?: OFFSET (\d+))?$')
+
+
+class SimulatedReplica:
+    """Réplica con capacidad fija, carga de fondo por fases y lag acumulado"""
+
+    def __init__(self, tables, rows, capacity, row_ms, phases, primary_key=True):
+        self.primary_key = primary_key
+        self.tables = [f"table_{n:02d}" for n in range(tables)]
+        self.rows = rows
+        self.capacity = capacity
+        self.row_ms = row_ms
+        self.phases = phases          # [(segundos, threads de fondo)]
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.lag = 0.0
+        self.last_tick = self.started
+        self.peak_threads = 0
+        self.peak_lag = 0.0
+        self.excess = 0.0                # threads × segundos por encima de la capacidad
+        self.rows_read = 0
+        self.rows_skipped = 0            # filas leídas y descartadas por OFFSET
+
+    def background(self) -> int:
+        elapsed = time.monotonic() - self.started
+        for seconds, threads in self.phases:
+            if elapsed < seconds:
+                return threads
+            elapsed -= seconds
+        return self.phases[-1][1]
+
+    def _tick(self):
+        """Avanza el lag: crece mientras la carga supera la capacidad, baja si no"""
+        now = time.monotonic()
+        dt, self.last_tick = now - self.last_tick, now
+        load = self.active + self.background()
+        if load > self.capacity:
+            self.lag += dt * (load - self.capacity) / self.capacity
+            self.excess += dt * (load - self.capacity)
+        else:
+            self.lag = max(0.0, self.lag - dt * 2)
+        self.peak_threads = max(self.peak_threads, load)
+        self.peak_lag = max(self.peak_lag, self.lag)
+
+    def query(self, rows: int, skipped: int = 0):
+        """Cuesta las filas devueltas más las que OFFSET recorre y descarta"""
+        with self.lock:
+            self._tick()
+            self.active += 1
+            load = self.active + self.background()
+        # Por encima de la capacidad cada consulta comparte CPU con las demás
+        time.sleep((rows + skipped) * self.row_ms / 1000 * max(1.0, load / self.capacity))
+        with self.lock:
+            self._tick()
+            self.active -= 1
+            self.rows_read += rows
+            self.rows_skipped += skipped
+
+    def status(self):
+        with self.lock:
+            self._tick()
+            return self.active + self.background(), int(self.lag)
+
+
+class SimulatedCursor:
+    def __init__(self, replica):
+        self.replica = replica
+        self.result = []
+        self.description = None
+
+    def execute(self, statement, params=None):
+        replica = self.replica
+        select = SELECT.match(statement)
+        if statement == 'SHOW TABLES':
+            self.result, self.description = [(t,) for t in replica.tables], [('table',)]
+        elif statement.startswith('SHOW GLOBAL STATUS'):
+            threads, _ = replica.status()
+            self.result, self.description = [('Threads_running', str(threads))], [('Variable_name',), ('Value',)]
+        elif statement == 'SHOW REPLICA STATUS':
+            _, lag = replica.status()
+            self.result, self.description = [(lag,)], [('Seconds_Behind_Source',)]
+        elif statement.startswith('SHOW KEYS FROM'):
+            self.description = [('Key_name',), ('Seq_in_index',), ('Column_name',)]
+            self.result = [('PRIMARY', 1, 'id')] if replica.primary_key else []
+        elif select:
+            keyset, limit, offset = select.group(2), int(select.group(4)), int(select.group(5) or 0)
+            # Por clave el índice salta directo a la primera fila; OFFSET recorre las anteriores
+            start = params[0] + 1 + offset if keyset else offset
+            count = max(0, min(limit, replica.rows - start))
+            replica.query(count, skipped=0 if keyset else min(offset, replica.rows))
+            self.description = [('id',), ('email',), ('note',)]
+            self.result = [(n, f"cliente{n}@empresa.com" if n % 500 == 0 else '', 'sin datos')
+                           for n in range(start, start + count)]
+        else:
+            raise ValueError(f"Consulta no simulada: {statement}")
+
+    def fetchall(self):
+        result, self.result = self.result, []
+        return result
+
+    def fetchone(self):
+        return self.result.pop(0) if self.result else None
+
+    def close(self):
+        pass
+
+
+class SimulatedConnection:
+    def __init__(self, replica):
+        self.replica = replica
+
+    def cursor(self):
+        return SimulatedCursor(self.replica)
+
+    def get_host_info(self):
+        return 'replica-simulada'
+
+    def close(self):
+        pass
+
+
+class SlowDown(Exception):
+    """Imita botocore ClientError con código SlowDown"""
+
+    def __init__(self):
+        super().__init__('SlowDown')
+        self.response = {'Error': {'Code': 'SlowDown'}, 'ResponseMetadata': {'HTTPStatusCode': 503}}
+
+
+class SimulatedBucket:
+    """Bucket con token bucket de rate req/s: por encima responde SlowDown"""
+
+    def __init__(self, objects, rate, latency_ms):
+        self.keys = [f"exports/archivo_{n:04d}.txt" for n in range(objects)]
+        self.rate = rate
+        self.latency_ms = latency_ms
+        self.tokens = rate
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+        self.slowdowns = 0
+        self.objects = SimpleNamespace(all=lambda: [SimpleNamespace(key=k) for k in self.keys])
+
+    def download_file(self, key, path):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            if self.tokens < 1:
+                self.slowdowns += 1
+                raise SlowDown()
+            self.tokens -= 1
+        time.sleep(self.latency_ms / 1000)
+        with open(path, 'w') as f:
+            f.write(f"{key}: contacto soporte@empresa.com\n")
+
+
+def simulated_library(replica, bucket):
+    """Reemplazo de los módulos de hawk_scanner que usa InProcessScanner"""
+    return {
+        'mysql': SimpleNamespace(connect_mysql=lambda *args: SimulatedConnection(replica)),
+        's3': SimpleNamespace(connect_s3=lambda *args: bucket),
+        'system': SimpleNamespace(should_exclude_file=lambda args, key, patterns: False),
+    }
+
+
+def parse_phases(text):
+    """'10:0,15:24' → [(10.0, 0), (15.0, 24)]"""
+    phases = []
+    for chunk in text.split(','):
+        seconds, _, threads = chunk.partition(':')
+        phases.append((float(seconds), int(threads or 0)))
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simula carga en la fuente y mide la concurrencia adaptativa')
+    parser.add_argument('--tables', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=100000, help='Filas por tabla')
+    parser.add_argument('--capacity', type=int, default=8, help='Consultas simultáneas sin degradar')
+    parser.add_argument('--row-ms', type=float, default=0.05, help='Costo por fila sin contención')
+    parser.add_argument('--phases', default='10:0,15:6,10:0',
+                        help='segundos:threads de fondo, separados por coma')
+    parser.add_argument('--objects', type=int, default=200, help='Objetos del bucket')
+    parser.add_argument('--s3-rate', type=float, default=20, help='req/s antes de SlowDown')
+    parser.add_argument('--s3-latency-ms', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=8, help='Límite global del fan-out')
+    parser.add_argument('--max-target-workers', type=int, default=8)
+    parser.add_argument('--max-query-ms', type=float, default=300)
+    parser.add_argument('--max-threads-running', type=int, default=8)
+    parser.add_argument('--max-replica-lag', type=float, default=2)
+    parser.add_argument('--probe-seconds', type=float, default=1)
+    parser.add_argument('--fixed', type=int, help='Sin adaptación: N workers fijos por target')
+    parser.add_argument('--no-pk', action='store_true', help='Tablas sin PRIMARY KEY (paginado por OFFSET)')
+    args = parser.parse_args()
+
+    replica = SimulatedReplica(args.tables, args.rows, args.capacity, args.row_ms, parse_phases(args.phases),
+                               primary_key=not args.no_pk)
+    bucket = SimulatedBucket(args.objects, args.s3_rate, args.s3_latency_ms)
+    hawk_adapter._library = simulated_library(replica, bucket)
+
+    mysql_config = {'database': 'simdb', 'limit_start': 0, 'limit_end': args.rows}
+    targets = [
+        {'name': 'replica_sim', 'source': 'mysql', 'config': mysql_config, 'max_workers': args.fixed or 2},
+        {'name': 'bucket_sim', 'source': 's3', 'config': {'bucket_name': 'sim'}, 'max_workers': 1},
+    ]
+    # Un esquema indexado divide el target MySQL por tabla, como en producción
+    schema = SimpleNamespace(index={('replica_sim', table): {} for table in replica.tables})
+    units = build_units(targets, schema)
+
+    concurrency = None
+    if not args.fixed:
+        settings = adaptive_settings({'adaptive': {
+            'enabled': True,
+            'max_target_workers': args.max_target_workers,
+            'max_query_ms': args.max_query_ms,
+            'max_threads_running': args.max_threads_running,
+            'max_replica_lag': args.max_replica_lag,
+            'probe_seconds': args.probe_seconds,
+        }})
+        concurrency = AdaptiveConcurrency(targets, units, settings, args.workers)
+
+    matcher = PatternMatcher({name: regex for name, regex in load_fingerprints(FINGERPRINT_FILE).items()
+                              if name == 'Email Address'})
+    scanner = InProcessScanner({}, matcher, 'connection.yml', FINGERPRINT_FILE, concurrency=concurrency)
+    fanout = FanOut(args.workers, {t['name']: t['max_workers'] for t in targets}, concurrency=concurrency)
+
+    mode = f"{args.fixed} workers fijos" if args.fixed else "adaptativo"
+    print(f"🧪 {len(units)} unidades ({args.tables} tablas × {args.rows} filas, {args.objects} objetos), "
+          f"capacidad {args.capacity}, fases {args.phases} — {mode}")
+    started = time.monotonic()
+    outcomes = fanout.run(units, lambda unit: sum(1 for _ in scanner.scan_unit(unit)))
+    elapsed = time.monotonic() - started
+
+    failed = [o for o in outcomes if o['error'] or o['result'] is None]
+    print(f"\n⏱️  {elapsed:.1f}s, {replica.rows_read / elapsed:,.0f} filas/s, "
+          f"{len(failed)} unidades con error")
+    if replica.rows_skipped:
+        print(f"   OFFSET: {replica.rows_skipped:,} filas leídas y descartadas "
+              f"({replica.rows_skipped / max(1, replica.rows_read):.1f}× las devueltas)")
+    print(f"   Réplica: pico Threads_running {replica.peak_threads} (capacidad {args.capacity}), "
+          f"lag máx. {replica.peak_lag:.0f}s, exceso {replica.excess:.1f} threads·s sobre capacidad")
+    print(f"   Bucket: {bucket.slowdowns} respuestas SlowDown")
+    if concurrency:
+        for target, info in concurrency.summary()['targets'].items():
+            chunk = f", chunk final {info['chunk_rows']}" if info['source'] == 'mysql' else ''
+            print(f"   {target}: {info['min_workers']}-{info['max_workers']} workers, "
+                  f"{info['decreases']} bajas, {info['increases']} subas{chunk}, "
+                  f"pausa final {info['pause_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark del layout de la tabla alerts: original (v1) vs compacto (v2)
+Mide tamaño en disco y costo del upsert (alta y re-detección) con N ubicaciones
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hawk-scanner'))
+
+from alert_manager import AlertManager, alert_key
+
+SEVERITIES = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']
+PATTERNS = ['Email', 'Credit Card - Visa', 'SSN', 'Phone Number', 'IP Address - Private']
+
+
+def create_v1(path):
+    """Schema original de AlertManager (alert_hash TEXT UNIQUE + índice duplicado)"""
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            alert_hash TEXT UNIQUE NOT NULL,
+            pattern_name TEXT NOT NULL,
+            data_source TEXT NOT NULL,
+            location TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            status TEXT DEFAULT 'NEW',
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            count INTEGER DEFAULT 1,
+            notes TEXT,
+            thehive_case_id TEXT,
+            thehive_status TEXT,
+            reopen_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('CREATE INDEX idx_alert_hash ON alerts(alert_hash)')
+    c.execute('CREATE INDEX idx_severity ON alerts(severity)')
+    c.execute('CREATE INDEX idx_status ON alerts(status)')
+    c.execute('CREATE INDEX idx_thehive_case ON alerts(thehive_case_id)')
+    conn.commit()
+    conn.close()
+
+
+def create_v2(path):
+    """Schema actual de AlertManager"""
+    AlertManager(path)
+
+
+def create_without_rowid(path):
+    """Alternativa descartada: alert_key como PK clusterizada (WITHOUT ROWID)"""
+    create_v2(path)
+    conn = sqlite3.connect(path)
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'alerts'").fetchone()[0]
+    sql = sql.replace('alert_key BLOB NOT NULL UNIQUE', 'alert_key BLOB PRIMARY KEY') + ' WITHOUT ROWID'
+    indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'alerts' AND sql IS NOT NULL")]
+    conn.execute('DROP TABLE alerts')
+    conn.execute(sql)
+    for index in indexes:
+        conn.execute(index)
+    conn.commit()
+    conn.close()
+
+
+def location(i):
+    return f"replica_{i % 7}:pocdb.table_{i // 1000}.col_{i % 1000}"
+
+
+def key_v1(i):
+    pattern = PATTERNS[i % len(PATTERNS)]
+    return hashlib.sha256(f"mysql|{pattern}|{location(i)}".encode()).hexdigest()[:16]
+
+
+def key_v2(i):
+    return alert_key('mysql', PATTERNS[i % len(PATTERNS)], location(i))
+
+
+def upsert(conn, key_column, keys, rows):
+    """Mismo patrón que process_finding: SELECT por clave, luego UPDATE o INSERT"""
+    c = conn.cursor()
+    for i in rows:
+        key = keys(i)
+        c.execute(f'SELECT count FROM alerts WHERE {key_column} = ?', (key,))
+        if c.fetchone():
+            c.execute(f'''
+                UPDATE alerts SET count = count + 1, last_seen = CURRENT_TIMESTAMP
+                WHERE {key_column} = ?
+            ''', (key,))
+        else:
+            c.execute(f'''
+                INSERT INTO alerts ({key_column}, pattern_name, data_source, location, severity)
+                VALUES (?, ?, 'mysql', ?, ?)
+            ''', (key, PATTERNS[i % len(PATTERNS)], location(i), SEVERITIES[i % len(SEVERITIES)]))
+        if i % 10000 == 9999:
+            conn.commit()
+    conn.commit()
+
+
+def bench(label, create, key_column, keys, rows, sample, work_dir):
+    path = os.path.join(work_dir, f"{label}.db")
+    create(path)
+    conn = sqlite3.connect(path)
+
+    start = time.perf_counter()
+    upsert(conn, key_column, keys, range(rows))
+    insert_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    upsert(conn, key_column, keys, range(0, rows, max(1, rows // sample)))
+    update_seconds = time.perf_counter() - start
+    updated = len(range(0, rows, max(1, rows // sample)))
+
+    conn.execute('VACUUM')
+    conn.close()
+    size = os.path.getsize(path)
+    os.remove(path)
+
+    return {
+        'insert_us': insert_seconds * 1e6 / rows,
+        'update_us': update_seconds * 1e6 / updated,
+        'bytes_per_row': size / rows,
+        'size_mb': size / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del schema de alerts.db')
+    parser.add_argument('--rows', type=int, default=1000000, help='Ubicaciones a insertar')
+    parser.add_argument('--sample', type=int, default=100000, help='Re-detecciones a medir')
+    parser.add_argument('--dir', default=None, help='Directorio temporal (mismo disco que /app/data)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='hawk_bench_', dir=args.dir) as work_dir:
+        print(f"⏱️  {args.rows} ubicaciones, {args.sample} re-detecciones")
+        results = {
+            'v1 (TEXT + índices)': bench('v1', create_v1, 'alert_hash', key_v1, args.rows, args.sample, work_dir),
+            'v2 (BLOB UNIQUE)': bench('v2', create_v2, 'alert_key', key_v2, args.rows, args.sample, work_dir),
+            'v2 WITHOUT ROWID': bench('v2wr', create_without_rowid, 'alert_key', key_v2,
+                                      args.rows, args.sample, work_dir),
+        }
+
+    print(f"\n{'Layout':<26} {'alta µs':>9} {'update µs':>10} {'bytes/fila':>11} {'MB':>8}")
+    print("-" * 68)
+    for label, r in results.items():
+        print(f"{label:<26} {r['insert_us']:>9.1f} {r['update_us']:>10.1f} "
+              f"{r['bytes_per_row']:>11.1f} {r['size_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
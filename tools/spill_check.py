@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Verificación del presupuesto de memoria de SpillGrouper
+Genera hallazgos que ocupan varias veces --max-memory (con ubicaciones
+repetidas en distintas partes), los agrupa y comprueba que los grupos salen
+completos, en orden de alert_hash, y que el pico en memoria nunca supera el
+presupuesto. Sale con código 1 si alguna comprobación falla
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hawk-scanner'))
+
+from spill_grouper import SpillGrouper, finding_hash, parse_size
+
+
+def synthetic_finding(i, part):
+    return {
+        'data_source': 'mysql',
+        'profile': 'check',
+        'host': 'check',
+        'database': 'pocdb',
+        'table': f"table_{i // 100}",
+        'column': f"col_{i % 100}",
+        'pattern_name': 'Email Address',
+        'severity': 'MEDIUM',
+        'matches': [f"user{i}.{n}@example.com" for n in range(part * 3, (part + 1) * 3)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verifica que SpillGrouper respete --max-memory')
+    parser.add_argument('--locations', type=int, default=5000, help='Ubicaciones distintas')
+    parser.add_argument('--parts', type=int, default=3, help='Partes (chunks) por ubicación')
+    parser.add_argument('--max-memory', default='64K', help='Presupuesto del agrupador')
+    args = parser.parse_args()
+
+    max_bytes = parse_size(args.max_memory)
+    grouper = SpillGrouper(max_bytes)
+    for part in range(args.parts):
+        for i in range(args.locations):
+            grouper.add(synthetic_finding(i, part))
+
+    groups = list(grouper)
+    keys = [finding_hash(group) for group in groups]
+    errors = []
+    if len(groups) != args.locations:
+        errors.append(f"{len(groups)} grupos, se esperaban {args.locations}")
+    if keys != sorted(keys) or len(set(keys)) != len(keys):
+        errors.append("los grupos no salen ordenados y únicos por alert_hash")
+    if any(len(group['matches']) != args.parts * 3 for group in groups):
+        errors.append("hay grupos con matches incompletos o duplicados")
+    if grouper.peak > max_bytes:
+        errors.append(f"pico de {grouper.peak} bytes, supera el presupuesto de {max_bytes}")
+
+    total = args.locations * 400 + sum(len(m) for group in groups for m in group['matches'])
+    print(f"📊 {args.locations} ubicaciones × {args.parts} partes, ~{total / max_bytes:.1f}× el presupuesto")
+    print(f"   • Volcados: {grouper.spills}, particiones repartidas de nuevo: {grouper.splits}")
+    print(f"   • Pico en memoria: {grouper.peak} bytes (presupuesto {max_bytes})")
+    for error in errors:
+        print(f"❌ {error}")
+    if errors:
+        sys.exit(1)
+    print("✅ El agrupador respetó el presupuesto")
+
+
+if __name__ == "__main__":
+    main()
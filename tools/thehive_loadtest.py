@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la integración con TheHive contra el mock (tools/thehive_mock.py)
+Las alertas pasan por el pipeline real (StreamingPipeline): W hilos de escaneo
+entregan las partes de cada unidad, el tracking las registra y el worker de
+casos las envía. Después se simula un --resume (reconciliación con el mismo
+run_id) y se sincronizan estados. Con --late-error-rate el mock crea el caso y
+responde 504: el reporte cuenta casos por alerta (duplicados) y casos creados
+que no quedaron vinculados a su alerta (huérfanos)
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hawk-scanner'))
+
+from alert_manager import AlertManager
+from pipeline import StreamingPipeline
+from run_diff import RunDiff
+from thehive_integration import TheHiveIntegration
+from thehive_mock import add_mock_arguments, serve, state_from_args
+
+RUN_ID = 'loadtest'
+PATTERNS = [('Credit Card - Visa', 'CRITICAL'), ('AWS Access Key', 'CRITICAL'),
+            ('Generic Password', 'HIGH'), ('Credit Card - Mastercard', 'CRITICAL')]
+LOCATIONS_PER_UNIT = 100   # columnas por tabla: una unidad por tabla
+
+
+def synthetic_finding(i, part=0):
+    """Hallazgo de la ubicación i; cada parte aporta matches distintos de la misma ubicación"""
+    pattern, severity = PATTERNS[i % len(PATTERNS)]
+    return {
+        'data_source': 'mysql',
+        'profile': f"replica_{i % 5}",
+        'host': f"replica_{i % 5}",
+        'database': 'pocdb',
+        'table': f"table_{i // LOCATIONS_PER_UNIT}",
+        'column': f"col_{i % LOCATIONS_PER_UNIT}",
+        'pattern_name': pattern,
+        'severity': severity,
+        'matches': [f"match-{i}-{n}" for n in range(part * 3, (part + 1) * 3)],
+    }
+
+
+def grouped_finding(i, parts):
+    """La ubicación i con los matches de todas sus partes (como track_by_location)"""
+    return dict(synthetic_finding(i), matches=[m for part in range(parts)
+                                               for m in synthetic_finding(i, part)['matches']])
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def report(label, latencies, seconds, count, failed):
+    print(f"\n📊 {label}")
+    print(f"   • Operaciones: {count} ({failed} fallidas) en {seconds:.2f}s "
+          f"→ {count / seconds if seconds else 0:.1f} op/s")
+    print(f"   • Latencia p50 {percentile(latencies, 50) * 1000:.0f} ms, "
+          f"p95 {percentile(latencies, 95) * 1000:.0f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.0f} ms, "
+          f"máx. {max(latencies, default=0) * 1000:.0f} ms")
+
+
+def case_counts(url, db_path):
+    """(casos en el mock, casos vinculados a una alerta, duplicados por hash de alerta)"""
+    stats = requests.get(f"{url}/_mock/stats", timeout=5).json()
+    with sqlite3.connect(db_path) as conn:
+        linked = conn.execute('SELECT COUNT(DISTINCT thehive_case_id) FROM alerts').fetchone()[0]
+    return stats['cases'], linked, stats['duplicates']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de la integración con TheHive')
+    parser.add_argument('--alerts', type=int, default=2000, help='Ubicaciones (alertas) a enviar')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Hilos de escaneo que alimentan el pipeline (como scan.max_workers)')
+    parser.add_argument('--parts', type=int, default=2, help='Partes (chunks) por ubicación')
+    parser.add_argument('--url', default=None,
+                        help='Mock ya levantado (por defecto se levanta uno en proceso)')
+    parser.add_argument('--sync-wait', type=float, default=0.0,
+                        help='Segundos a esperar antes de sincronizar (transiciones de estado)')
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        server = serve(state_from_args(args), port=0)
+        url = f"http://127.0.0.1:{server.server_port}"
+
+    thehive = TheHiveIntegration(url)
+    if not thehive.test_connection():
+        print(f"❌ No hay mock de TheHive en {url}")
+        sys.exit(1)
+
+    units = [range(start, min(start + LOCATIONS_PER_UNIT, args.alerts))
+             for start in range(0, args.alerts, LOCATIONS_PER_UNIT)]
+    print(f"🐝 {args.alerts} alertas en {len(units)} unidades × {args.parts} partes, "
+          f"{args.workers} hilos de escaneo, un worker de casos, contra {url}")
+
+    with tempfile.TemporaryDirectory(prefix='hawk_loadtest_') as work_dir, \
+            contextlib.redirect_stdout(io.StringIO()):
+        db_path = os.path.join(work_dir, 'alerts.db')
+        alert_mgr = AlertManager(db_path)
+        RunDiff(db_path)
+
+        pipeline = StreamingPipeline(alert_mgr, thehive, RUN_ID)
+        pipeline.start()
+
+        def scan(unit_number):
+            unit_key = f"mysql:loadtest|table_{unit_number}"
+            for part in range(args.parts):
+                pipeline.submit([synthetic_finding(i, part) for i in units[unit_number]], unit_key)
+            pipeline.unit_done(unit_key)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(scan, range(len(units))))
+        pipeline.close()
+        create_seconds = time.perf_counter() - start
+        first_pass = case_counts(url, db_path)
+
+        # --resume: mismo run_id, la reconciliación reenvía las alertas sin caso
+        retry = StreamingPipeline(alert_mgr, thehive, RUN_ID)
+        retry.start()
+        retry.resume_cases()
+        resumed = len(retry.resumed_cases)
+        retry.submit([grouped_finding(i, args.parts) for i in range(args.alerts)])
+        retry.close()
+        second_pass = case_counts(url, db_path)
+
+        if args.sync_wait:
+            time.sleep(args.sync_wait)
+        synced, sync_seconds = timed(thehive.sync_cases_status, alert_mgr)
+
+    report('Detección → caso (pipeline)', pipeline.latencies, create_seconds,
+           pipeline.cases_created + pipeline.case_errors, pipeline.case_errors)
+    print(f"   • Respuestas 429 reintentadas: {thehive.throttled}")
+
+    for label, (cases, linked, duplicates) in (('Primera pasada', first_pass),
+                                               (f"Tras --resume ({resumed} alertas sin caso reenviadas, "
+                                                f"{retry.cases_created} vinculadas)", second_pass)):
+        print(f"\n📋 {label}")
+        print(f"   • Casos en TheHive: {cases}, vinculados a su alerta: {linked}, "
+              f"huérfanos: {cases - linked}, duplicados por alerta: {duplicates}")
+
+    synced_total = synced['open'] + synced['resolved'] + synced['error']
+    print(f"\n📊 sync_cases_status")
+    print(f"   • {synced_total} casos en {sync_seconds:.2f}s "
+          f"→ {synced_total / sync_seconds if sync_seconds else 0:.1f} casos/s")
+    print(f"   • Abiertos: {synced['open']}, resueltos: {synced['resolved']}, errores: {synced['error']}")
+
+    stats = requests.get(f"{url}/_mock/stats", timeout=5).json()
+    print(f"\n📋 Mock: {stats['cases']} casos, {stats['observables']} observables")
+    print(f"   • Requests: {stats['requests']}")
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
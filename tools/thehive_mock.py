@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Servidor liviano que imita los endpoints de TheHive v1 que usa el scanner
+(status, case, case/{id}, case/{id}/observable y query), sin Cassandra ni
+Elasticsearch. Latencia, errores, throttling (429), errores después de crear
+el caso (504) y transiciones de estado configurables para pruebas de carga
+de TheHiveIntegration
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+CASE_PATH = re.compile(r'^/api/v1/case/([^/]+)$')
+OBSERVABLE_PATH = re.compile(r'^/api/v1/case/([^/]+)/observable$')
+
+
+class MockState:
+    """Casos en memoria y comportamiento configurable del servidor"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit=0.0,
+                 progress_after=0.0, resolve_after=0.0, resolve_rate=1.0, seed=None, late_error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.late_error_rate = late_error_rate  # casos creados que igual responden 504
+        self.rate_limit = rate_limit          # requests/segundo (0 = sin límite)
+        self.progress_after = progress_after  # segundos hasta InProgress (0 = nunca)
+        self.resolve_after = resolve_after    # segundos hasta Resolved (0 = nunca)
+        self.resolve_rate = resolve_rate      # fracción de casos que llegan a Resolved
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.cases = {}
+        self.observables = Counter()
+        self.requests = Counter()
+        self.next_id = 1
+        self.tokens = rate_limit
+        self.last_refill = time.monotonic()
+
+    def delay(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        wait = max(self.latency_ms + jitter, 0.0) / 1000
+        if wait:
+            time.sleep(wait)
+
+    def throttled(self) -> bool:
+        """Token bucket de rate_limit req/s con ráfaga de un segundo"""
+        if not self.rate_limit:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate_limit, self.tokens + (now - self.last_refill) * self.rate_limit)
+            self.last_refill = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return False
+            return True
+
+    def failed(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def failed_late(self) -> bool:
+        """El caso ya se creó pero la respuesta no llega (timeout del proxy)"""
+        with self.lock:
+            return self.random.random() < self.late_error_rate
+
+    def create_case(self, data: Dict) -> Dict:
+        with self.lock:
+            case_id = f"~{self.next_id}"
+            self.next_id += 1
+            case = dict(data, _id=case_id, number=self.next_id - 1, status='New',
+                        _createdAt=int(time.time() * 1000))
+            case['_resolves'] = self.random.random() < self.resolve_rate
+            self.cases[case_id] = case
+        return self._public(case)
+
+    def get_case(self, case_id: str) -> Optional[Dict]:
+        with self.lock:
+            case = self.cases.get(case_id)
+            if not case:
+                return None
+            case['status'] = self._status(case)
+            return self._public(case)
+
+    def _status(self, case: Dict) -> str:
+        """Transición New → InProgress → Resolved según la edad del caso"""
+        age = time.time() - case['_createdAt'] / 1000
+        if self.resolve_after and case['_resolves'] and age >= self.resolve_after:
+            return 'Resolved'
+        if self.progress_after and age >= self.progress_after:
+            return 'InProgress'
+        return 'New'
+
+    @staticmethod
+    def _public(case: Dict) -> Dict:
+        return {k: v for k, v in case.items() if not k.startswith('_') or k in ('_id', '_createdAt')}
+
+    def list_cases(self, status: Optional[str] = None, start: int = 0, end: Optional[int] = None,
+                   tag: Optional[str] = None):
+        with self.lock:
+            cases = []
+            for case in self.cases.values():
+                case['status'] = self._status(case)
+                if (status is None or case['status'] == status) and (tag is None or tag in case.get('tags', [])):
+                    cases.append(self._public(case))
+        return cases[start:end]
+
+    def duplicates(self) -> int:
+        """Casos de más para un mismo hash de alerta (tag hash-<alert_hash>)"""
+        with self.lock:
+            hashes = Counter(tag for case in self.cases.values()
+                             for tag in case.get('tags', []) if tag.startswith('hash-'))
+        return sum(count - 1 for count in hashes.values() if count > 1)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            statuses = Counter(self._status(case) for case in self.cases.values())
+            return {
+                'cases': len(self.cases),
+                'observables': sum(self.observables.values()),
+                'by_status': dict(statuses),
+                'requests': dict(self.requests),
+            }
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # El backlog por defecto (5) agrega esperas de 1s por SYN reintentado bajo carga
+    request_queue_size = 1024
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state: MockState = None
+    quiet = True
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+    def _send(self, status: int, body=None, headers: Optional[Dict] = None):
+        payload = json.dumps(body if body is not None else {}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _guard(self, kind: str) -> bool:
+        """Auth, throttling, latencia y errores inyectados; False si ya respondió"""
+        state = self.state
+        with state.lock:
+            state.requests[kind] += 1
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self._send(401, {'type': 'AuthenticationError', 'message': 'Authentication failure'})
+            return False
+        if state.throttled():
+            with state.lock:
+                state.requests['throttled'] += 1
+            self._send(429, {'type': 'TooManyRequests'},
+                       {"Retry-After": "1"})
+            return False
+        state.delay()
+        if kind != 'status' and state.failed():
+            with state.lock:
+                state.requests['errors'] += 1
+            self._send(500, {'type': 'InternalError', 'message': 'Injected failure'})
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path == '/api/v1/status':
+            if self._guard('status'):
+                self._send(200, {'versions': {'TheHive': '5.0.0-mock'}})
+        elif self.path == '/_mock/stats':
+            self._send(200, dict(self.state.stats(), duplicates=self.state.duplicates()))
+        elif CASE_PATH.match(self.path):
+            if self._guard('get_case'):
+                case = self.state.get_case(CASE_PATH.match(self.path).group(1))
+                if case:
+                    self._send(200, case)
+                else:
+                    self._send(404, {'type': 'NotFoundError', 'message': 'Case not found'})
+        else:
+            self._send(404, {'type': 'NotFoundError'})
+
+    def do_POST(self):
+        body = self._body()
+        if self.path == '/api/v1/case':
+            if self._guard('create_case'):
+                case = self.state.create_case(body)
+                if self.state.failed_late():
+                    with self.state.lock:
+                        self.state.requests['late_errors'] += 1
+                    self._send(504, {'type': 'GatewayTimeout', 'message': 'Injected failure after create'})
+                else:
+                    self._send(201, case)
+        elif OBSERVABLE_PATH.match(self.path):
+            if self._guard('observable'):
+                case_id = OBSERVABLE_PATH.match(self.path).group(1)
+                if self.state.get_case(case_id) is None:
+                    self._send(404, {'type': 'NotFoundError', 'message': 'Case not found'})
+                    return
+                with self.state.lock:
+                    self.state.observables[case_id] += 1
+                self._send(201, [dict(body, _id=f"obs-{case_id}-{self.state.observables[case_id]}")])
+        elif self.path.startswith('/api/v1/query'):
+            if self._guard('query'):
+                self._send(200, self._query(body.get('query') or []))
+        else:
+            self._send(404, {'type': 'NotFoundError'})
+
+    def _query(self, operations):
+        """Subconjunto de la Query API: listCase + filter _eq status/tags + page"""
+        status, tag, start, end = None, None, 0, None
+        for op in operations:
+            name = op.get('_name')
+            if name == 'filter' and '_eq' in op:
+                eq = op['_eq']
+                if eq.get('_field') == 'status':
+                    status = eq.get('_value')
+                elif eq.get('_field') == 'tags':
+                    tag = eq.get('_value')
+            elif name == 'page':
+                start, end = int(op.get('from', 0)), int(op.get('to', 0)) or None
+        return self.state.list_cases(status, start, end, tag)
+
+
+def serve(state: MockState, host='127.0.0.1', port=9000, quiet=True) -> MockServer:
+    """Levanta el mock en un hilo; port=0 elige un puerto libre (server.server_port)"""
+    handler = type('Handler', (MockHandler,), {'state': state, 'quiet': quiet})
+    server = MockServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='thehive-mock', daemon=True).start()
+    return server
+
+
+def add_mock_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Latencia media por request')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Variación de la latencia (±)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de respuestas 500')
+    parser.add_argument('--late-error-rate', type=float, default=0.0,
+                        help='Fracción de create_case que crean el caso y responden 504')
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help='Requests/segundo antes de responder 429 (0 = sin límite)')
+    parser.add_argument('--progress-after', type=float, default=0.0,
+                        help='Segundos hasta que un caso pasa a InProgress')
+    parser.add_argument('--resolve-after', type=float, default=0.0,
+                        help='Segundos hasta que un caso pasa a Resolved')
+    parser.add_argument('--resolve-rate', type=float, default=1.0,
+                        help='Fracción de casos que llegan a Resolved')
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def state_from_args(args) -> MockState:
+    return MockState(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit,
+                     args.progress_after, args.resolve_after, args.resolve_rate, args.seed,
+                     args.late_error_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock liviano de la API v1 de TheHive')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--verbose', action='store_true', help='Loguear cada request')
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = serve(state_from_args(args), args.host, args.port, quiet=not args.verbose)
+    print(f"🐝 Mock de TheHive en http://{args.host}:{server.server_port} "
+          f"(THEHIVE_URL=http://{args.host}:{server.server_port})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()